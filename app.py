@@ -1,13 +1,68 @@
 # --- Imports ---
 import streamlit as st
 import pandas as pd
+import numpy as np
+import os
+import functools
+import time
 from datetime import date, timedelta # Import date and timedelta
-from data_loader import load_inventory_data
-from simulation import advance_day, add_new_batch, calculate_expiry_status, ALERT_DAYS_BEFORE_EXPIRY, calculate_status, discard_batch # Import calculate_status and discard_batch
+from data_loader import load_shared_inventory_data, save_item_policies
+from optimizer import optimize_reorder_policy
+from batch_store import BatchStore
+from batch_journal import BatchJournal
+from history_store import HistoryStore, HISTORY_CHART_POINTS
+from checkpoint import save_checkpoint, load_checkpoint, resolve_checkpoint_path
+from forecast import DemandForecaster, DEFAULT_SERVICE_LEVEL
+from perf_trace import Tracer, activate, span, traced, use_tracer, rows_of_result
+from simulation import build_new_batches, simulate_horizon, simulate_with_reordering, IN_TRANSIT_COLUMNS, run_monte_carlo, ALERT_DAYS_BEFORE_EXPIRY
+
+# --- Constants ---
+STATUS_ORDER = ["Reorder Needed", "Low Stock", "OK", "Error"] # Status filter options, most urgent first
+STATUS_TABLE_SORT_COLUMNS = { # Sort label -> summary column (None: item name)
+    "Item Name": None,
+    "Status": 'status',
+    "Total QoH": 'total_qoh',
+    "ROP": 'reorder_point',
+    "Earliest Expiry": 'earliest_expiry',
+    "Rec. Order Qty": 'reorder_quantity',
+}
+STATUS_TABLE_PAGE_SIZES = [25, 50, 100]
+CHECKPOINT_ROOT = 'checkpoints' # All checkpoints live in subdirectories of this (relative to the app directory)
+DEFAULT_CHECKPOINT_NAME = 'latest' # Sidebar default, relative to CHECKPOINT_ROOT
+WRITE_CONFLICT_MESSAGE = ("Another session saved to the database after this one loaded it, so this session's changes "
+                          "were not saved. Reload the page to continue from the saved state.")
 
 # --- Page Config (Optional but Recommended) ---
 st.set_page_config(page_title="Pawfect inventory", layout="wide")
 
+# --- Performance Tracing ---
+def session_tracer() -> Tracer:
+    """The session's Tracer, which collects the timing spans shown in the sidebar performance panel."""
+    if 'perf_tracer' not in st.session_state:
+        st.session_state['perf_tracer'] = Tracer()
+    return st.session_state['perf_tracer']
+
+def instrumented(func):
+    """
+    Records each call of a callback or fragment as an 'app.<name>' span in the session's tracer.
+
+    Callbacks and fragment reruns run outside the main script body, so the
+    tracer is activated around the call itself.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with use_tracer(session_tracer()), span(f"app.{func.__name__}"):
+            return func(*args, **kwargs)
+    return wrapper
+
+def reset_timings_callback():
+    """Callback to drop all recorded timings of this session."""
+    session_tracer().reset()
+
+# Spans of the library calls made by this script run go to the session's tracer
+activate(session_tracer())
+render_start_ns = time.perf_counter_ns()
+
 # --- Helper Functions ---
 # def update_status_column(df: pd.DataFrame) -> pd.DataFrame:
 #     """Calculates and updates the 'status' column of the DataFrame."""
@@ -26,113 +81,131 @@ st.set_page_config(page_title="Pawfect inventory", layout="wide")
 #         df['status'] = 'Error'
 #     return df
 
-def update_expiry_status_column(batches_df: pd.DataFrame) -> pd.DataFrame:
-    """Applies expiry status calculation to the batches DataFrame."""
-    if batches_df is None or batches_df.empty:
-        return batches_df
-
-    # Ensure 'expiry_date' is datetime - should be handled by loader/simulation, but good practice
-    if 'expiry_date' in batches_df.columns and not pd.api.types.is_datetime64_any_dtype(batches_df['expiry_date']):
-        batches_df['expiry_date'] = pd.to_datetime(batches_df['expiry_date'], errors='coerce')
-
+@traced('app.refresh_inventory', rows=lambda result, *args, **kwargs: len(st.session_state['batch_store']))
+def refresh_inventory():
+    """Brings the batch store's expiry statuses up to the simulation date and marks the inventory as changed."""
     if 'current_sim_date' not in st.session_state:
         st.error("Simulation date not found in session state. Cannot calculate expiry status.")
-        return batches_df # Return unchanged if date is missing
-
-    current_sim_date = st.session_state['current_sim_date']
-    df = batches_df.copy() # Work on a copy
-
-    # Apply the calculation function
-    df['expiry_status'] = df.apply(
-        lambda row: calculate_expiry_status(row.get('expiry_date'), current_sim_date, ALERT_DAYS_BEFORE_EXPIRY),
-        axis=1
-    )
-    return df
+        return
+    batch_store = st.session_state['batch_store']
+    # Write pending lot changes back first: it may rename newly received lots to their database ids
+    if st.session_state.get('auto_save', False) and st.session_state.get('batch_journal') is not None:
+        st.session_state['batch_journal'].maybe_flush(batch_store)
+    # Only lots with a status transition since the last refresh are re-classified
+    batch_store.update_status(st.session_state['current_sim_date'])
+    bump_inventory_version()
+
+def record_clock():
+    """Journals the simulation date and day count, so they are saved together with the lots."""
+    if st.session_state.get('batch_journal') is not None:
+        st.session_state['batch_journal'].record_clock(st.session_state['current_sim_date'], st.session_state['day_count'])
+
+def current_batches_df() -> pd.DataFrame | None:
+    """
+    The batch store exported as a batches DataFrame, for the views that need every lot
+    (multi-day simulation, risk analysis, policy optimization). Cached until the store changes.
+    """
+    batch_store = st.session_state.get('batch_store')
+    if batch_store is None:
+        return None
+    cached = st.session_state.get('batches_export')
+    if cached is None or cached[0] is not batch_store or cached[1] != batch_store.version:
+        cached = (batch_store, batch_store.version, batch_store.to_dataframe())
+        st.session_state['batches_export'] = cached
+    return cached[2]
+
+def bump_inventory_version():
+    """Marks the inventory state (batches or item parameters) as changed, invalidating cached summaries."""
+    st.session_state['inventory_version'] = st.session_state.get('inventory_version', 0) + 1
+
+@traced('app.get_inventory_summary', rows=rows_of_result)
+def get_inventory_summary() -> pd.DataFrame | None:
+    """Per-item inventory summary, recomputed only when the inventory version has changed."""
+    version = st.session_state.get('inventory_version', 0)
+    cached = st.session_state.get('inventory_summary')
+    if cached is None or cached[0] != version:
+        batch_store, item_params_df = st.session_state.get('batch_store'), st.session_state.get('item_params_df')
+        summary = batch_store.summarize(item_params_df) if batch_store is not None and item_params_df is not None else None
+        cached = (version, summary)
+        st.session_state['inventory_summary'] = cached
+    return cached[1]
 
 
 # --- Callback Functions ---
+@instrumented
 def advance_day_callback():
     """Callback function to advance the simulation by one day using FEFO."""
+    if st.session_state.get('auto_reorder', False):
+        advance_days_callback(1) # Reordering runs in the multi-day kernel
+        return
     if 'item_params_df' in st.session_state and st.session_state['item_params_df'] is not None \
-       and 'batches_df' in st.session_state and st.session_state['batches_df'] is not None \
+       and st.session_state.get('batch_store') is not None \
        and 'current_sim_date' in st.session_state:
 
         st.session_state['day_count'] += 1
         # Increment the simulation date
         st.session_state['current_sim_date'] += timedelta(days=1)
+        record_clock()
 
-        # Call the new simulation function with FEFO logic
-        updated_batches_df = advance_day(
-            st.session_state['batches_df'],
-            st.session_state['item_params_df'],
-            st.session_state['current_sim_date']
-        )
+        # Consume FEFO in place in the batch store (same logic as simulation.advance_day)
+        batch_store = st.session_state['batch_store']
+        _, demand = batch_store.advance_day(st.session_state['item_params_df'], st.session_state['current_sim_date'], return_demand=True)
 
         # --- Record History ---
         day = st.session_state['day_count']
-        item_names = st.session_state['item_params_df'].index
-        for item_name in item_names:
-            # Ensure total_qoh calculation handles cases where an item might temporarily have no batches
-            total_qoh = updated_batches_df[updated_batches_df['item_name'] == item_name]['quantity_on_hand'].sum() if not updated_batches_df[updated_batches_df['item_name'] == item_name].empty else 0
-            st.session_state['history'].append({'day': day, 'item_name': item_name, 'total_qoh': total_qoh})
+        item_totals = batch_store.quantity_by_item(st.session_state['item_params_df'].index)
+        st.session_state['history'].append(day, item_totals.to_numpy())
+        st.session_state['forecaster'].update(st.session_state['current_sim_date'], demand)
         # --- End Record History ---
+        apply_forecast_policy()
 
-        # Update the batches DataFrame in session state AFTER calculating status
-        st.session_state['batches_df'] = update_expiry_status_column(updated_batches_df)
+        # Bring expiry statuses up to the new date for display
+        refresh_inventory()
         print(f"Advanced to Day {st.session_state['day_count']}, Sim Date: {st.session_state['current_sim_date']}") # Debug print
     else:
         # Handle the case where data isn't loaded or state is incomplete
         st.warning("Inventory data not fully loaded or session state incomplete. Cannot advance day.")
 
+@instrumented
 def simulate_order_callback(item_name: str):
     """Callback function to simulate placing an order (adding a new batch) for a specific item."""
+    if order_items([item_name]) > 0:
+        print(f"Simulated order for {item_name}. New batch added.") # Debug print
+
+def order_items(item_names) -> int:
+    """Receives one reorder-quantity batch for each item in a single bulk operation. Returns the number of batches added."""
     if 'item_params_df' in st.session_state and st.session_state['item_params_df'] is not None \
-       and 'batches_df' in st.session_state and st.session_state['batches_df'] is not None \
+       and st.session_state.get('batch_store') is not None \
        and 'current_sim_date' in st.session_state:
 
-        # Call the function to add a new batch
-        updated_batches_df = add_new_batch(
-            st.session_state['batches_df'],
-            st.session_state['item_params_df'],
-            item_name,
-            st.session_state['current_sim_date']
-        )
-        # Update the batches DataFrame in session state AFTER calculating status
-        st.session_state['batches_df'] = update_expiry_status_column(updated_batches_df)
-        print(f"Simulated order for {item_name}. New batch added.") # Debug print
+        # Build all new batches at once, insert them into the store, recompute status once
+        new_batches_df = build_new_batches(st.session_state['item_params_df'], item_names, st.session_state['current_sim_date'])
+        if new_batches_df is None or new_batches_df.empty:
+            st.warning("No valid items to order.")
+            return 0
+        st.session_state['batch_store'].receive_many(new_batches_df)
+        refresh_inventory()
+        return len(new_batches_df)
     else:
         st.warning("Inventory data not fully loaded or session state incomplete. Cannot simulate order.")
+        return 0
 
+@instrumented
 def reorder_all_callback():
     """Callback to simulate ordering all items currently flagged as 'Reorder Needed'."""
     print("Reorder All callback triggered.") # Debug print
     if 'item_params_df' in st.session_state and st.session_state['item_params_df'] is not None \
-       and 'batches_df' in st.session_state and st.session_state['batches_df'] is not None:
-
-        ordered_items_count = 0
-        local_item_params_df = st.session_state['item_params_df']
-        local_batches_df = st.session_state['batches_df']
-
-        for item_name in local_item_params_df.index:
-            try:
-                # Calculate total QoH for the item
-                item_batches = local_batches_df[local_batches_df['item_name'] == item_name]
-                total_qoh = item_batches['quantity_on_hand'].sum()
-
-                # Get ROP safely
-                rop = int(local_item_params_df.loc[item_name, 'reorder_point'])
+       and st.session_state.get('batch_store') is not None:
 
-                # Calculate status
-                item_status = calculate_status(total_qoh, rop)
-
-                if item_status == "Reorder Needed":
-                    print(f"Reordering {item_name}...") # Debug print
-                    simulate_order_callback(item_name) # Call the existing single-item order function
-                    ordered_items_count += 1
-            except (KeyError, ValueError) as e:
-                st.warning(f"Skipping reorder check for {item_name} due to data issue: {e}")
+        # Items with an invalid ROP classify as "Error" and are skipped
+        item_statuses = get_inventory_summary()['status']
+        if (item_statuses == "Error").any():
+            st.warning(f"Skipping reorder check for {list(item_statuses.index[item_statuses == 'Error'])} due to data issues.")
+        flagged_items = item_statuses.index[item_statuses == "Reorder Needed"]
 
+        ordered_items_count = order_items(flagged_items) if len(flagged_items) else 0
         if ordered_items_count > 0:
+            print(f"Reordered {ordered_items_count} items.") # Debug print
             st.toast(f"Triggered reorder simulation for {ordered_items_count} items.")
         else:
              st.toast("No items required reordering at this time.") # Feedback even if none ordered
@@ -140,116 +213,338 @@ def reorder_all_callback():
     else:
         st.warning("Cannot perform reorder action: Inventory data not fully loaded.")
 
+@instrumented
 def discard_batch_callback(batch_id):
     """Callback to discard a specific batch."""
     print(f"Discard Batch callback triggered for batch_id: {batch_id}") # Debug print
-    if 'batches_df' in st.session_state and st.session_state['batches_df'] is not None:
-        # Ensure the batch_id exists before attempting discard
-        if batch_id in st.session_state['batches_df'].index:
-            updated_df = discard_batch(st.session_state['batches_df'], batch_id)
+    if st.session_state.get('batch_store') is not None:
+        # discard() returns False if the batch_id does not exist
+        if st.session_state['batch_store'].discard(batch_id):
             # Recalculate expiry status after discard and update state
-            st.session_state['batches_df'] = update_expiry_status_column(updated_df)
+            refresh_inventory()
             st.toast(f"Discarded batch {batch_id}.")
         else:
             st.warning(f"Batch ID {batch_id} not found. Cannot discard.")
     else:
         st.warning("Cannot discard batch: Batch data not loaded.")
 
-def advance_week_callback():
-    """Callback function to advance the simulation by one week (7 days)."""
-    print("Advance Week callback triggered.") # Debug print
+@instrumented
+def discard_expired_callback():
+    """Callback to discard every expired batch in one bulk operation."""
+    batch_store = st.session_state.get('batch_store')
+    if batch_store is not None and batch_store.status_day is not None:
+        expired_ids = batch_store.lots_with_status(['Expired']).index
+        discarded = st.session_state['batch_store'].discard_many(expired_ids)
+        if discarded:
+            refresh_inventory()
+        st.toast(f"Discarded {discarded} expired batches.")
+    else:
+        st.warning("Cannot discard batches: Batch data not loaded.")
+
+@instrumented
+def advance_days_callback(days: int):
+    """Callback function to advance the simulation by several days in one vectorized pass."""
+    print(f"Advance {days} Days callback triggered.") # Debug print
     if 'item_params_df' in st.session_state and st.session_state['item_params_df'] is not None \
-       and 'batches_df' in st.session_state and st.session_state['batches_df'] is not None \
+       and st.session_state.get('batch_store') is not None \
        and 'current_sim_date' in st.session_state:
 
-        # Get local references to state variables for the loop
-        local_batches_df = st.session_state['batches_df']
-        local_item_params_df = st.session_state['item_params_df']
-        local_current_sim_date = st.session_state['current_sim_date']
-        local_day_count = st.session_state['day_count']
-
-        for _ in range(7): # Loop 7 times for 7 days
-            local_day_count += 1
-            local_current_sim_date += timedelta(days=1)
-
-            # Call the core daily simulation logic
-            local_batches_df = advance_day(
-                local_batches_df,
-                local_item_params_df,
-                local_current_sim_date
+        # Simulate the whole horizon at once; the first simulated day is tomorrow
+        if st.session_state.get('auto_reorder', False):
+            updated_batches_df, in_transit_df, qoh_history_df, orders_df, demand_df = simulate_with_reordering(
+                current_batches_df(),
+                st.session_state['item_params_df'],
+                st.session_state['current_sim_date'] + timedelta(days=1),
+                days,
+                in_transit_df=st.session_state.get('in_transit_df'),
+                return_demand=True
             )
+            st.session_state['in_transit_df'] = in_transit_df
+            if orders_df is not None and not orders_df.empty:
+                print(f"Automatic reordering placed {len(orders_df)} orders.") # Debug print
+        else:
+            updated_batches_df, qoh_history_df, demand_df = simulate_horizon(
+                current_batches_df(),
+                st.session_state['item_params_df'],
+                st.session_state['current_sim_date'] + timedelta(days=1),
+                days,
+                return_demand=True
+            )
+        if qoh_history_df is None:
+            st.warning(f"Simulation failed. Cannot advance {days} days.")
+            return
+
+        # --- Record History for each simulated day ---
+        first_day = st.session_state['day_count'] + 1
+        st.session_state['history'].append_many(first_day, qoh_history_df)
+        st.session_state['forecaster'].update_many(st.session_state['current_sim_date'] + timedelta(days=1), demand_df)
+        # --- End Record History ---
 
-            # --- Record History for each day within the week ---
-            day = local_day_count
-            item_names = local_item_params_df.index
-            for item_name in item_names:
-                total_qoh = local_batches_df[local_batches_df['item_name'] == item_name]['quantity_on_hand'].sum() if not local_batches_df[local_batches_df['item_name'] == item_name].empty else 0
-                st.session_state['history'].append({'day': day, 'item_name': item_name, 'total_qoh': total_qoh})
-            # --- End Record History ---
-
-        # Update session state AFTER the loop completes
-        st.session_state['day_count'] = local_day_count
-        st.session_state['current_sim_date'] = local_current_sim_date
-        # Update expiry status based on the final date and final batches state
-        st.session_state['batches_df'] = update_expiry_status_column(local_batches_df)
-
-        print(f"Advanced by 7 days. Now Day {st.session_state['day_count']}, Sim Date: {st.session_state['current_sim_date']}") # Debug print
-        st.toast("Advanced simulation by 7 days.")
+        # Update session state once for the whole horizon
+        st.session_state['day_count'] += days
+        st.session_state['current_sim_date'] += timedelta(days=days)
+        record_clock()
+        # Rebuild the batch store from the final batches state and update expiry status
+        batch_journal = st.session_state.get('batch_journal')
+        if batch_journal is not None:
+            batch_journal.record_snapshot(current_batches_df(), updated_batches_df) # Journal the net change of the horizon
+        st.session_state['batch_store'] = BatchStore.from_dataframe(updated_batches_df, st.session_state['item_params_df'].index,
+                                                                    st.session_state['current_sim_date'], ALERT_DAYS_BEFORE_EXPIRY)
+        st.session_state['batch_store'].journal = batch_journal
+        apply_forecast_policy()
+        refresh_inventory()
+
+        print(f"Advanced by {days} days. Now Day {st.session_state['day_count']}, Sim Date: {st.session_state['current_sim_date']}") # Debug print
+        st.toast(f"Advanced simulation by {days} days.")
     else:
-        st.warning("Inventory data not fully loaded or session state incomplete. Cannot advance week.")
-
-# --- Title ---
-st.title("Pawfect inventory")
+        st.warning(f"Inventory data not fully loaded or session state incomplete. Cannot advance {days} days.")
 
-# --- Session State Initialization ---
-# Check if the item parameters DataFrame is already in the session state
-if 'item_params_df' not in st.session_state:
-    print("Initializing session state...")
-    # Attempt to load data only if it's not already loaded
-    item_params_df, batches_df = load_inventory_data() # Unpack the tuple
-    if item_params_df is not None and batches_df is not None: # Check if both loaded successfully
-        st.session_state['item_params_df'] = item_params_df
-        # Initialize simulation date BEFORE calculating expiry status
-        st.session_state['current_sim_date'] = date.today() # Initialize simulation date
-        # Calculate initial expiry status right after loading
-        st.session_state['batches_df'] = update_expiry_status_column(batches_df)
-        st.session_state['day_count'] = 0 # Initialize day count on successful load
-        st.session_state['history'] = [] # Initialize history list on successful load
-        print("Data loaded successfully into session state and initial expiry status calculated.")
-    else:
-        # Store None if loading failed, to prevent trying again
-        st.session_state['item_params_df'] = None
-        st.session_state['batches_df'] = None
-        st.session_state['current_sim_date'] = date.today() # Initialize date even on failure
-        st.session_state['day_count'] = 0 # Initialize day count even on failure
-        st.session_state['history'] = [] # Initialize history list even on failure
-        print("Failed to load data during initialization.")
+@instrumented
+def advance_week_callback():
+    """Callback function to advance the simulation by one week (7 days)."""
+    advance_days_callback(7)
 
-# --- Sidebar ---
-st.sidebar.header("Simulation Controls")
-# Display the current day count from session state
-current_day = st.session_state.get('day_count', 0)
-st.sidebar.metric("Simulation Day", current_day)
+@instrumented
+def run_risk_analysis_callback():
+    """Callback to run a Monte Carlo risk analysis from the current simulation state."""
+    print("Risk Analysis callback triggered.") # Debug print
+    if 'item_params_df' in st.session_state and st.session_state['item_params_df'] is not None \
+       and st.session_state.get('batch_store') is not None \
+       and 'current_sim_date' in st.session_state:
 
-# Add the button to trigger the simulation step
-st.sidebar.button("Advance One Day", on_click=advance_day_callback)
-st.sidebar.button("Advance One Week", on_click=advance_week_callback)
+        replicates = int(st.session_state.get('risk_replicates', 200))
+        days = int(st.session_state.get('risk_days', 90))
+        seed = int(st.session_state.get('risk_seed', 0))
 
+        risk_summary_df, _ = run_monte_carlo(
+            current_batches_df(),
+            st.session_state['item_params_df'],
+            st.session_state['current_sim_date'] + timedelta(days=1),
+            days,
+            replicates=replicates,
+            seed=seed,
+            auto_reorder=st.session_state.get('auto_reorder', False),
+            in_transit_df=st.session_state.get('in_transit_df')
+        )
+        st.session_state['risk_summary_df'] = risk_summary_df
+        st.session_state['risk_summary_label'] = f"{replicates} replicates x {days} days from {st.session_state['current_sim_date']:%Y-%m-%d} (seed {seed})"
+        st.toast(f"Risk analysis complete: {replicates} replicates over {days} days.")
+    else:
+        st.warning("Inventory data not fully loaded or session state incomplete. Cannot run risk analysis.")
 
-# --- Main Area: Display Data or Error ---
-st.header("Inventory Status")
+@instrumented
+def optimize_policy_callback():
+    """Callback to search each item's buffer_days / target_days for a better reorder policy."""
+    print("Optimize Policy callback triggered.") # Debug print
+    if 'item_params_df' in st.session_state and st.session_state['item_params_df'] is not None \
+       and st.session_state.get('batch_store') is not None \
+       and 'current_sim_date' in st.session_state:
 
-# Check the DataFrames stored in session state
-item_params_df = st.session_state.get('item_params_df', None)
-batches_df = st.session_state.get('batches_df', None)
-current_sim_date = st.session_state.get('current_sim_date', date.today())
+        policy_df = optimize_reorder_policy(
+            current_batches_df(),
+            st.session_state['item_params_df'],
+            st.session_state['current_sim_date'] + timedelta(days=1)
+        )
+        st.session_state['policy_df'] = policy_df
+        if policy_df is not None:
+            st.toast(f"Optimized reorder policies for {len(policy_df)} items.")
+    else:
+        st.warning("Inventory data not fully loaded or session state incomplete. Cannot optimize reorder policies.")
+
+@instrumented
+def save_policies_callback():
+    """Callback to write the recommended policies to the database and apply them to the session."""
+    policy_df = st.session_state.get('policy_df')
+    if policy_df is None or st.session_state.get('item_params_df') is None:
+        st.warning("No recommended policies to save.")
+        return
+
+    if save_item_policies(policy_df):
+        # Apply the new parameters (and derived ROP/ROQ) to the current session as well
+        item_params_df = st.session_state['item_params_df'].copy()
+        for col in ['buffer_days', 'target_days', 'reorder_point', 'reorder_quantity']:
+            item_params_df.loc[policy_df.index, col] = policy_df[col]
+        st.session_state['item_params_df'] = item_params_df
+        st.session_state['policy_df'] = None
+        apply_forecast_policy() # Forecast ROP/ROQ follow the new buffer/target days
+        bump_inventory_version()
+        st.toast(f"Saved reorder policies for {len(policy_df)} items.")
+    else:
+        st.error("Failed to save reorder policies to the database.")
+
+def apply_forecast_policy():
+    """
+    Replaces the session's ROP/ROQ with the forecaster's while forecast reorder points are on.
+
+    The forecast covers buffer_days / target_days from tomorrow plus safety
+    stock at the sidebar's service level (see DemandForecaster.reorder_policy).
+    The values are session-only; the database keeps its own.
+    """
+    item_params_df = st.session_state.get('item_params_df')
+    forecaster = st.session_state.get('forecaster')
+    if not st.session_state.get('forecast_policy', False) or item_params_df is None or forecaster is None:
+        return
+    forecast_df = forecaster.reorder_policy(item_params_df, st.session_state['current_sim_date'] + timedelta(days=1),
+                                            st.session_state.get('forecast_service_level', DEFAULT_SERVICE_LEVEL))
+    if forecast_df is None:
+        return
+    item_params_df = item_params_df.copy()
+    item_params_df[['reorder_point', 'reorder_quantity']] = forecast_df[['reorder_point', 'reorder_quantity']]
+    st.session_state['item_params_df'] = item_params_df
+    st.session_state['forecast_df'] = forecast_df
+    bump_inventory_version()
+
+@instrumented
+def forecast_policy_callback():
+    """Callback for the forecast toggle and service level: applies forecast ROP/ROQ, or restores the static ones."""
+    item_params_df = st.session_state.get('item_params_df')
+    if item_params_df is None:
+        return
+    if st.session_state.get('forecast_policy', False):
+        apply_forecast_policy()
+        return
+    # Back to the database's definition: max daily usage times buffer / target days
+    item_params_df = item_params_df.copy()
+    item_params_df['reorder_point'] = item_params_df['max_daily_usage'] * item_params_df['buffer_days']
+    item_params_df['reorder_quantity'] = item_params_df['max_daily_usage'] * item_params_df['target_days']
+    st.session_state['item_params_df'] = item_params_df
+    st.session_state['forecast_df'] = None
+    bump_inventory_version()
+
+@instrumented
+def save_changes_callback():
+    """Callback to write all pending batch changes to the database now."""
+    batch_journal = st.session_state.get('batch_journal')
+    if st.session_state.get('batch_store') is None:
+        st.warning("Cannot save changes: Batch data not loaded.")
+        return
+    if batch_journal is None:
+        st.warning("Cannot save changes: This session was resumed from a checkpoint and is not linked to the database.")
+        return
+    written = batch_journal.flush(st.session_state['batch_store'])
+    if written is None and batch_journal.conflict:
+        st.error(WRITE_CONFLICT_MESSAGE)
+    elif written is None:
+        st.error("Failed to save batch changes to the database.")
+    elif written:
+        refresh_inventory() # New lots now carry their database ids
+        st.toast(f"Saved {written} batch changes to the database.")
+    else:
+        st.toast("No unsaved batch changes.")
+
+def checkpoint_path() -> str | None:
+    """The checkpoint directory named in the sidebar, inside CHECKPOINT_ROOT; None (with an error shown) if the name is not allowed."""
+    name = st.session_state.get('checkpoint_path') or DEFAULT_CHECKPOINT_NAME
+    path = resolve_checkpoint_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), CHECKPOINT_ROOT), name)
+    if path is None:
+        st.error(f"Invalid checkpoint name '{name}': use a relative name inside '{CHECKPOINT_ROOT}/', without '..'.")
+    return path
+
+@instrumented
+def save_checkpoint_callback():
+    """Callback to save the current simulation state as a checkpoint."""
+    if st.session_state.get('batch_store') is None or st.session_state.get('item_params_df') is None:
+        st.warning("Cannot save checkpoint: Inventory data not loaded.")
+        return
+    path = checkpoint_path()
+    if path is None:
+        return
+    if save_checkpoint(path, st.session_state['batch_store'], st.session_state['item_params_df'],
+                       st.session_state['current_sim_date'], st.session_state['day_count'],
+                       st.session_state.get('history'), st.session_state.get('in_transit_df')):
+        st.toast(f"Saved checkpoint for day {st.session_state['day_count']} to {path}.")
+    else:
+        st.error(f"Failed to save checkpoint to {path}.")
+
+@instrumented
+def load_checkpoint_callback():
+    """Callback to replace the session's simulation state with a saved checkpoint."""
+    path = checkpoint_path()
+    if path is None:
+        return
+    state = load_checkpoint(path)
+    if state is None:
+        st.error(f"Failed to load checkpoint from {path}.")
+        return
+    st.session_state['item_params_df'] = state['item_params_df']
+    st.session_state['batch_store'] = state['batch_store']
+    # The checkpoint's lots are not the database's, so write-back is off for this session
+    st.session_state['batch_journal'] = None
+    st.session_state['current_sim_date'] = state['current_sim_date']
+    st.session_state['day_count'] = state['day_count']
+    st.session_state['history'] = state['history'] if state['history'] is not None else HistoryStore(state['item_params_df'].index)
+    # Demand is not checkpointed; the forecaster starts over from the usage parameters
+    st.session_state['forecaster'] = DemandForecaster(state['item_params_df'])
+    st.session_state['forecast_df'] = None
+    st.session_state['in_transit_df'] = state['in_transit_df']
+    # Results computed from the previous state no longer apply
+    st.session_state['risk_summary_df'] = None
+    st.session_state['policy_df'] = None
+    refresh_inventory()
+    st.toast(f"Resumed from checkpoint at day {state['day_count']}.")
+
+# --- Page Sections (Fragments) ---
+def rerun_if_inventory_changed():
+    """
+    Reruns the whole page if the inventory changed since the page was last rendered.
+
+    Fragments rerun on their own, so an order or discard made inside one
+    would otherwise leave the other sections showing the old inventory.
+    """
+    if st.session_state.get('page_inventory_version') != st.session_state.get('inventory_version'):
+        st.rerun()
+
+@st.fragment
+@instrumented
+def render_status_table():
+    """
+    Inventory status table, rendered as a fragment.
+
+    Sorting, filtering and paging rerun only this fragment, and only the
+    visible page's rows and buttons are built. Filtering and sorting are
+    done on the cached per-item summary.
+    """
+    rerun_if_inventory_changed()
+    inventory_summary = get_inventory_summary()
+    if inventory_summary is None:
+        st.info("Inventory summary not available.")
+        return
+
+    # --- Table Controls ---
+    control_cols = st.columns([3, 3, 2, 1, 1])
+    status_filter = control_cols[0].multiselect("Status", STATUS_ORDER, key='status_table_status')
+    category_filter = []
+    if 'category' in inventory_summary.columns:
+        categories = sorted(inventory_summary['category'].dropna().unique().tolist())
+        category_filter = control_cols[1].multiselect("Category", categories, key='status_table_category')
+    sort_label = control_cols[2].selectbox("Sort by", list(STATUS_TABLE_SORT_COLUMNS), key='status_table_sort')
+    descending = control_cols[3].toggle("Desc.", key='status_table_descending')
+    page_size = control_cols[4].selectbox("Rows", STATUS_TABLE_PAGE_SIZES, key='status_table_page_size')
+
+    # --- Filter / Sort (server side, on the summary) ---
+    visible = inventory_summary
+    if status_filter:
+        visible = visible[visible['status'].isin(status_filter)]
+    if category_filter:
+        visible = visible[visible['category'].isin(category_filter)]
+    sort_column = STATUS_TABLE_SORT_COLUMNS[sort_label]
+    if sort_column is None:
+        visible = visible.sort_index(ascending=not descending, kind='stable')
+    elif sort_column == 'status':
+        status_rank = pd.Categorical(visible['status'], categories=STATUS_ORDER, ordered=True).codes
+        visible = visible.iloc[np.argsort(-status_rank if descending else status_rank, kind='stable')]
+    else:
+        visible = visible.sort_values(sort_column, ascending=not descending, kind='stable', na_position='last')
 
-# Display current simulation date
-st.metric("Current Simulation Date", current_sim_date.strftime('%Y-%m-%d'))
+    # --- Pagination ---
+    n_pages = max(1, -(-len(visible) // page_size)) # Ceiling division
+    if st.session_state.get('status_table_page', 1) > n_pages:
+        st.session_state['status_table_page'] = n_pages # Filters may have shrunk the table
+    page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, step=1, key='status_table_page')
+    page_rows = visible.iloc[(page - 1) * page_size:page * page_size]
+    st.caption(f"Showing {len(page_rows)} of {len(visible)} items ({len(inventory_summary)} total).")
 
-if item_params_df is not None and batches_df is not None:
-    # --- Fully Integrated Table Display ---
-    # Define headers - Now 8 columns
+    # Define headers - 8 columns
     col_headers = st.columns(8)
     headers = ["Item Name", "Total QoH", "ROP", "Status", "Earliest Expiry", "Expiry Alerts", "Rec. Order Qty", "Action"] # Renamed "Alerts"
     for col, header in zip(col_headers, headers):
@@ -257,30 +552,24 @@ if item_params_df is not None and batches_df is not None:
 
     st.divider() # Add a visual separator
 
-    # Iterate through the item parameters index (item names)
-    for item_name in item_params_df.index:
+    # Iterate through the visible page of summary rows
+    for item_name, item_summary in page_rows.iterrows():
         cols = st.columns(8) # Match header columns
         cols[0].write(item_name) # Column 0: Item Name
 
-        # Filter batches for the current item
-        item_batches = batches_df[batches_df['item_name'] == item_name]
-        # Calculate total quantity on hand for the item
-        total_qoh = item_batches['quantity_on_hand'].sum()
+        total_qoh = item_summary['total_qoh']
         cols[1].write(total_qoh) # Column 1: Total QoH
 
-        # Get ROP and RoQ from item_params_df
-        try:
-            rop = int(item_params_df.loc[item_name, 'reorder_point'])
-            roq = int(item_params_df.loc[item_name, 'reorder_quantity'])
-        except (KeyError, ValueError):
-            rop = 0 # Default if missing or invalid
-            roq = 0 # Default if missing or invalid
+        # ROP and RoQ (NaN in the summary if missing or invalid)
+        if pd.isna(item_summary['reorder_point']) or pd.isna(item_summary['reorder_quantity']):
             st.warning(f"Missing/invalid ROP/RoQ for {item_name}")
+        rop = 0 if pd.isna(item_summary['reorder_point']) else int(item_summary['reorder_point'])
+        roq = 0 if pd.isna(item_summary['reorder_quantity']) else int(item_summary['reorder_quantity'])
 
         cols[2].write(rop) # Column 2: ROP
 
-        # Calculate overall item status
-        item_status = calculate_status(total_qoh, rop)
+        # Overall item status
+        item_status = item_summary['status']
 
         # Column 3: Status (Overall) - with color
         if item_status == "Reorder Needed":
@@ -292,11 +581,11 @@ if item_params_df is not None and batches_df is not None:
         else: # Fallback for "Error" status from calculate_status
             cols[3].write(item_status)
 
-        # Calculate expiry summary stats
-        if not item_batches.empty and 'expiry_date' in item_batches.columns and 'expiry_status' in item_batches.columns:
-            earliest_expiry_date = item_batches['expiry_date'].min()
-            nearing_count = item_batches[item_batches['expiry_status'] == 'Nearing Expiry'].shape[0]
-            expired_count = item_batches[item_batches['expiry_status'] == 'Expired'].shape[0]
+        # Expiry summary stats
+        if item_summary['batch_count'] > 0:
+            earliest_expiry_date = item_summary['earliest_expiry']
+            nearing_count = item_summary['nearing_count']
+            expired_count = item_summary['expired_count']
 
             # Format earliest expiry date
             if pd.isna(earliest_expiry_date):
@@ -334,50 +623,11 @@ if item_params_df is not None and batches_df is not None:
         else:
             cols[7].write("") # Keep the column empty if no action is needed
 
-    # st.caption(f"Displaying inventory status at the end of Day {current_day}.") # Optional caption
-
-    st.divider() # Add separator before the alerts section
-
-    # --- Reorder Suggestions Section (Moved from Sidebar) ---
-    st.divider() # Keep the divider for separation
-    st.subheader("Reorder Suggestions")
-
-    # Check if data is loaded before attempting to calculate suggestions
-    if 'item_params_df' in st.session_state and st.session_state['item_params_df'] is not None \
-       and 'batches_df' in st.session_state and st.session_state['batches_df'] is not None:
-
-        items_to_reorder = []
-        local_item_params_df = st.session_state['item_params_df'] # Local reference
-        local_batches_df = st.session_state['batches_df']       # Local reference
-
-        for item_name in local_item_params_df.index:
-            try:
-                # Calculate total QoH for the item
-                item_batches = local_batches_df[local_batches_df['item_name'] == item_name]
-                total_qoh = item_batches['quantity_on_hand'].sum()
-
-                # Get ROP and RoQ safely
-                rop = int(local_item_params_df.loc[item_name, 'reorder_point'])
-                roq = int(local_item_params_df.loc[item_name, 'reorder_quantity'])
-
-                # Calculate status
-                item_status = calculate_status(total_qoh, rop)
-
-                if item_status == "Reorder Needed":
-                    items_to_reorder.append({'Item': item_name, 'Reorder Qty': roq})
-            except (KeyError, ValueError) as e:
-                st.warning(f"Data issue for {item_name}: {e}") # Warn about specific item issues
-
-        if items_to_reorder:
-            reorder_df = pd.DataFrame(items_to_reorder)
-            st.dataframe(reorder_df, hide_index=True) # Use st.dataframe (no sidebar)
-            st.button("Reorder All Suggested", on_click=reorder_all_callback, key="reorder_all_main") # Use st.button, changed key
-        else:
-            st.info("No items need reordering.") # Use st.info (no sidebar)
-    else:
-        st.warning("Inventory data not loaded.") # Use st.warning (no sidebar)
-
-    # --- Inventory Trends Graph ---
+@st.fragment
+@instrumented
+def render_inventory_trends():
+    """Inventory trends chart, rendered as a fragment so item selection reruns only the chart."""
+    rerun_if_inventory_changed()
     st.subheader("Inventory Trends")
     if 'item_params_df' in st.session_state and st.session_state['item_params_df'] is not None:
         item_list = st.session_state['item_params_df'].index.tolist()
@@ -393,28 +643,34 @@ if item_params_df is not None and batches_df is not None:
             default=item_list[:min(2, len(item_list))] # Default to first 2 items or fewer
         )
 
-        if st.session_state.get('history') and selected_items:
-            history_df = pd.DataFrame(st.session_state['history'])
-            filtered_history = history_df[history_df['item_name'].isin(selected_items)]
+        if st.session_state.get('history') is not None and len(st.session_state['history']) > 0 and selected_items:
+            # Only the selected columns, downsampled (min/max preserved) to a few hundred points
+            chart_data = st.session_state['history'].frame(selected_items, max_points=HISTORY_CHART_POINTS)
 
-            if not filtered_history.empty:
-                chart_data = filtered_history.pivot(index='day', columns='item_name', values='total_qoh')
+            if not chart_data.empty:
                 st.line_chart(chart_data)
             else:
                 st.info("No history recorded yet for selected items.")
         else:
             st.info("Run simulation or select items to see history graph.")
 
-    # --- Expiring & Expired Batches Section ---
+@st.fragment
+@instrumented
+def render_expiry_alerts():
+    """Expiring & expired batches with discard actions, rendered as a fragment."""
+    rerun_if_inventory_changed()
+    batch_store = st.session_state.get('batch_store')
     st.subheader("Expiring & Expired Batches") # Renamed section header
-    if batches_df is not None and 'expiry_status' in batches_df.columns:
-        # Filter for expiring/expired batches
-        alerts_df = batches_df[batches_df['expiry_status'].isin(['Nearing Expiry', 'Expired'])]
+    if batch_store is not None and batch_store.status_day is not None:
+        # Only the expiring/expired lots are exported, not the whole store
+        alerts_df = batch_store.lots_with_status(['Nearing Expiry', 'Expired'])
 
         if alerts_df.empty:
             st.info("No items currently nearing expiry or expired.")
         else:
             st.warning("Items requiring attention:") # Add a title/warning
+            if (alerts_df['expiry_status'] == 'Expired').any():
+                st.button("Discard All Expired", on_click=discard_expired_callback)
 
             # --- Custom Table with Discard Buttons ---
             # Define headers
@@ -440,6 +696,193 @@ if item_params_df is not None and batches_df is not None:
     else:
         st.info("Batch data or expiry status not available for alerts.")
 
+# --- Title ---
+st.title("Pawfect inventory")
+
+# --- Session State Initialization ---
+# Check if the item parameters DataFrame is already in the session state
+if 'item_params_df' not in st.session_state:
+    print("Initializing session state...")
+    # Attempt to load data only if it's not already loaded (shared across sessions, reloaded only if the DB changed)
+    item_params_df, batches_df, sim_state = load_shared_inventory_data() # Unpack the tuple
+    if item_params_df is not None and batches_df is not None: # Check if both loaded successfully
+        st.session_state['item_params_df'] = item_params_df
+        # Initialize simulation date BEFORE calculating expiry status: resume the clock the lots were saved at
+        st.session_state['current_sim_date'] = sim_state['current_sim_date'] or date.today()
+        # Batches live in the batch store; views that need every lot export it (current_batches_df)
+        st.session_state['batch_store'] = BatchStore.from_dataframe(batches_df, item_params_df.index,
+                                                                    st.session_state['current_sim_date'], ALERT_DAYS_BEFORE_EXPIRY)
+        # Record lot changes from here on for batched write-back to the database (checked against the loaded revision)
+        st.session_state['batch_journal'] = BatchJournal(sim_state=sim_state)
+        st.session_state['batch_store'].journal = st.session_state['batch_journal']
+        # Calculate initial expiry status right after loading
+        refresh_inventory()
+        st.session_state['day_count'] = sim_state['day_count'] # Initialize day count on successful load
+        st.session_state['history'] = HistoryStore(item_params_df.index) # Initialize (day x item) history on successful load
+        st.session_state['forecaster'] = DemandForecaster(item_params_df)
+        st.session_state['in_transit_df'] = pd.DataFrame(columns=IN_TRANSIT_COLUMNS) # No orders in transit yet
+        print("Data loaded successfully into session state and initial expiry status calculated.")
+    else:
+        # Store None if loading failed, to prevent trying again
+        st.session_state['item_params_df'] = None
+        st.session_state['batch_store'] = None
+        st.session_state['batch_journal'] = None
+        st.session_state['current_sim_date'] = date.today() # Initialize date even on failure
+        st.session_state['day_count'] = 0 # Initialize day count even on failure
+        st.session_state['history'] = HistoryStore([]) # Initialize empty history even on failure
+        st.session_state['forecaster'] = None
+        st.session_state['in_transit_df'] = pd.DataFrame(columns=IN_TRANSIT_COLUMNS)
+        print("Failed to load data during initialization.")
+
+# --- Sidebar ---
+st.sidebar.header("Simulation Controls")
+# Display the current day count from session state
+current_day = st.session_state.get('day_count', 0)
+st.sidebar.metric("Simulation Day", current_day)
+
+# Add the button to trigger the simulation step
+st.sidebar.button("Advance One Day", on_click=advance_day_callback)
+st.sidebar.button("Advance One Week", on_click=advance_week_callback)
+st.sidebar.button("Advance 90 Days", on_click=advance_days_callback, args=(90,))
+st.sidebar.button("Advance 365 Days", on_click=advance_days_callback, args=(365,))
+st.sidebar.toggle("Automatic Reordering", key='auto_reorder', help="Reorder at the ROP with per-item lead times while simulating.")
+
+st.sidebar.subheader("Risk Analysis")
+st.sidebar.number_input("Replicates", min_value=10, max_value=100000, value=200, step=100, key='risk_replicates')
+st.sidebar.number_input("Horizon (days)", min_value=1, max_value=3650, value=90, step=30, key='risk_days')
+st.sidebar.number_input("Seed", min_value=0, value=0, step=1, key='risk_seed')
+st.sidebar.button("Run Monte Carlo", on_click=run_risk_analysis_callback)
+
+st.sidebar.subheader("Reorder Policy")
+st.sidebar.button("Optimize Reorder Policies", on_click=optimize_policy_callback)
+st.sidebar.toggle("Forecast Reorder Points", key='forecast_policy', on_change=forecast_policy_callback,
+                  help="Set ROP/ROQ from smoothed daily demand (with weekday seasonality) plus safety stock, updated every simulated day.")
+st.sidebar.slider("Service Level", min_value=0.50, max_value=0.999, value=DEFAULT_SERVICE_LEVEL, step=0.005,
+                  key='forecast_service_level', on_change=forecast_policy_callback,
+                  disabled=not st.session_state.get('forecast_policy', False))
+
+st.sidebar.subheader("Database")
+st.sidebar.toggle("Auto-save Changes", key='auto_save',
+                  help="Write simulated batch changes back to the database in batches (every few hundred changes or 30 seconds).")
+if st.session_state.get('batch_journal') is not None:
+    if st.session_state['batch_journal'].conflict:
+        st.sidebar.error(WRITE_CONFLICT_MESSAGE)
+    st.sidebar.caption(f"{len(st.session_state['batch_journal'])} unsaved batch changes")
+st.sidebar.button("Save Changes Now", on_click=save_changes_callback)
+
+st.sidebar.subheader("Checkpoints")
+st.sidebar.text_input("Checkpoint Name", value=DEFAULT_CHECKPOINT_NAME, key='checkpoint_path',
+                      help=f"Saved simulation states, stored under '{CHECKPOINT_ROOT}/' in the app directory. "
+                           "An existing directory is only replaced if it holds a checkpoint.")
+st.sidebar.button("Save Checkpoint", on_click=save_checkpoint_callback)
+st.sidebar.button("Load Checkpoint", on_click=load_checkpoint_callback)
+
+st.sidebar.subheader("Performance")
+st.sidebar.toggle("Show Timings", key='perf_panel',
+                  help="Time spent per loader call, simulation step, callback and page render in this session.")
+if st.session_state.get('perf_panel', False):
+    timings_df = session_tracer().stats()
+    if timings_df.empty:
+        st.sidebar.caption("No timings recorded yet.")
+    else:
+        st.sidebar.dataframe(timings_df, column_config={
+            column: st.column_config.NumberColumn(format="%.1f") for column in ['total_ms', 'mean_ms', 'max_ms']
+        })
+    # The exports are built only when a button is clicked
+    st.sidebar.download_button("Export Timings (JSON)", session_tracer().to_json, file_name='inventory_timings.json',
+                               mime='application/json', on_click='ignore')
+    st.sidebar.download_button("Export Chrome Trace", session_tracer().to_chrome_trace, file_name='inventory_trace.json',
+                               mime='application/json', on_click='ignore',
+                               help="Open in chrome://tracing or ui.perfetto.dev.")
+    st.sidebar.button("Reset Timings", on_click=reset_timings_callback)
+
+
+# --- Main Area: Display Data or Error ---
+st.header("Inventory Status")
+# Fragments compare against this to detect inventory changes made by other sections
+st.session_state['page_inventory_version'] = st.session_state.get('inventory_version')
+
+# Check the DataFrames stored in session state
+item_params_df = st.session_state.get('item_params_df', None)
+batch_store = st.session_state.get('batch_store', None)
+current_sim_date = st.session_state.get('current_sim_date', date.today())
+
+# Display current simulation date
+st.metric("Current Simulation Date", current_sim_date.strftime('%Y-%m-%d'))
+
+if item_params_df is not None and batch_store is not None:
+    # --- Inventory Status Table ---
+    render_status_table()
+
+    # st.caption(f"Displaying inventory status at the end of Day {current_day}.") # Optional caption
+
+    st.divider() # Add separator before the alerts section
+
+    # --- Reorder Suggestions Section (Moved from Sidebar) ---
+    st.divider() # Keep the divider for separation
+    st.subheader("Reorder Suggestions")
+
+    # Check if data is loaded before attempting to calculate suggestions
+    if 'item_params_df' in st.session_state and st.session_state['item_params_df'] is not None \
+       and st.session_state.get('batch_store') is not None:
+
+        # Items flagged in the cached summary; items with invalid ROP/RoQ are reported and skipped
+        inventory_summary = get_inventory_summary()
+        invalid = inventory_summary['reorder_point'].isna() | inventory_summary['reorder_quantity'].isna()
+        if invalid.any():
+            st.warning(f"Data issue for {list(inventory_summary.index[invalid])}: invalid reorder point or quantity.")
+        reorder_needed = (inventory_summary['status'] == "Reorder Needed") & ~invalid
+        items_to_reorder = pd.DataFrame({'Item': inventory_summary.index[reorder_needed],
+                                         'Reorder Qty': inventory_summary.loc[reorder_needed, 'reorder_quantity'].astype(int).to_numpy()})
+
+        if not items_to_reorder.empty:
+            st.dataframe(items_to_reorder, hide_index=True) # Use st.dataframe (no sidebar)
+            st.button("Reorder All Suggested", on_click=reorder_all_callback, key="reorder_all_main") # Use st.button, changed key
+        else:
+            st.info("No items need reordering.") # Use st.info (no sidebar)
+    else:
+        st.warning("Inventory data not loaded.") # Use st.warning (no sidebar)
+
+    # --- Inventory Trends Graph ---
+    render_inventory_trends()
+
+    # --- Orders In Transit Section ---
+    in_transit_df = st.session_state.get('in_transit_df')
+    if in_transit_df is not None and not in_transit_df.empty:
+        st.subheader("Orders In Transit")
+        st.dataframe(in_transit_df.sort_values('arrival_date'), hide_index=True)
+
+    # --- Stockout & Waste Risk Section ---
+    if st.session_state.get('risk_summary_df') is not None:
+        st.subheader("Stockout & Waste Risk")
+        st.caption(st.session_state.get('risk_summary_label', ''))
+        st.dataframe(
+            st.session_state['risk_summary_df'].sort_values('stockout_probability', ascending=False),
+            column_config={'stockout_probability': st.column_config.ProgressColumn("Stockout Probability", min_value=0.0, max_value=1.0)}
+        )
+
+    # --- Recommended Reorder Policies Section ---
+    if st.session_state.get('policy_df') is not None:
+        st.subheader("Recommended Reorder Policies")
+        st.dataframe(st.session_state['policy_df'])
+        st.button("Save Recommended Policies", on_click=save_policies_callback)
+
+    # --- Demand Forecast Section ---
+    if st.session_state.get('forecast_policy', False) and st.session_state.get('forecast_df') is not None:
+        st.subheader("Demand Forecast")
+        st.caption(f"Fitted on {st.session_state['forecaster'].n_days} days of demand; "
+                   f"ROP/ROQ at a {st.session_state.get('forecast_service_level', DEFAULT_SERVICE_LEVEL):.1%} service level.")
+        st.dataframe(st.session_state['forecast_df'], column_config={
+            'forecast_daily_demand': st.column_config.NumberColumn("Forecast / Day", format="%.1f"),
+            'forecast_std': st.column_config.NumberColumn("Error Std", format="%.1f"),
+            'safety_stock': st.column_config.NumberColumn("Safety Stock", format="%.1f"),
+            'reorder_point': "ROP",
+            'reorder_quantity': "ROQ",
+        })
+
+    # --- Expiring & Expired Batches Section ---
+    render_expiry_alerts()
+
 
 else:
     # Display an error message if loading failed during initialization
@@ -447,3 +890,6 @@ else:
 
 # --- Placeholder for future elements ---
 # Add other controls or display elements later
+
+# Whole-page render time; shown in the performance panel from the next run on
+session_tracer().record('app.render', render_start_ns, time.perf_counter_ns() - render_start_ns)
@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+import time
+
+from data_loader import WriteConflictError, save_batch_changes
+from perf_trace import traced
+from simulation import _NAT_DAY
+
+# --- Constants ---
+FLUSH_MAX_CHANGES = 500 # Pending changes that trigger a write-back
+FLUSH_INTERVAL_SECONDS = 30.0 # Oldest pending change age that triggers a write-back
+
+class BatchJournal:
+    """
+    Pending lot changes of a simulation session, written back to inventory_batches in batches.
+
+    Changes are coalesced per lot as they are recorded:
+
+    - quantity changes of a lot keep only the latest quantity,
+    - lots received since the last write-back are held as provisional rows
+      (keyed by their in-memory batch id) that absorb later quantity changes,
+    - a removed lot drops its pending update, or its provisional row if it
+      was never written.
+
+    The simulation clock (record_clock) is saved in the same transaction,
+    so the saved lots and the date they were simulated to stay together.
+
+    flush() sends everything in one transaction (see
+    data_loader.save_batch_changes) and renames the provisional lots in the
+    store to the ids the database assigned. maybe_flush() does so only once
+    flush_max_changes are pending or the oldest pending change is
+    flush_interval_seconds old, so a click costs a few dict updates rather
+    than a commit.
+
+    The journal carries the database revision its session loaded. If
+    another session saved in the meantime, the write is refused, the
+    journal is marked as in conflict and stops writing: its changes are
+    based on lots that are no longer the database's.
+    """
+
+    def __init__(self, db_name='inventory_poc.db', flush_max_changes: int = FLUSH_MAX_CHANGES,
+                 flush_interval_seconds: float = FLUSH_INTERVAL_SECONDS, sim_state: dict | None = None):
+        self.db_name = db_name
+        self.flush_max_changes = int(flush_max_changes)
+        self.flush_interval_seconds = float(flush_interval_seconds)
+        sim_state = sim_state or {} # As returned by data_loader.load_sim_state
+        self.revision = int(sim_state.get('revision', 0)) # Database revision the session's lots are based on
+        self.conflict = False # Set when another session saved first; no further writes
+        self._clock = (sim_state.get('current_sim_date'), int(sim_state.get('day_count', 0))) # (current_sim_date, day_count)
+        self._clock_changed = False
+        self._quantities = {} # batch_id -> quantity_on_hand, for lots already in the database
+        self._received = {} # provisional batch_id -> [item_name, quantity_on_hand, expiry 'YYYY-MM-DD' or None]
+        self._discarded = set() # batch_ids to delete from the database
+        self._pending_since = None # time.monotonic() of the oldest unflushed change
+
+    def __len__(self) -> int:
+        """Number of pending row changes (the simulation clock counts as one)."""
+        return len(self._quantities) + len(self._received) + len(self._discarded) + self._clock_changed
+
+    # --- Recording ---
+    def record_quantities(self, batch_ids, quantities) -> None:
+        """Records the new quantity on hand of existing lots."""
+        for batch_id, quantity in zip(np.asarray(batch_ids).tolist(), np.asarray(quantities).tolist()):
+            received = self._received.get(batch_id)
+            if received is not None:
+                received[1] = int(quantity)
+            else:
+                self._quantities[batch_id] = int(quantity)
+        self._touch()
+
+    def record_received(self, batch_ids, item_names, quantities, expiry_days) -> None:
+        """Records new lots under their provisional (in-memory) batch ids; expiry_days as in BatchStore."""
+        expiry = [None if day == _NAT_DAY else str(np.datetime64(day, 'D')) for day in np.asarray(expiry_days, dtype=np.int64).tolist()]
+        for batch_id, item_name, quantity, expiry_date in zip(np.asarray(batch_ids).tolist(), list(item_names),
+                                                              np.asarray(quantities).tolist(), expiry):
+            self._received[batch_id] = [item_name, int(quantity), expiry_date]
+        self._touch()
+
+    def record_discarded(self, batch_ids) -> None:
+        """Records removed lots (discarded or fully consumed)."""
+        for batch_id in np.asarray(batch_ids).tolist():
+            if self._received.pop(batch_id, None) is None:
+                self._quantities.pop(batch_id, None)
+                self._discarded.add(batch_id)
+        self._touch()
+
+    def record_clock(self, current_sim_date, day_count: int) -> None:
+        """Records the simulation date and day count the lots have been simulated to."""
+        self._clock = (current_sim_date, int(day_count))
+        self._clock_changed = True
+        self._touch()
+
+    def record_snapshot(self, before_df: pd.DataFrame, after_df: pd.DataFrame) -> None:
+        """
+        Records the difference between two batches states (indexed by batch_id).
+
+        Used when the whole batch table is replaced at once, e.g. by a
+        multi-day simulate_horizon run: lots only in before_df are removed,
+        lots only in after_df are received, and common lots whose quantity
+        differs are updated.
+        """
+        before_df = before_df if before_df is not None else pd.DataFrame(columns=['item_name', 'quantity_on_hand', 'expiry_date'])
+        after_df = after_df if after_df is not None else before_df.iloc[0:0]
+        common = before_df.index.intersection(after_df.index)
+        before_qoh = before_df.loc[common, 'quantity_on_hand'].to_numpy()
+        after_qoh = after_df.loc[common, 'quantity_on_hand'].to_numpy()
+        changed = common[before_qoh != after_qoh]
+        self.record_discarded(before_df.index.difference(after_df.index))
+        self.record_quantities(changed, after_df.loc[changed, 'quantity_on_hand'])
+
+        added = after_df.loc[after_df.index.difference(before_df.index)]
+        if not added.empty:
+            expiry = pd.to_datetime(added['expiry_date'], errors='coerce').to_numpy(dtype='datetime64[D]').astype(np.int64)
+            self.record_received(added.index, added['item_name'], added['quantity_on_hand'], expiry) # NaT -> _NAT_DAY
+
+    # --- Write-back ---
+    def is_due(self) -> bool:
+        """True if the pending changes reached flush_max_changes or have waited flush_interval_seconds."""
+        if self._pending_since is None:
+            return False
+        return len(self) >= self.flush_max_changes or time.monotonic() - self._pending_since >= self.flush_interval_seconds
+
+    def maybe_flush(self, batch_store=None) -> int:
+        """Flushes if is_due(); returns the number of row changes written (0 if none, on failure or in conflict)."""
+        if self.conflict or not self.is_due():
+            return 0
+        return self.flush(batch_store) or 0
+
+    @traced('batch_journal.flush', rows=lambda result, *args, **kwargs: result)
+    def flush(self, batch_store=None) -> int | None:
+        """
+        Writes all pending changes to the database in one transaction.
+
+        Args:
+            batch_store: The BatchStore holding the provisional lots. Their ids
+                         are replaced by the database ids, and new ids start at
+                         its next_batch_id so they never clash with ids in memory.
+
+        Returns:
+            int | None: The number of row changes written, or None if the write
+            failed (the changes stay pending and are retried on the next flush)
+            or conflicted with another session (see conflict; never retried).
+        """
+        if self.conflict:
+            return None
+        if len(self) == 0:
+            return 0
+        provisional_ids = list(self._received)
+        new_batches = [{'item_name': item_name, 'quantity_on_hand': quantity, 'expiry_date': expiry_date}
+                       for item_name, quantity, expiry_date in self._received.values()]
+        quantity_updates = [{'batch_id': batch_id, 'quantity_on_hand': quantity} for batch_id, quantity in self._quantities.items()]
+        min_batch_id = batch_store.next_batch_id if batch_store is not None else 1
+        # Every write carries the clock and is checked against the revision
+        sim_state = {'current_sim_date': self._clock[0], 'day_count': self._clock[1], 'revision': self.revision}
+
+        try:
+            new_ids = save_batch_changes(quantity_updates, new_batches, self._discarded, min_batch_id, sim_state, self.db_name)
+        except WriteConflictError:
+            self.conflict = True
+            return None
+        if new_ids is None:
+            return None
+        self.revision += 1
+
+        if batch_store is not None:
+            batch_store.reassign_batch_ids(provisional_ids, new_ids)
+        written = len(self)
+        self.clear()
+        return written
+
+    def clear(self) -> None:
+        """Drops all pending changes without writing them."""
+        self._quantities.clear()
+        self._received.clear()
+        self._discarded.clear()
+        self._clock_changed = False
+        self._pending_since = None
+
+    # --- Internals ---
+    def _touch(self):
+        """Starts the flush interval clock at the first pending change."""
+        if self._pending_since is None and len(self):
+            self._pending_since = time.monotonic()
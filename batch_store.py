@@ -0,0 +1,668 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from perf_trace import span, traced, rows_of_result
+from simulation import (_draw_daily_demand, _fefo_consume_sorted, _lot_keys, _day_number, _summarize_lots, _NAT_DAY,
+                        ALERT_DAYS_BEFORE_EXPIRY)
+
+# --- Constants ---
+INITIAL_CAPACITY = 1024 # Slots allocated up front; capacity doubles when full
+COMPACT_MIN_DEAD = 1024 # Compact once at least this many slots are dead and they outnumber live ones
+EXPIRY_STATUS_LABELS = np.array(["OK", "Nearing Expiry", "Expired", "Unknown"], dtype=object) # Indexed by status code
+EXPIRY_STATUS_DTYPE = pd.CategoricalDtype(EXPIRY_STATUS_LABELS) # Exported 'expiry_status': status codes are the category codes
+STATUS_OK, STATUS_NEARING, STATUS_EXPIRED, STATUS_UNKNOWN = range(4)
+SLOT_COLUMNS = ('_batch_id', '_code', '_expiry', '_qoh', '_alive', '_status')
+RUN_LENGTH = 4096 # Entries per sorted run of an index; a run is split once it reaches twice this
+
+class _SortedRuns:
+    """
+    An index of int64 (key, value) pairs sorted by key, held as a list of short sorted runs.
+
+    An insert binary-searches the runs' last keys and copies only the run it
+    lands in, so it costs O(log n + RUN_LENGTH) instead of copying the whole
+    index. Range queries touch only the runs that overlap the range. Readers
+    that need the whole index as flat arrays (the FEFO kernel, checkpoints)
+    get a concatenation that is cached until the next insert.
+
+    Equal keys keep insertion order: new entries go after existing ones.
+    """
+
+    def __init__(self):
+        self.assign(np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+
+    def __len__(self) -> int:
+        return sum(run.size for run in self._keys)
+
+    def assign(self, keys: np.ndarray, values: np.ndarray):
+        """Replaces the contents with already sorted keys and their aligned values."""
+        starts = range(0, keys.size, RUN_LENGTH)
+        self._keys = [keys[start:start + RUN_LENGTH] for start in starts]
+        self._values = [values[start:start + RUN_LENGTH] for start in starts]
+        self._last = np.array([run[-1] for run in self._keys], dtype=np.int64) # Last key of each run
+        self._flat = (keys, values)
+
+    def insert(self, keys: np.ndarray, values: np.ndarray):
+        """Adds entries (in any order); only the runs they fall into are copied."""
+        if keys.size == 0:
+            return
+        order = np.argsort(keys, kind='stable')
+        keys, values = keys[order], values[order]
+        if not self._keys:
+            self.assign(keys, values)
+            return
+
+        # Each entry goes to the first run whose last key is greater (after equal keys), or the last run
+        runs = np.minimum(np.searchsorted(self._last, keys, side='right'), len(self._keys) - 1)
+        bounds = np.flatnonzero(np.r_[True, runs[1:] != runs[:-1], True])
+        # Back to front, so splitting a run does not shift the runs still to be visited
+        for start, end in reversed(list(zip(bounds[:-1], bounds[1:]))):
+            run = int(runs[start])
+            run_keys = self._keys[run]
+            positions = np.searchsorted(run_keys, keys[start:end], side='right')
+            run_keys = np.insert(run_keys, positions, keys[start:end])
+            run_values = np.insert(self._values[run], positions, values[start:end])
+            # A run that has grown to twice RUN_LENGTH is split into runs of RUN_LENGTH
+            starts = list(range(0, run_keys.size, RUN_LENGTH)) if run_keys.size >= 2 * RUN_LENGTH else [0]
+            ends = starts[1:] + [run_keys.size]
+            self._keys[run:run + 1] = [run_keys[start:stop] for start, stop in zip(starts, ends)]
+            self._values[run:run + 1] = [run_values[start:stop] for start, stop in zip(starts, ends)]
+            self._last = np.concatenate([self._last[:run], run_keys[np.array(ends) - 1], self._last[run + 1:]])
+        self._flat = None
+
+    def arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        """All (keys, values) as flat sorted arrays."""
+        if self._flat is None:
+            self._flat = (np.concatenate(self._keys), np.concatenate(self._values))
+        return self._flat
+
+    def values_between(self, low: int, high: int) -> np.ndarray:
+        """Values of the entries with low <= key < high, in key order."""
+        first, last = np.searchsorted(self._last, [low, high], side='left')
+        pieces = []
+        for run in range(int(first), min(int(last), len(self._keys) - 1) + 1):
+            start, end = np.searchsorted(self._keys[run], [low, high], side='left')
+            pieces.append(self._values[run][start:end])
+        return np.concatenate(pieces) if pieces else np.array([], dtype=np.int64)
+
+class BatchStore:
+    """
+    In-memory inventory batches kept in FEFO order, with cheap single-lot updates.
+
+    Lots live in array-backed columns (batch id, item code, expiry day,
+    quantity). A separate FEFO index keeps every lot sorted by
+    (item, expiry), so each item's lots form one contiguous, expiry-ordered
+    run and FEFO consumption for all items is a single vectorized pass.
+    The index is split into short sorted runs (see _SortedRuns).
+
+    - receive: binary search for the lot's (item, expiry) position, then an
+      insert that copies one run; O(log n + RUN_LENGTH).
+    - discard: dict lookup of the batch id and a tombstone; O(1).
+    - consume: one pass of the FEFO kernel over the sorted order.
+
+    Dead (discarded or emptied) slots are compacted away in bulk once they
+    outnumber live ones. A DataFrame is only built when to_dataframe() is
+    called, e.g. for display.
+
+    If a journal (see batch_journal.BatchJournal) is attached, every
+    received, re-quantified and removed lot is also recorded there so the
+    changes can be written back to the database in batches.
+
+    Expiry status is kept per lot and updated incrementally. A lot's status
+    only changes on two days fixed by its expiry: it becomes "Nearing Expiry"
+    on expiry - alert_days + 1 and "Expired" on expiry + 1. A second index
+    keeps all lots sorted by expiry, so moving the status date from D1 to D2
+    re-classifies only the lots with a transition in (D1, D2], found by two
+    binary searches. The same index answers expiring_within() queries.
+    """
+
+    def __init__(self, item_names=(), alert_days: int = ALERT_DAYS_BEFORE_EXPIRY):
+        self._item_names = []
+        self._item_codes = {}
+        self._item_dtype = None # CategoricalDtype over _item_names for exports, rebuilt when the catalogue grows
+        self._codes_for(item_names)
+
+        self._batch_id = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self._code = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self._expiry = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self._qoh = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self._alive = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self._status = np.zeros(INITIAL_CAPACITY, dtype=np.int8) # Expiry status code as of _status_day
+        self._size = 0 # Slots in use (live + dead)
+        self._dead = 0
+
+        self._fefo = _SortedRuns() # Lot key -> slot, sorted by (item, expiry, arrival)
+        self._by_expiry = _SortedRuns() # Expiry day -> slot (transition index)
+        self.alert_days = int(alert_days)
+        self._status_day = None # Day the stored statuses are valid for (None: not classified yet)
+        self._slot_of = {} # batch_id -> slot
+        self._next_batch_id = 1
+        self.version = 0 # Incremented on every mutation
+        self.journal = None # Optional BatchJournal recording mutations for write-back
+
+    # --- Construction / Export ---
+    @classmethod
+    @traced('batch_store.from_dataframe', rows=lambda result, *args, **kwargs: len(result))
+    def from_dataframe(cls, batches_df: pd.DataFrame, item_names=(), current_sim_date: date | None = None,
+                       alert_days: int = ALERT_DAYS_BEFORE_EXPIRY) -> 'BatchStore':
+        """
+        Builds a store from a batches DataFrame ('item_name', 'quantity_on_hand', 'expiry_date').
+
+        An integer index is used as the batch ids; otherwise ids are assigned
+        in row order. Rows with the same item and expiry keep their row order
+        for FEFO, like advance_day. If current_sim_date is given, expiry
+        statuses are classified for that date.
+        """
+        store = cls(item_names, alert_days)
+        if batches_df is None or batches_df.empty:
+            if current_sim_date is not None:
+                store.update_status(current_sim_date)
+            return store
+
+        n = len(batches_df)
+        if pd.api.types.is_integer_dtype(batches_df.index) and batches_df.index.is_unique:
+            batch_ids = batches_df.index.to_numpy().astype(np.int64)
+        else:
+            batch_ids = np.arange(1, n + 1, dtype=np.int64)
+
+        expiry = batches_df['expiry_date']
+        if not pd.api.types.is_datetime64_any_dtype(expiry):
+            expiry = pd.to_datetime(expiry, errors='coerce')
+
+        store._reserve(n)
+        store._batch_id[:n] = batch_ids
+        store._code[:n] = store._codes_for(batches_df['item_name'])
+        store._expiry[:n] = expiry.to_numpy(dtype='datetime64[D]').astype(np.int64) # NaT -> _NAT_DAY
+        store._qoh[:n] = pd.to_numeric(batches_df['quantity_on_hand'], errors='coerce').fillna(0).to_numpy().astype(np.int64)
+        store._alive[:n] = True
+        store._size = n
+
+        store._slot_of = dict(zip(batch_ids.tolist(), range(n)))
+        store._next_batch_id = int(batch_ids.max()) + 1
+        store._rebuild_order()
+        if current_sim_date is not None:
+            store.update_status(current_sim_date)
+        return store
+
+    def to_arrays(self) -> dict:
+        """
+        The live lots as plain arrays, for checkpoints (see from_arrays).
+
+        Slot columns are compacted in arrival order ('batch_id', 'code',
+        'expiry', 'qoh', 'status'); the FEFO order ('order', 'keys') and the
+        expiry index ('expiry_slots', 'expiry_days') are carried along so
+        that loading needs no sort.
+        """
+        live = self._alive[:self._size]
+        new_slot = np.cumsum(live) - 1 # Compacted slot of each live slot
+        keys, order = self._fefo.arrays()
+        expiry_days, expiry_slots = self._by_expiry.arrays()
+        in_order = live[order]
+        in_expiry = live[expiry_slots]
+        return {
+            'batch_id': self._batch_id[:self._size][live],
+            'code': self._code[:self._size][live],
+            'expiry': self._expiry[:self._size][live],
+            'qoh': self._qoh[:self._size][live],
+            'status': self._status[:self._size][live],
+            'order': new_slot[order[in_order]],
+            'keys': keys[in_order],
+            'expiry_slots': new_slot[expiry_slots[in_expiry]],
+            'expiry_days': expiry_days[in_expiry],
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, item_names, alert_days: int = ALERT_DAYS_BEFORE_EXPIRY,
+                    status_day: int | None = None, next_batch_id: int | None = None) -> 'BatchStore':
+        """
+        Rebuilds a store from to_arrays() output.
+
+        The arrays are adopted without copying, so (copy-on-write)
+        memory-mapped arrays stay on disk until they are modified or the
+        store grows.
+
+        Args:
+            arrays: The dict returned by to_arrays().
+            item_names: The item catalogue the codes refer to (item_names of the saved store).
+            alert_days: Nearing-expiry window of the saved store.
+            status_day: Day number the saved statuses are valid for (None: not classified).
+            next_batch_id: next_batch_id of the saved store (default: one past the largest id).
+        """
+        store = cls(item_names, alert_days)
+        n = len(arrays['batch_id'])
+        store._batch_id = arrays['batch_id']
+        store._code = arrays['code']
+        store._expiry = arrays['expiry']
+        store._qoh = arrays['qoh']
+        store._status = arrays['status']
+        store._alive = np.ones(n, dtype=bool)
+        store._size = n
+        store._fefo.assign(arrays['keys'], arrays['order'])
+        store._by_expiry.assign(arrays['expiry_days'], arrays['expiry_slots'])
+        store._status_day = status_day
+        store._slot_of = dict(zip(store._batch_id.tolist(), range(n)))
+        if next_batch_id is None:
+            next_batch_id = int(store._batch_id.max()) + 1 if n else 1
+        store._next_batch_id = int(next_batch_id)
+        return store
+
+    @traced('batch_store.to_dataframe', rows=rows_of_result)
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Exports the live lots (in arrival order) as a batches DataFrame indexed by batch_id.
+
+        Includes an 'expiry_status' column once statuses have been classified
+        (see update_status).
+        """
+        return self._export(np.flatnonzero(self._alive[:self._size]))
+
+    # --- Mutations ---
+    def receive(self, item_name: str, quantity: int, expiry_date, batch_id: int | None = None) -> int:
+        """
+        Adds a lot at its (item, expiry) position and returns its batch id.
+
+        Args:
+            item_name: The item the lot belongs to (added to the catalogue if new).
+            quantity: Quantity received.
+            expiry_date: Expiry date of the lot (date-like, or None/NaT if unknown).
+            batch_id: Explicit id (e.g. assigned by the database); defaults to the next free id.
+        """
+        if batch_id is None:
+            batch_id = self._next_batch_id
+        batch_id = int(batch_id)
+        if batch_id in self._slot_of:
+            raise ValueError(f"Batch ID {batch_id} already exists in the store.")
+
+        self._reserve(1)
+        slot = self._size
+        code = self._item_codes.get(item_name)
+        if code is None:
+            code = int(self._codes_for([item_name])[0])
+        expiry_day = _NAT_DAY if pd.isna(expiry_date) else _day_number(expiry_date)
+
+        self._batch_id[slot] = batch_id
+        self._code[slot] = code
+        self._expiry[slot] = expiry_day
+        self._qoh[slot] = int(quantity)
+        self._alive[slot] = True
+        self._size += 1
+        self._index_slots(np.array([slot]))
+
+        self._slot_of[batch_id] = slot
+        self._next_batch_id = max(self._next_batch_id, batch_id + 1)
+        self.version += 1
+        if self.journal is not None:
+            self.journal.record_received([batch_id], [item_name], [int(quantity)], [expiry_day])
+        return batch_id
+
+    @traced('batch_store.receive_many', rows=rows_of_result)
+    def receive_many(self, new_batches_df: pd.DataFrame, batch_ids=None) -> np.ndarray:
+        """
+        Adds several lots in one pass and returns their batch ids.
+
+        Args:
+            new_batches_df: Batches with 'item_name', 'quantity_on_hand' and
+                            'expiry_date' (e.g. from simulation.build_new_batches).
+            batch_ids: Explicit ids aligned with the rows; defaults to consecutive new ids.
+        """
+        n = 0 if new_batches_df is None else len(new_batches_df)
+        if n == 0:
+            return np.array([], dtype=np.int64)
+
+        if batch_ids is None:
+            batch_ids = np.arange(self._next_batch_id, self._next_batch_id + n, dtype=np.int64)
+        batch_ids = np.asarray(batch_ids, dtype=np.int64)
+        if len(set(batch_ids.tolist())) != n or any(batch_id in self._slot_of for batch_id in batch_ids.tolist()):
+            raise ValueError("Batch IDs must be unique and not already in the store.")
+
+        expiry = new_batches_df['expiry_date']
+        if not pd.api.types.is_datetime64_any_dtype(expiry):
+            expiry = pd.to_datetime(expiry, errors='coerce')
+
+        self._reserve(n)
+        slots = np.arange(self._size, self._size + n)
+        self._batch_id[slots] = batch_ids
+        self._code[slots] = self._codes_for(new_batches_df['item_name'])
+        self._expiry[slots] = expiry.to_numpy(dtype='datetime64[D]').astype(np.int64) # NaT -> _NAT_DAY
+        self._qoh[slots] = pd.to_numeric(new_batches_df['quantity_on_hand'], errors='coerce').fillna(0).to_numpy().astype(np.int64)
+        self._alive[slots] = True
+        self._size += n
+        self._index_slots(slots)
+
+        self._slot_of.update(zip(batch_ids.tolist(), slots.tolist()))
+        self._next_batch_id = max(self._next_batch_id, int(batch_ids.max()) + 1)
+        self.version += 1
+        if self.journal is not None:
+            self.journal.record_received(batch_ids, np.asarray(self._item_names, dtype=object)[self._code[slots]],
+                                         self._qoh[slots], self._expiry[slots])
+        return batch_ids
+
+    def discard(self, batch_id) -> bool:
+        """Removes a lot by batch id. Returns False if the id is unknown."""
+        slot = self._slot_of.pop(int(batch_id), None) if batch_id is not None else None
+        if slot is None:
+            return False
+        self._kill(np.array([slot]))
+        self.version += 1
+        if self.journal is not None:
+            self.journal.record_discarded([int(batch_id)])
+        self._maybe_compact()
+        return True
+
+    @traced('batch_store.discard_many', rows=lambda result, *args, **kwargs: result)
+    def discard_many(self, batch_ids) -> int:
+        """Removes several lots by batch id. Unknown ids are ignored; returns the number removed."""
+        slots = [self._slot_of.pop(int(batch_id)) for batch_id in batch_ids if batch_id is not None and int(batch_id) in self._slot_of]
+        if not slots:
+            return 0
+        slots = np.array(slots, dtype=np.int64)
+        self._kill(slots)
+        self.version += 1
+        if self.journal is not None:
+            self.journal.record_discarded(self._batch_id[slots])
+        self._maybe_compact()
+        return len(slots)
+
+    def consume(self, demand: np.ndarray, current_sim_date: date) -> np.ndarray:
+        """
+        Consumes FEFO from lots that are not yet expired on current_sim_date.
+
+        Args:
+            demand: Demand per item code (aligned with self.item_names).
+            current_sim_date: The simulation date of the consumption.
+
+        Returns:
+            The quantity actually consumed per item code. Lots that reach 0
+            are removed, as in advance_day.
+        """
+        with span('batch_store.consume') as trace: # rows: the lots drawn from or removed, not the store size
+            n_items = len(self._item_names)
+            item_demand = np.zeros(n_items, dtype=np.int64) # Items added to the catalogue later have no demand
+            demand = np.asarray(demand, dtype=np.int64)[:n_items]
+            item_demand[:demand.size] = demand
+            consumed_per_item = np.zeros(n_items, dtype=np.int64)
+
+            order = self._fefo.arrays()[1]
+            drawn = np.zeros(order.size, dtype=bool)
+            if order.size and item_demand.any():
+                day = _day_number(current_sim_date)
+                available = np.where(self._alive[order] & (self._expiry[order] >= day), self._qoh[order], 0)
+                available[available < 0] = 0
+                consumed = _fefo_consume_sorted(self._code[order], available, item_demand)
+                drawn = consumed > 0
+
+                self._qoh[order] -= consumed
+                consumed_per_item = np.bincount(self._code[order], weights=consumed, minlength=n_items).astype(np.int64)
+                if self.journal is not None:
+                    # Lots that were drawn from but not emptied keep their row with a new quantity
+                    touched = order[drawn & (self._qoh[order] > 0)]
+                    self.journal.record_quantities(self._batch_id[touched], self._qoh[touched])
+
+            # Remove lots that have been fully consumed
+            removed = self._alive[order] & (self._qoh[order] <= 0)
+            emptied = order[removed]
+            trace.rows = int(np.count_nonzero(drawn | removed))
+            if emptied.size:
+                for batch_id in self._batch_id[emptied].tolist():
+                    del self._slot_of[batch_id]
+                if self.journal is not None:
+                    self.journal.record_discarded(self._batch_id[emptied])
+                self._kill(emptied)
+                self._maybe_compact()
+            self.version += 1
+        return consumed_per_item
+
+    def advance_day(self, item_params_df: pd.DataFrame, current_sim_date: date,
+                    return_demand: bool = False) -> np.ndarray | tuple[np.ndarray, np.ndarray]:
+        """
+        Simulates one day of FEFO consumption in place (see simulation.advance_day).
+
+        Demand is drawn with the same per-item random.randint calls as
+        simulation.advance_day, so seeded runs match.
+
+        Returns:
+            The quantity consumed per item, aligned with item_params_df.index.
+            With return_demand, a tuple (consumed, demand) that also holds the
+            demand drawn per item, whether or not stock covered it.
+        """
+        item_demand = _draw_daily_demand(item_params_df)
+        codes = self._codes_for(item_params_df.index)
+        demand = np.zeros(len(self._item_names), dtype=np.int64)
+        demand[codes] = item_demand
+        consumed = self.consume(demand, current_sim_date)[codes]
+        return (consumed, item_demand) if return_demand else consumed
+
+    def reassign_batch_ids(self, old_ids, new_ids) -> None:
+        """
+        Renames lots, e.g. from provisional ids to the ids the database assigned on write-back.
+
+        Args:
+            old_ids: Current batch ids of the lots (unknown ids are skipped).
+            new_ids: Replacement ids aligned with old_ids; they must not be used
+                     by any lot that is not itself being renamed.
+        """
+        old_ids = np.asarray(old_ids, dtype=np.int64)
+        new_ids = np.asarray(new_ids, dtype=np.int64)
+        known = np.array([batch_id in self._slot_of for batch_id in old_ids.tolist()], dtype=bool)
+        old_ids, new_ids = old_ids[known], new_ids[known]
+        if old_ids.size == 0:
+            return
+        renamed = set(old_ids.tolist())
+        if len(set(new_ids.tolist())) != new_ids.size or any(batch_id in self._slot_of and batch_id not in renamed
+                                                             for batch_id in new_ids.tolist()):
+            raise ValueError("New batch IDs must be unique and not used by other lots in the store.")
+
+        slots = np.array([self._slot_of.pop(batch_id) for batch_id in old_ids.tolist()], dtype=np.int64)
+        self._batch_id[slots] = new_ids
+        self._slot_of.update(zip(new_ids.tolist(), slots.tolist()))
+        self._next_batch_id = max(self._next_batch_id, int(new_ids.max()) + 1)
+        self.version += 1
+
+    # --- Expiry Status ---
+    @traced('batch_store.update_status', rows=lambda result, *args, **kwargs: result)
+    def update_status(self, current_sim_date: date) -> int:
+        """
+        Brings every lot's expiry status up to current_sim_date.
+
+        Moving forward only re-classifies lots with a transition in
+        (previous date, current_sim_date]; moving backward (or the first
+        call) classifies all lots.
+
+        Returns:
+            The number of lots re-classified.
+        """
+        day = _day_number(current_sim_date)
+        if self._status_day is None or day < self._status_day:
+            slots = np.arange(self._size)
+        elif day == self._status_day:
+            return 0
+        else:
+            # Lots turning "Nearing Expiry" (expiry in [D1 + alert, D2 + alert))
+            # and lots turning "Expired" (expiry in [D1, D2))
+            slots = np.concatenate([self._by_expiry.values_between(self._status_day + self.alert_days, day + self.alert_days),
+                                    self._by_expiry.values_between(self._status_day, day)])
+            slots = slots[self._alive[slots]]
+
+        self._status_day = day
+        self._status[slots] = self._classify(slots)
+        if slots.size:
+            self.version += 1
+        return slots.size
+
+    def expiring_within(self, days: int, current_sim_date: date | None = None) -> pd.DataFrame:
+        """
+        The live lots expiring in the next `days` days (expiry in [date, date + days)).
+
+        Uses the expiry index, so the cost depends on the number of matching
+        lots rather than the size of the store. Defaults to the status date.
+        """
+        if current_sim_date is not None:
+            day = _day_number(current_sim_date)
+        elif self._status_day is not None:
+            day = self._status_day
+        else:
+            raise ValueError("No date given and expiry statuses have not been classified yet.")
+        slots = self._by_expiry.values_between(day, day + int(days))
+        return self._export(slots[self._alive[slots]])
+
+    def lots_with_status(self, statuses) -> pd.DataFrame:
+        """The live lots whose current expiry status is one of `statuses` (labels)."""
+        if self._status_day is None:
+            raise ValueError("Expiry statuses have not been classified yet; call update_status first.")
+        codes = [code for code, label in enumerate(EXPIRY_STATUS_LABELS) if label in set(statuses)]
+        slots = np.flatnonzero(self._alive[:self._size] & np.isin(self._status[:self._size], codes))
+        return self._export(slots)
+
+    # --- Queries ---
+    @property
+    def item_names(self) -> list:
+        """Item catalogue; an item's position is its code."""
+        return list(self._item_names)
+
+    @property
+    def status_day(self) -> int | None:
+        """Day number the expiry statuses are valid for (None until update_status is called)."""
+        return self._status_day
+
+    @property
+    def next_batch_id(self) -> int:
+        """The id the next lot receives by default; every id in use (or used before) is lower."""
+        return self._next_batch_id
+
+    def __len__(self) -> int:
+        return self._size - self._dead
+
+    def __contains__(self, batch_id) -> bool:
+        return batch_id is not None and int(batch_id) in self._slot_of
+
+    def quantity_by_item(self, item_names=None) -> pd.Series:
+        """Total quantity on hand per item (all items in the catalogue, or those given)."""
+        totals = np.bincount(self._code[:self._size], weights=np.where(self._alive[:self._size], self._qoh[:self._size], 0),
+                             minlength=len(self._item_names)).astype(np.int64)
+        totals = pd.Series(totals, index=pd.Index(self._item_names, name='item_name'), name='quantity_on_hand')
+        return totals if item_names is None else totals.reindex(item_names, fill_value=0)
+
+    @traced('batch_store.summarize', rows=lambda result, store, *args, **kwargs: len(store))
+    def summarize(self, item_params_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Per-item summary as in simulation.summarize_inventory, computed from the
+        slot columns without exporting the lots. Expiry counts use the stored
+        statuses (none are counted before update_status is first called).
+        """
+        live = np.flatnonzero(self._alive[:self._size])
+        positions = pd.Index(item_params_df.index).get_indexer(pd.Index(self._item_names, dtype=object))
+        codes = positions[self._code[live]] if positions.size else np.array([], dtype=np.int64)
+        live, codes = live[codes >= 0], codes[codes >= 0] # Lots of items not in item_params_df are left out
+        expiry = self._expiry[live]
+        status = self._status[live] if self._status_day is not None else np.full(live.size, STATUS_UNKNOWN, dtype=np.int8)
+        return _summarize_lots(
+            item_params_df, codes, self._qoh[live],
+            np.where(expiry == _NAT_DAY, np.iinfo(np.int64).min, expiry).astype('datetime64[D]').astype('datetime64[s]'),
+            status == STATUS_NEARING, status == STATUS_EXPIRED,
+        )
+
+    def item_lots(self, item_name: str) -> pd.DataFrame:
+        """The live lots of one item in FEFO order."""
+        code = self._item_codes.get(item_name)
+        if code is None:
+            return self.to_dataframe().iloc[0:0]
+        slots = self._fefo.values_between(np.int64(code) << 32, np.int64(code + 1) << 32)
+        slots = slots[self._alive[slots]]
+        return pd.DataFrame({
+            'quantity_on_hand': self._qoh[slots],
+            'expiry_date': pd.to_datetime(np.where(self._expiry[slots] == _NAT_DAY, np.iinfo(np.int64).min, self._expiry[slots]).astype('datetime64[D]')),
+        }, index=pd.Index(self._batch_id[slots], name='batch_id'))
+
+    # --- Internals ---
+    def _codes_for(self, item_names) -> np.ndarray:
+        """Maps item names to codes, extending the catalogue with unseen names."""
+        if isinstance(getattr(item_names, 'dtype', None), pd.CategoricalDtype):
+            # Map the distinct names once, then translate the category codes (-1: missing name)
+            category_codes = np.append(self._codes_for(item_names.dtype.categories), -1)
+            return category_codes[pd.Series(item_names, copy=False).cat.codes.to_numpy()]
+        for item_name in pd.unique(pd.Series(item_names, dtype=object)):
+            if item_name not in self._item_codes:
+                self._item_codes[item_name] = len(self._item_names)
+                self._item_names.append(item_name)
+                self._item_dtype = None
+        return pd.Index(self._item_names, dtype=object).get_indexer(pd.Index(item_names, dtype=object)).astype(np.int64)
+
+    def _export(self, slots: np.ndarray) -> pd.DataFrame:
+        """
+        Builds a batches DataFrame for the given slots.
+
+        'item_name' (and 'expiry_status') are Categoricals whose codes are the
+        store's own item (status) codes, so no per-lot strings are created;
+        all exports of a store share one item dtype.
+        """
+        if self._item_dtype is None:
+            self._item_dtype = pd.CategoricalDtype(pd.Index(self._item_names, dtype=object))
+        expiry = self._expiry[slots]
+        batches_df = pd.DataFrame({
+            'item_name': pd.Categorical.from_codes(self._code[slots], dtype=self._item_dtype),
+            'quantity_on_hand': self._qoh[slots],
+            'expiry_date': pd.to_datetime(np.where(expiry == _NAT_DAY, np.iinfo(np.int64).min, expiry).astype('datetime64[D]')),
+        }, index=pd.Index(self._batch_id[slots], name='batch_id'))
+        if self._status_day is not None:
+            batches_df['expiry_status'] = pd.Categorical.from_codes(self._status[slots], dtype=EXPIRY_STATUS_DTYPE)
+        return batches_df
+
+    def _classify(self, slots: np.ndarray) -> np.ndarray:
+        """Expiry status codes of the given slots as of _status_day (same rules as calculate_expiry_status)."""
+        expiry = self._expiry[slots]
+        return np.select(
+            [expiry == _NAT_DAY, expiry < self._status_day, expiry < self._status_day + self.alert_days],
+            [STATUS_UNKNOWN, STATUS_EXPIRED, STATUS_NEARING],
+            default=STATUS_OK
+        ).astype(np.int8)
+
+    def _index_slots(self, slots: np.ndarray):
+        """Merges newly filled slots into the FEFO order and the expiry index, and classifies them."""
+        # After existing lots with equal keys, so ties keep arrival order
+        self._fefo.insert(_lot_keys(self._code[slots], self._expiry[slots]), slots)
+        self._by_expiry.insert(self._expiry[slots], slots)
+
+        if self._status_day is not None:
+            self._status[slots] = self._classify(slots)
+
+    def _reserve(self, extra: int):
+        """Grows the slot columns (amortized doubling) to fit `extra` more slots."""
+        needed = self._size + extra
+        capacity = self._batch_id.size
+        if needed <= capacity:
+            return
+        capacity = max(capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+        for name in SLOT_COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def _kill(self, slots: np.ndarray):
+        """Marks slots dead; they stay in the FEFO index (with nothing available) until compaction."""
+        self._alive[slots] = False
+        self._qoh[slots] = 0
+        self._dead += slots.size
+
+    def _rebuild_order(self):
+        """Sorts all slots by (item, expiry), ties in slot (arrival) order, and rebuilds the expiry index."""
+        keys = _lot_keys(self._code[:self._size], self._expiry[:self._size])
+        order = np.argsort(keys, kind='stable')
+        self._fefo.assign(keys[order], order)
+        expiry_slots = np.argsort(self._expiry[:self._size], kind='stable')
+        self._by_expiry.assign(self._expiry[expiry_slots], expiry_slots)
+
+    def _maybe_compact(self):
+        """Drops dead slots once they outnumber live ones."""
+        if self._dead < COMPACT_MIN_DEAD or self._dead < self._size - self._dead:
+            return
+        live = np.flatnonzero(self._alive[:self._size])
+        for name in SLOT_COLUMNS:
+            column = getattr(self, name)
+            column[:live.size] = column[live]
+        self._size = live.size
+        self._dead = 0
+        self._slot_of = dict(zip(self._batch_id[:self._size].tolist(), range(self._size)))
+        self._rebuild_order()
@@ -0,0 +1,232 @@
+import numpy as np
+import pandas as pd
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+from batch_store import BatchStore
+from forecast import DemandForecaster
+from data_loader import BATCH_LOAD_CHUNK_ROWS, bulk_seed_database, dispose_engine, load_inventory_data
+from simulation import (add_new_batch, advance_day, calculate_expiry_status_series, discard_batch,
+                        simulate_horizon, summarize_inventory)
+from synthetic_data import generate_inventory
+
+# --- Constants ---
+SIZES = { # name -> (items, lots per item)
+    'xs': (100, 10),        # 1k lots
+    's': (1_000, 100),      # 100k lots
+    'm': (10_000, 100),     # 1M lots
+    'l': (100_000, 50),     # 5M lots
+}
+DEFAULT_SIZES = ['xs', 's']
+BASELINE_FILE = 'benchmark_baselines.json' # Next to this script
+REGRESSION_RATIO = 1.5 # Slower than baseline by more than this counts as a regression
+MIN_COMPARED_SECONDS = 0.001 # Timings below this on both sides are too noisy for a verdict
+BENCHMARK_SEED = 0
+BENCHMARK_DATE = date(2026, 1, 1) # Fixed "today" for the generated expiries and the simulation
+HORIZON_DAYS = 365
+
+# --- Cases ---
+# Each case takes the prepared context and returns a zero-argument callable;
+# only that callable is timed, so per-run setup (copies, fresh stores) is not.
+def _fresh_store(ctx: dict) -> BatchStore:
+    return BatchStore.from_dataframe(ctx['batches_df'], ctx['item_params_df'].index, BENCHMARK_DATE)
+
+def _case_load_inventory_data(ctx):
+    dispose_engine(ctx['db_path']) # Cold engine: pragmas, schema check and the full read
+    return lambda: load_inventory_data(ctx['db_path'], chunk_rows=BATCH_LOAD_CHUNK_ROWS)
+
+def _case_advance_day(ctx):
+    return lambda: advance_day(ctx['batches_df'], ctx['item_params_df'], BENCHMARK_DATE)
+
+def _case_store_advance_day(ctx):
+    store = _fresh_store(ctx)
+    return lambda: store.advance_day(ctx['item_params_df'], BENCHMARK_DATE)
+
+def _case_simulate_horizon(ctx):
+    return lambda: simulate_horizon(ctx['batches_df'], ctx['item_params_df'], BENCHMARK_DATE, HORIZON_DAYS,
+                                    np.random.default_rng(BENCHMARK_SEED))
+
+def _case_forecast_fit(ctx):
+    demand = np.random.default_rng(BENCHMARK_SEED).integers(0, 31, size=(HORIZON_DAYS, len(ctx['item_params_df'])))
+    forecaster = DemandForecaster(ctx['item_params_df'])
+    return lambda: forecaster.fit(BENCHMARK_DATE, demand).reorder_policy(ctx['item_params_df'], BENCHMARK_DATE)
+
+def _case_add_new_batch(ctx):
+    return lambda: add_new_batch(ctx['batches_df'], ctx['item_params_df'], ctx['item_params_df'].index[0], BENCHMARK_DATE)
+
+def _case_store_receive(ctx):
+    store = _fresh_store(ctx)
+    return lambda: store.receive(ctx['item_params_df'].index[0], 100, BENCHMARK_DATE)
+
+def _case_discard_batch(ctx):
+    return lambda: discard_batch(ctx['batches_df'], ctx['batches_df'].index[len(ctx['batches_df']) // 2])
+
+def _case_store_discard(ctx):
+    store = _fresh_store(ctx)
+    return lambda: store.discard(ctx['batches_df'].index[len(ctx['batches_df']) // 2])
+
+def _case_expiry_status_series(ctx):
+    return lambda: calculate_expiry_status_series(ctx['batches_df']['expiry_date'], BENCHMARK_DATE)
+
+def _case_store_update_status(ctx):
+    # Full classification (first call); later days only touch lots with a transition
+    store = BatchStore.from_dataframe(ctx['batches_df'], ctx['item_params_df'].index)
+    return lambda: store.update_status(BENCHMARK_DATE)
+
+def _case_summarize_inventory(ctx):
+    return lambda: summarize_inventory(ctx['batches_df'], ctx['item_params_df'], BENCHMARK_DATE)
+
+CASES = {
+    'load_inventory_data': _case_load_inventory_data,
+    'advance_day': _case_advance_day,
+    'store.advance_day': _case_store_advance_day,
+    'simulate_horizon_365': _case_simulate_horizon,
+    'forecast_fit_365': _case_forecast_fit,
+    'add_new_batch': _case_add_new_batch,
+    'store.receive': _case_store_receive,
+    'discard_batch': _case_discard_batch,
+    'store.discard': _case_store_discard,
+    'expiry_status_series': _case_expiry_status_series,
+    'store.update_status': _case_store_update_status,
+    'summarize_inventory': _case_summarize_inventory,
+}
+
+# --- Running ---
+def prepare_context(size: str, work_dir: str) -> dict:
+    """Generates the dataset for a size, bulk-loads it into a database in work_dir and loads it back like the app."""
+    n_items, lots_per_item = SIZES[size]
+    db_path = os.path.join(work_dir, f'bench_{size}.db')
+    items_df, batches_df = generate_inventory(n_items, lots_per_item, BENCHMARK_SEED, BENCHMARK_DATE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not bulk_seed_database(items_df, batches_df, db_path):
+            raise RuntimeError(f"Could not create the benchmark database for size {size}")
+        item_params_df, batches_df = load_inventory_data(db_path, chunk_rows=BATCH_LOAD_CHUNK_ROWS)
+    return {'db_path': db_path, 'item_params_df': item_params_df, 'batches_df': batches_df}
+
+def measure(case, ctx: dict, repeats: int) -> dict:
+    """
+    Times a case and records its peak traced memory.
+
+    Wall time is the best of `repeats` runs (each with its own setup)
+    without tracing. Peak memory comes from one extra run under
+    tracemalloc, which sees Python and NumPy allocations but slows
+    Python-heavy code, so it is not used for timing.
+    """
+    seconds = []
+    with contextlib.redirect_stdout(io.StringIO()): # The functions' progress messages
+        for _ in range(repeats):
+            random.seed(BENCHMARK_SEED)
+            run = case(ctx)
+            start = time.perf_counter()
+            run()
+            seconds.append(time.perf_counter() - start)
+
+        random.seed(BENCHMARK_SEED)
+        run = case(ctx)
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {'seconds': min(seconds), 'peak_mb': peak / 2**20}
+
+def run_benchmarks(sizes: list[str], case_names: list[str] | None = None, repeats: int = 3) -> dict:
+    """
+    Runs the selected cases for each size.
+
+    Returns:
+        dict: {'<size>/<case>': {'seconds': ..., 'peak_mb': ...}}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='inventory_bench_') as work_dir:
+        for size in sizes:
+            ctx = prepare_context(size, work_dir)
+            for name in case_names or list(CASES):
+                results[f'{size}/{name}'] = result = measure(CASES[name], ctx, repeats)
+                print(f"  {size:>3} {name:<24} {result['seconds'] * 1000:10.2f} ms {result['peak_mb']:10.1f} MB")
+            dispose_engine(ctx['db_path']) # Release the file before the directory is removed
+    return results
+
+# --- Baselines ---
+def load_baselines(path: str) -> dict:
+    """The stored results (see save_baselines), or {} if there are none."""
+    try:
+        with open(path) as f:
+            return json.load(f).get('results', {})
+    except (OSError, ValueError) as e:
+        print(f"No baselines loaded from {path}: {e}")
+        return {}
+
+def save_baselines(path: str, results: dict):
+    """Merges results into the baseline file, keeping entries for sizes/cases that were not run."""
+    baselines = load_baselines(path) if os.path.exists(path) else {}
+    baselines.update(results)
+    with open(path, 'w') as f:
+        json.dump({'machine': f"{platform.machine()} {platform.python_version()} numpy {np.__version__} pandas {pd.__version__}",
+                   'results': dict(sorted(baselines.items()))}, f, indent=2)
+    print(f"Saved {len(results)} baselines to {path}")
+
+def compare(results: dict, baselines: dict, regression_ratio: float = REGRESSION_RATIO) -> pd.DataFrame:
+    """
+    Compares results with baselines.
+
+    Returns:
+        pd.DataFrame: One row per benchmark with both timings, their ratio
+        (current / baseline; above 1 is slower) and a verdict: 'regression'
+        above regression_ratio, 'faster' below its inverse, 'new' without a
+        baseline, '' otherwise (or when both timings are below
+        MIN_COMPARED_SECONDS).
+    """
+    rows = []
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        ratio = result['seconds'] / baseline['seconds'] if baseline and baseline['seconds'] > 0 else np.nan
+        if baseline is None:
+            verdict = 'new'
+        elif max(result['seconds'], baseline['seconds']) < MIN_COMPARED_SECONDS:
+            verdict = ''
+        elif ratio > regression_ratio:
+            verdict = 'regression'
+        elif ratio < 1 / regression_ratio:
+            verdict = 'faster'
+        else:
+            verdict = ''
+        rows.append({'benchmark': key, 'ms': result['seconds'] * 1000, 'baseline_ms': baseline['seconds'] * 1000 if baseline else np.nan,
+                     'ratio': ratio, 'peak_mb': result['peak_mb'], 'baseline_peak_mb': baseline['peak_mb'] if baseline else np.nan,
+                     'verdict': verdict})
+    return pd.DataFrame(rows).set_index('benchmark')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the loader, simulation and dashboard hot paths.")
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES), help=f"Comma-separated sizes from {', '.join(SIZES)}")
+    parser.add_argument('--cases', default=None, help=f"Comma-separated cases (default: all of {', '.join(CASES)})")
+    parser.add_argument('--repeats', type=int, default=3, help="Timed runs per case (best is kept)")
+    parser.add_argument('--baselines', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), BASELINE_FILE),
+                        help="Baseline file to compare against")
+    parser.add_argument('--save-baselines', action='store_true', help="Store these results as the new baselines")
+    parser.add_argument('--check', action='store_true', help="Exit with status 1 if any benchmark regressed")
+    args = parser.parse_args()
+
+    sizes = args.sizes.split(',')
+    case_names = args.cases.split(',') if args.cases else None
+    unknown = [size for size in sizes if size not in SIZES] + [name for name in case_names or [] if name not in CASES]
+    if unknown:
+        parser.error(f"Unknown sizes or cases: {', '.join(unknown)}")
+
+    results = run_benchmarks(sizes, case_names, args.repeats)
+    comparison = compare(results, load_baselines(args.baselines))
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 160, 'display.float_format', '{:.2f}'.format):
+        print(comparison)
+    if args.save_baselines:
+        save_baselines(args.baselines, results)
+    raise SystemExit(1 if args.check and (comparison['verdict'] == 'regression').any() else 0)
@@ -0,0 +1,228 @@
+import numpy as np
+import pandas as pd
+import json
+import os
+import shutil
+from datetime import date
+
+from batch_store import BatchStore
+from history_store import HistoryStore
+from perf_trace import traced
+from simulation import ALERT_DAYS_BEFORE_EXPIRY, IN_TRANSIT_COLUMNS
+
+# --- Constants ---
+CHECKPOINT_FORMAT_VERSION = 1 # Bump when the file layout changes
+META_FILE = 'checkpoint.json'
+
+def is_checkpoint(path: str) -> bool:
+    """True if path is a directory with a checkpoint.json of the supported format_version (so it may be replaced)."""
+    if os.path.islink(path) or not os.path.isdir(path):
+        return False
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            return json.load(f).get('format_version') == CHECKPOINT_FORMAT_VERSION
+    except (OSError, ValueError, AttributeError):
+        return False
+
+def resolve_checkpoint_path(root: str, name: str) -> str | None:
+    """
+    Resolves a user-entered checkpoint name to a directory strictly inside root.
+
+    Args:
+        root (str): The directory that holds all checkpoints.
+        name (str): Relative checkpoint name, e.g. 'latest' or 'runs/a'.
+
+    Returns:
+        str | None: The absolute checkpoint directory, or None if name is
+        empty, absolute, contains '..' or resolves to root itself or
+        outside it (also through symlinks).
+    """
+    name = (name or '').strip()
+    if not name or os.path.isabs(name) or '..' in name.replace('\\', '/').split('/'):
+        print(f"Error: Invalid checkpoint name {name!r}; use a relative name without '..'.")
+        return None
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, name))
+    if path == root or os.path.commonpath([root, path]) != root:
+        print(f"Error: Checkpoint name {name!r} does not resolve to a directory inside {root}.")
+        return None
+    return path
+
+@traced('checkpoint.save_checkpoint', rows=lambda result, path, batch_store, *args, **kwargs: len(batch_store))
+def save_checkpoint(path: str, batch_store: BatchStore, item_params_df: pd.DataFrame, current_sim_date: date,
+                    day_count: int, history: HistoryStore | None = None, in_transit_df: pd.DataFrame | None = None) -> bool:
+    """
+    Saves a simulation state as a checkpoint directory.
+
+    Every column is written as its own uncompressed .npy file: numbers and
+    dates as-is, text as integer codes with the distinct values listed in
+    checkpoint.json. The batch store is saved as its internal arrays,
+    including its FEFO order and expiry index (BatchStore.to_arrays).
+    Loading can therefore memory-map the columns instead of parsing or
+    re-sorting them. The directory is written next to `path` first and then
+    moved into place, so an interrupted save never leaves a half-written
+    checkpoint behind.
+
+    An existing `path` is only replaced if it is a checkpoint itself (see
+    is_checkpoint); any other file or directory is left alone and the save
+    is refused.
+
+    Args:
+        path (str): Checkpoint directory (replaced if it holds a checkpoint).
+        batch_store (BatchStore): The live lots.
+        item_params_df (pd.DataFrame): Item parameters indexed by item_name.
+        current_sim_date (date): The simulation date of the state.
+        day_count (int): Simulated days so far.
+        history (HistoryStore | None): Daily quantity-on-hand history.
+        in_transit_df (pd.DataFrame | None): Orders in transit (IN_TRANSIT_COLUMNS).
+
+    Returns:
+        bool: True if the checkpoint was written, False otherwise.
+    """
+    if batch_store is None or item_params_df is None:
+        print("Error: Cannot save checkpoint without batches and item parameters.")
+        return False
+
+    path = os.path.abspath(path)
+    if os.path.lexists(path) and not is_checkpoint(path):
+        print(f"Error: {path} exists and is not a checkpoint; refusing to replace it.")
+        return False
+    staging_path = path + '.partial'
+    try:
+        shutil.rmtree(staging_path, ignore_errors=True)
+        os.makedirs(staging_path)
+
+        store_arrays = batch_store.to_arrays()
+        for name, values in store_arrays.items():
+            np.save(os.path.join(staging_path, f'store.{name}.npy'), values, allow_pickle=False)
+        meta = {
+            'format_version': CHECKPOINT_FORMAT_VERSION,
+            'current_sim_date': pd.Timestamp(current_sim_date).strftime('%Y-%m-%d'),
+            'day_count': int(day_count),
+            'store': {
+                'arrays': list(store_arrays),
+                'item_names': [str(name) for name in batch_store.item_names],
+                'alert_days': batch_store.alert_days,
+                'status_day': batch_store.status_day,
+                'next_batch_id': batch_store.next_batch_id,
+            },
+            'frames': {
+                'item_params': _save_frame(staging_path, 'item_params', item_params_df),
+                'in_transit': _save_frame(staging_path, 'in_transit',
+                                          in_transit_df if in_transit_df is not None else pd.DataFrame(columns=IN_TRANSIT_COLUMNS)),
+            },
+            'history': None,
+        }
+        if history is not None:
+            history_df = history.frame()
+            np.save(os.path.join(staging_path, 'history.days.npy'), history_df.index.to_numpy(dtype=np.int64))
+            np.save(os.path.join(staging_path, 'history.qoh.npy'), np.ascontiguousarray(history_df.to_numpy(dtype=np.int64)))
+            meta['history'] = {'item_names': [str(name) for name in history.item_names], 'max_days': history.max_days}
+
+        with open(os.path.join(staging_path, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+        if os.path.lexists(path):
+            if not is_checkpoint(path): # Re-checked right before deleting
+                raise OSError(f"{path} is no longer a checkpoint")
+            shutil.rmtree(path)
+        os.replace(staging_path, path)
+        print(f"Saved checkpoint with {len(batch_store)} batches to {path}")
+        return True
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Error saving checkpoint to {path}: {e}")
+        shutil.rmtree(staging_path, ignore_errors=True)
+        return False
+
+@traced('checkpoint.load_checkpoint', rows=lambda result, *args, **kwargs: len(result['batch_store']))
+def load_checkpoint(path: str) -> dict | None:
+    """
+    Loads a checkpoint written by save_checkpoint.
+
+    Columns are memory-mapped copy-on-write, so only the pages that are
+    used are read from disk. The batch store and history adopt their mapped
+    arrays as-is: many sessions forked from the same checkpoint share the
+    file's pages and only copy the ones they modify.
+
+    Args:
+        path (str): Checkpoint directory.
+
+    Returns:
+        dict | None: 'batch_store', 'item_params_df', 'current_sim_date',
+        'day_count', 'history' and 'in_transit_df', or None if the checkpoint
+        is missing or unreadable.
+    """
+    path = os.path.abspath(path)
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        if meta.get('format_version') != CHECKPOINT_FORMAT_VERSION:
+            print(f"Error: Unsupported checkpoint format {meta.get('format_version')} in {path}")
+            return None
+
+        current_sim_date = date.fromisoformat(meta['current_sim_date'])
+        item_params_df = _load_frame(path, 'item_params', meta['frames']['item_params'])
+        in_transit_df = _load_frame(path, 'in_transit', meta['frames']['in_transit'])
+        store_meta = meta['store']
+        batch_store = BatchStore.from_arrays(
+            {name: np.load(os.path.join(path, f'store.{name}.npy'), mmap_mode='c', allow_pickle=False) for name in store_meta['arrays']},
+            store_meta['item_names'],
+            store_meta.get('alert_days', ALERT_DAYS_BEFORE_EXPIRY),
+            store_meta.get('status_day'),
+            store_meta.get('next_batch_id')
+        )
+        batch_store.update_status(current_sim_date) # No-op unless the statuses were saved for another day
+
+        history = None
+        if meta.get('history') is not None:
+            history = HistoryStore.from_arrays(
+                meta['history']['item_names'],
+                np.load(os.path.join(path, 'history.days.npy')),
+                np.load(os.path.join(path, 'history.qoh.npy'), mmap_mode='c'),
+                max_days=meta['history'].get('max_days')
+            )
+
+        print(f"Loaded checkpoint with {len(batch_store)} batches from {path}")
+        return {
+            'batch_store': batch_store,
+            'item_params_df': item_params_df,
+            'current_sim_date': current_sim_date,
+            'day_count': int(meta['day_count']),
+            'history': history,
+            'in_transit_df': in_transit_df,
+        }
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Error loading checkpoint from {path}: {e}")
+        return None
+
+# --- Column Files ---
+def _save_frame(directory: str, name: str, df: pd.DataFrame) -> dict:
+    """Writes the index and columns of df as <name>.<position>.npy files and returns their description for the metadata."""
+    index_names = [index_name if index_name is not None else '__index__' for index_name in df.index.names]
+    df = df.rename_axis(index_names).reset_index()
+    columns = []
+    for position, column_name in enumerate(df.columns):
+        column = df[column_name]
+        spec = {'name': str(column_name), 'dtype': str(column.dtype)}
+        if pd.api.types.is_numeric_dtype(column) or pd.api.types.is_datetime64_any_dtype(column):
+            values = column.to_numpy()
+        else:
+            # Text (or other objects): integer codes into the distinct values, -1 for missing
+            values, uniques = pd.factorize(column)
+            values = values.astype(np.int32)
+            spec['categories'] = [str(value) for value in uniques]
+        np.save(os.path.join(directory, f'{name}.{position}.npy'), values, allow_pickle=False)
+        columns.append(spec)
+    return {'index': index_names, 'columns': columns}
+
+def _load_frame(directory: str, name: str, spec: dict) -> pd.DataFrame:
+    """Rebuilds a DataFrame saved by _save_frame from memory-mapped column files."""
+    data = {}
+    for position, column in enumerate(spec['columns']):
+        values = np.load(os.path.join(directory, f'{name}.{position}.npy'), mmap_mode='r', allow_pickle=False)
+        if 'categories' in column:
+            values = pd.Series(pd.Categorical.from_codes(values, categories=column['categories'])).astype(column['dtype']).array
+        data[column['name']] = values
+    df = pd.DataFrame(data, columns=[column['name'] for column in spec['columns']])
+    df = df.set_index(spec['index'])
+    return df.rename_axis([None if index_name == '__index__' else index_name for index_name in spec['index']])
@@ -1,6 +1,210 @@
 import pandas as pd
-import sqlite3
+import numpy as np
+import json
 import os # Import os to construct the path robustly
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.exc import SQLAlchemyError
+
+from perf_trace import traced, rows_of_first_arg
+
+# --- Shared Catalog Cache ---
+CATALOG_SCHEMA_VERSION = 4 # Bump when the tables or the derived columns of load_inventory_data change
+_CATALOG_CACHE = {} # db_path -> (stamp, item_params_df, batches_df, sim_state), shared by all sessions in the process
+_CATALOG_CACHE_LOCK = threading.Lock()
+
+# --- Engine / Connection Pool ---
+# One engine (and connection pool) per database file for the whole process.
+# Each pooled connection runs in WAL mode so readers are not blocked by a
+# writer; synchronous=NORMAL is durable across application crashes in WAL mode.
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    "PRAGMA cache_size=-65536;", # 64 MiB page cache per connection
+    "PRAGMA mmap_size=268435456;", # Memory-map up to 256 MiB of the file
+    "PRAGMA temp_store=MEMORY;",
+]
+POOL_SIZE = 5 # Connections kept open per engine
+POOL_MAX_OVERFLOW = 10 # Extra connections allowed under load
+BUSY_TIMEOUT_SECONDS = 30 # How long a connection waits on a locked database
+STATEMENT_CACHE_SIZE = 256 # Prepared statements kept per connection by the sqlite3 driver
+_ENGINES = {} # db_path -> Engine
+_SCHEMA_CHECKED = set() # db_paths whose index and views are known to be current
+_ENGINES_LOCK = threading.Lock()
+
+# --- Prepared Queries (compiled once by SQLAlchemy and cached per connection by the driver) ---
+ITEM_SUMMARY_QUERY = text("SELECT * FROM item_inventory_summary;")
+ALL_BATCHES_QUERY = text("SELECT batch_id, item_name, quantity_on_hand, expiry_date FROM inventory_batches;")
+BATCH_COUNT_QUERY = text("SELECT COUNT(*) FROM inventory_batches;")
+# Expiry dates are parsed by SQLite into day numbers (days since 1970-01-01; NULL if unparseable)
+STREAM_BATCHES_QUERY = text(
+    "SELECT batch_id, item_name, quantity_on_hand, "
+    "CAST(julianday(expiry_date) - 2440587.5 AS INTEGER) AS expiry_day FROM inventory_batches;"
+)
+UPDATE_ITEM_POLICY = text("UPDATE inventory_items SET buffer_days = :buffer_days, target_days = :target_days WHERE item_name = :item_name;")
+INSERT_ITEM = text(
+    "INSERT INTO inventory_items (item_name, min_daily_usage, max_daily_usage, buffer_days, target_days, "
+    "initial_quantity_on_hand, standard_shelf_life_months, category, lead_time_days) "
+    "VALUES (:item_name, :min_daily_usage, :max_daily_usage, :buffer_days, :target_days, "
+    ":initial_quantity_on_hand, :standard_shelf_life_months, :category, :lead_time_days);"
+)
+DELETE_BATCH = text("DELETE FROM inventory_batches WHERE batch_id = :batch_id;")
+UPDATE_BATCH_QUANTITY = text("UPDATE inventory_batches SET quantity_on_hand = :quantity_on_hand WHERE batch_id = :batch_id;")
+INSERT_BATCH = text(
+    "INSERT INTO inventory_batches (batch_id, item_name, quantity_on_hand, expiry_date) "
+    "VALUES (:batch_id, :item_name, :quantity_on_hand, :expiry_date);"
+)
+NEXT_BATCH_ID_QUERY = text("SELECT COALESCE(MAX(batch_id), 0) + 1 FROM inventory_batches;")
+SIM_STATE_QUERY = text("SELECT current_sim_date, day_count, revision FROM sim_state WHERE id = 1;")
+# Only succeeds if no other session saved since this one loaded (or last saved) the given revision
+UPDATE_SIM_STATE = text(
+    "UPDATE sim_state SET current_sim_date = :current_sim_date, day_count = :day_count, revision = revision + 1 "
+    "WHERE id = 1 AND revision = :revision;"
+)
+SCHEMA_VERSION_QUERY = text("PRAGMA user_version;")
+
+# --- Indexes, Views and Simulation State ---
+# The only definition of the batch index, the summary views and the sim_state
+# table (seed_data.sql creates just the item and batch tables). The views do
+# the per-item aggregation and ROP/ROQ arithmetic inside SQLite, so loading the
+# catalog does not require pulling every batch row into pandas.
+# The database records the version it was built with in PRAGMA user_version;
+# on a mismatch the index and views are dropped and re-created, so edits here
+# reach existing databases. sim_state holds data and is never dropped.
+# Bump SCHEMA_OBJECTS_VERSION whenever this SQL changes.
+# Expiry status is not aggregated here: it depends on the simulation date,
+# which only the batch store knows (BatchStore.summarize).
+SCHEMA_OBJECTS_VERSION = 3
+SCHEMA_OBJECTS_SQL = """
+-- The simulation clock of the saved lots (NULL date: not simulated yet) and a
+-- revision counter bumped by every save, used to detect concurrent writers
+CREATE TABLE IF NOT EXISTS sim_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    current_sim_date DATE,
+    day_count INTEGER NOT NULL DEFAULT 0,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO sim_state (id) VALUES (1);
+
+DROP VIEW IF EXISTS item_inventory_summary;
+
+DROP VIEW IF EXISTS item_stock_levels;
+
+DROP INDEX IF EXISTS idx_inventory_batches_item_expiry;
+
+CREATE INDEX idx_inventory_batches_item_expiry ON inventory_batches (item_name, expiry_date);
+
+CREATE VIEW item_stock_levels AS
+SELECT item_name,
+       COUNT(*) AS batch_count,
+       SUM(quantity_on_hand) AS quantity_on_hand,
+       MIN(expiry_date) AS earliest_expiry
+FROM inventory_batches
+GROUP BY item_name;
+
+CREATE VIEW item_inventory_summary AS
+SELECT i.*,
+       -- Items without batches have 0 on hand; if there are no batches at all, fall back to the initial quantity
+       CASE WHEN EXISTS (SELECT 1 FROM inventory_batches) THEN COALESCE(s.quantity_on_hand, 0)
+            ELSE i.initial_quantity_on_hand END AS quantity_on_hand,
+       COALESCE(s.batch_count, 0) AS batch_count,
+       s.earliest_expiry,
+       i.max_daily_usage * i.buffer_days AS reorder_point,
+       i.max_daily_usage * i.target_days AS reorder_quantity
+FROM inventory_items i
+LEFT JOIN item_stock_levels s ON s.item_name = i.item_name;
+"""
+
+# --- Streaming Batch Load ---
+BATCH_LOAD_CHUNK_ROWS = 100_000 # Rows fetched per chunk by the streaming loader
+BATCH_QUANTITY_DTYPE = np.int32
+
+# --- Bulk Seeding ---
+BULK_INSERT_CHUNK_ROWS = 500_000 # Batch rows converted and passed to one executemany call
+BULK_ROWS_PER_STATEMENT = 200 # Rows per multi-row INSERT (4 parameters each, below SQLite's 999-variable limit)
+ITEM_COLUMNS = ['item_name', 'min_daily_usage', 'max_daily_usage', 'buffer_days', 'target_days',
+                'initial_quantity_on_hand', 'standard_shelf_life_months', 'category', 'lead_time_days']
+
+# --- Multi-Site Network ---
+SITE_SHARD_EXTENSION = '.db' # A network is a directory with one database per site, named <site>.db
+NETWORK_MANIFEST_FILE = 'network.json' # Written by generators: the shard files they own (and may delete again)
+NETWORK_LOAD_WORKERS = 8 # Shards read concurrently
+
+SUMMARY_ONLY_COLUMNS = ['initial_quantity_on_hand', 'batch_count', 'earliest_expiry'] # Not part of item_params_df
+
+class WriteConflictError(Exception):
+    """Raised by save_batch_changes when the database was changed by another writer since the caller's revision."""
+
+def _db_path(db_name: str) -> str:
+    """Resolves a database file name relative to this script's directory."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), db_name)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Applies SQLITE_PRAGMAS to every new pooled connection."""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+def get_engine(db_name='inventory_poc.db') -> Engine:
+    """
+    Returns the process-wide SQLAlchemy engine for a database file, creating it on first use.
+
+    The engine keeps a pool of up to POOL_SIZE (+ POOL_MAX_OVERFLOW)
+    connections that threads (e.g. Streamlit sessions) check out and return,
+    instead of opening and closing a connection per query.
+
+    Args:
+        db_name (str): The name of the SQLite database file (relative to this script) or an absolute path.
+    """
+    db_path = _db_path(db_name)
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(db_path)
+        if engine is None:
+            engine = create_engine(
+                f"sqlite:///{db_path}",
+                pool_size=POOL_SIZE,
+                max_overflow=POOL_MAX_OVERFLOW,
+                pool_pre_ping=False, # Local file: connections do not go stale
+                connect_args={
+                    'check_same_thread': False, # Pooled connections move between threads
+                    'timeout': BUSY_TIMEOUT_SECONDS,
+                    'cached_statements': STATEMENT_CACHE_SIZE,
+                },
+            )
+            event.listen(engine, 'connect', _set_sqlite_pragmas)
+            _ENGINES[db_path] = engine
+        return engine
+
+def dispose_engine(db_name='inventory_poc.db'):
+    """Closes all pooled connections of a database file's engine and forgets it."""
+    db_path = _db_path(db_name)
+    with _ENGINES_LOCK:
+        engine = _ENGINES.pop(db_path, None)
+        _SCHEMA_CHECKED.discard(db_path)
+    if engine is not None:
+        engine.dispose()
+
+def _schema_object_statements() -> list[str]:
+    """SCHEMA_OBJECTS_SQL split into statements, followed by the one recording its version."""
+    statements = [statement for statement in SCHEMA_OBJECTS_SQL.split(';\n') if statement.strip()]
+    return statements + [f"PRAGMA user_version = {SCHEMA_OBJECTS_VERSION}"]
+
+def _ensure_schema_objects(db_path: str):
+    """(Re-)creates the batch index and summary views unless the database is at SCHEMA_OBJECTS_VERSION (checked once per engine)."""
+    if db_path in _SCHEMA_CHECKED:
+        return
+    with get_engine(db_path).begin() as conn: # One transaction; commits on success
+        if conn.execute(SCHEMA_VERSION_QUERY).scalar() != SCHEMA_OBJECTS_VERSION:
+            print(f"Creating inventory index and summary views (schema version {SCHEMA_OBJECTS_VERSION})...")
+            for statement in _schema_object_statements():
+                conn.exec_driver_sql(statement)
+    _SCHEMA_CHECKED.add(db_path)
 
 def _seed_database(db_path, seed_file='seed_data.sql'):
     """Creates and seeds the database from a SQL file."""
@@ -12,29 +216,38 @@ def _seed_database(db_path, seed_file='seed_data.sql'):
     conn = None
     try:
         print(f"Database not found. Seeding database from {seed_file_path}...")
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
         with open(seed_file_path, 'r') as f:
             sql_script = f.read()
-        cursor.executescript(sql_script)
+        conn = get_engine(db_path).raw_connection() # Pooled DBAPI connection (pragmas already applied)
+        conn.driver_connection.executescript(sql_script) # Multi-statement script needs the driver's executescript
+        for statement in _schema_object_statements(): # Index and views are defined here, not in the seed file
+            conn.driver_connection.execute(statement)
         conn.commit()
         print("Database seeded successfully.")
         return True # Indicate seeding success
-    except sqlite3.Error as e:
+    except (SQLAlchemyError, sqlite3.Error) as e: # executescript raises the driver's own errors
         print(f"SQLite error during seeding: {e}")
         # Attempt to remove potentially corrupted DB file
-        if conn: conn.close() # Close connection before removing
-        if os.path.exists(db_path): os.remove(db_path)
+        if conn:
+            conn.close() # Return the connection to the pool before removing the file
+            conn = None
+        _remove_database(db_path)
         return False # Indicate seeding failure
     except IOError as e:
         print(f"Error reading seed file {seed_file_path}: {e}")
-        if conn: conn.close()
         return False # Indicate seeding failure
     finally:
         if conn:
             conn.close()
 
-def load_inventory_data(db_name='inventory_poc.db') -> pd.DataFrame | None:
+def _remove_database(db_path: str):
+    """Disposes the engine of a database file and deletes the file with its WAL/shared-memory files."""
+    dispose_engine(db_path)
+    for path in (db_path, db_path + '-wal', db_path + '-shm'):
+        if os.path.exists(path): os.remove(path)
+
+@traced('data_loader.load_inventory_data', rows=lambda result, *args, **kwargs: len(result[1]))
+def load_inventory_data(db_name='inventory_poc.db', chunk_rows: int | None = None) -> pd.DataFrame | None:
     """
     Loads inventory data from the specified SQLite database file.
     If the database file does not exist, it attempts to create and
@@ -43,6 +256,11 @@ def load_inventory_data(db_name='inventory_poc.db') -> pd.DataFrame | None:
     Args:
         db_name (str): The name of the SQLite database file. Assumed to be
                        in the same directory as this script.
+        chunk_rows (int | None): If given, batches are streamed in chunks of
+                       this many rows into typed columns (see _stream_batches):
+                       categorical 'item_name', int32 'quantity_on_hand' and
+                       'expiry_date' parsed by SQLite. Otherwise the whole
+                       table is read at once.
 
     Returns:
         tuple[pd.DataFrame | None, pd.DataFrame | None]: A tuple containing:
@@ -51,8 +269,7 @@ def load_inventory_data(db_name='inventory_poc.db') -> pd.DataFrame | None:
             - batches_df: DataFrame with raw batch details, indexed by batch_id.
             Returns (None, None) if loading fails.
     """
-    script_dir = os.path.dirname(os.path.abspath(__file__)) # Use abspath for reliability
-    db_path = os.path.join(script_dir, db_name)
+    db_path = _db_path(db_name)
 
     # --- Seeding Logic ---
     if not os.path.exists(db_path):
@@ -61,105 +278,572 @@ def load_inventory_data(db_name='inventory_poc.db') -> pd.DataFrame | None:
             return None # Cannot proceed without database
 
     # --- Data Loading Logic (proceeds if DB exists or was seeded) ---
-    conn = None
     try:
-        conn = sqlite3.connect(db_path)
+        _ensure_schema_objects(db_path)
 
-        # Load item parameters
-        params_query = "SELECT * FROM inventory_items;"
-        item_params_df = pd.read_sql_query(params_query, conn)
+        with get_engine(db_path).connect() as conn: # Checked out from (and returned to) the pool
+            # Load item parameters with QoH and ROP/ROQ aggregated by the summary view
+            inventory_status_df = pd.read_sql_query(ITEM_SUMMARY_QUERY, conn)
 
-        if item_params_df.empty:
-            print("Error: No data found in item_parameters table.")
-            return None, None
-        if 'item_name' not in item_params_df.columns:
-            print("Error: 'item_name' column not found in item_parameters table.")
-            return None, None
-        item_params_df = item_params_df.set_index('item_name')
-        print("Loaded item_parameters table.")
-
-        # Load inventory batches
-        batches_query = "SELECT batch_id, item_name, quantity_on_hand, expiry_date FROM inventory_batches;"
-        batches_df = pd.read_sql_query(batches_query, conn)
-
-        if batches_df.empty:
-            print("Warning: No data found in inventory_batches table. Returning empty DataFrame.")
-            # Return parameters but empty batches - might be valid if starting fresh
-            # Ensure required columns exist even if empty for consistency downstream
-            batches_df = pd.DataFrame(columns=['batch_id', 'item_name', 'quantity_on_hand', 'expiry_date'])
-        else:
-             # Convert expiry_date to datetime objects
-            if 'expiry_date' in batches_df.columns:
-                batches_df['expiry_date'] = pd.to_datetime(batches_df['expiry_date'], errors='coerce')
-                if batches_df['expiry_date'].isnull().any():
-                    print("Warning: Some expiry dates could not be parsed and were set to NaT.")
-            else:
-                print("Error: 'expiry_date' column not found in inventory_batches table.")
-                return item_params_df, None # Return params, but signal batch error
+            if inventory_status_df.empty:
+                print("Error: No data found in item_parameters table.")
+                return None, None
+            if 'item_name' not in inventory_status_df.columns:
+                print("Error: 'item_name' column not found in item_parameters table.")
+                return None, None
+            if (inventory_status_df['batch_count'] == 0).all():
+                print("Warning: Batches table is empty. Using initial_quantity_on_hand as current quantity.")
+            inventory_status_df = inventory_status_df.drop(columns=SUMMARY_ONLY_COLUMNS).set_index('item_name')
+            print("Loaded item_parameters table.")
 
-            # Set batch_id as index
-            if 'batch_id' in batches_df.columns:
-                batches_df = batches_df.set_index('batch_id')
+            # Load inventory batches
+            if chunk_rows is not None:
+                batches_df = _stream_batches(conn, inventory_status_df.index, chunk_rows)
             else:
-                print("Error: 'batch_id' column not found in inventory_batches table.")
-                return item_params_df, None # Return params, but signal batch error
-
-        # --- Calculate Aggregated QOH and Merge ---
-        if not batches_df.empty:
-            # Calculate total quantity on hand per item from batches
-            qoh_agg = batches_df.groupby('item_name')['quantity_on_hand'].sum().reset_index()
-            qoh_agg = qoh_agg.rename(columns={'quantity_on_hand': 'calculated_qoh'})
-
-            # Merge aggregated QOH into item_params_df
-            # Use left merge to keep all items from item_params_df
-            inventory_status_df = pd.merge(item_params_df.reset_index(), qoh_agg, on='item_name', how='left')
-
-            # Fill NaN in calculated_qoh with 0 (items with params but no batches)
-            inventory_status_df['calculated_qoh'] = inventory_status_df['calculated_qoh'].fillna(0).astype(int)
-
-            # Decide which QOH to use (currently using calculated from batches)
-            # We might want logic here later to use initial_quantity_on_hand if batches are empty
-            inventory_status_df['quantity_on_hand'] = inventory_status_df['calculated_qoh']
-            # Drop the intermediate column and the initial one if no longer needed directly
-            inventory_status_df = inventory_status_df.drop(columns=['calculated_qoh', 'initial_quantity_on_hand'])
-
-        else:
-            # If batches_df is empty, use initial_quantity_on_hand as current QOH
-            print("Warning: Batches table is empty. Using initial_quantity_on_hand as current quantity.")
-            inventory_status_df = item_params_df.reset_index() # Keep item_name as column temporarily
-            inventory_status_df['quantity_on_hand'] = inventory_status_df['initial_quantity_on_hand']
-            inventory_status_df = inventory_status_df.drop(columns=['initial_quantity_on_hand'])
-
-
-        # --- Calculate Reorder Point and Quantity ---
-        # Ensure required columns exist before calculation
-        if all(col in inventory_status_df.columns for col in ['max_daily_usage', 'buffer_days', 'target_days']):
-            inventory_status_df['reorder_point'] = inventory_status_df['max_daily_usage'] * inventory_status_df['buffer_days']
-            inventory_status_df['reorder_quantity'] = inventory_status_df['max_daily_usage'] * inventory_status_df['target_days']
-        else:
-            print("Error: Missing columns required for reorder point/quantity calculation.")
-            # Add empty columns to prevent KeyErrors downstream, but signal the issue
-            inventory_status_df['reorder_point'] = 0
-            inventory_status_df['reorder_quantity'] = 0
-
-
-        # Set item_name back as index for the final status DataFrame
-        inventory_status_df = inventory_status_df.set_index('item_name')
+                batches_df = _read_batches(conn, ALL_BATCHES_QUERY)
+        if batches_df is None:
+            return inventory_status_df, None # Return params, but signal batch error
 
         print(f"Successfully loaded and processed data from {db_path}")
         return inventory_status_df, batches_df # Return the enhanced status df and original batches df
 
-    except sqlite3.Error as e:
+    except SQLAlchemyError as e:
         print(f"SQLite error occurred during data loading: {e}")
         return None, None
     except Exception as e:
         # Catch other potential errors during DataFrame processing
         print(f"An unexpected error occurred during data loading: {e}")
         return None, None
+
+def _read_batches(conn: Connection, query: TextClause, params: dict | None = None) -> pd.DataFrame | None:
+    """Runs a batch-detail query and returns batches indexed by batch_id with parsed expiry dates (None on schema errors)."""
+    batches_df = pd.read_sql_query(query, conn, params=params)
+
+    if batches_df.empty:
+        # Ensure required columns exist even if empty for consistency downstream
+        return pd.DataFrame(columns=['item_name', 'quantity_on_hand', 'expiry_date'],
+                            index=pd.Index([], dtype='int64', name='batch_id')).astype({'expiry_date': 'datetime64[ns]'})
+
+    # Convert expiry_date to datetime objects
+    if 'expiry_date' not in batches_df.columns:
+        print("Error: 'expiry_date' column not found in inventory_batches table.")
+        return None
+    batches_df['expiry_date'] = pd.to_datetime(batches_df['expiry_date'], errors='coerce')
+    if batches_df['expiry_date'].isnull().any():
+        print("Warning: Some expiry dates could not be parsed and were set to NaT.")
+
+    # Set batch_id as index
+    if 'batch_id' not in batches_df.columns:
+        print("Error: 'batch_id' column not found in inventory_batches table.")
+        return None
+    return batches_df.set_index('batch_id')
+
+def _stream_batches(conn: Connection, item_names, chunk_rows: int = BATCH_LOAD_CHUNK_ROWS) -> pd.DataFrame | None:
+    """
+    Reads all batches chunk by chunk into preallocated typed columns.
+
+    The columns are sized from a row count up front (and grown if rows are
+    added meanwhile). Each chunk is validated and written into place, so
+    peak memory stays close to the final frame plus one chunk:
+
+    - batch_id: int64 (the index); a chunk with missing ids fails the load,
+    - item_name: Categorical over item_names; unknown names are appended
+      as new categories,
+    - quantity_on_hand: int32; missing values become 0, values outside the
+      int32 range fail the load,
+    - expiry_date: datetime64[s] from day numbers computed by SQLite;
+      unparseable dates become NaT.
+
+    Returns None on schema errors, like _read_batches.
+    """
+    capacity = int(conn.execute(BATCH_COUNT_QUERY).scalar())
+    batch_ids = np.empty(capacity, dtype=np.int64)
+    item_codes = np.empty(capacity, dtype=np.int32)
+    quantities = np.empty(capacity, dtype=BATCH_QUANTITY_DTYPE)
+    expiry_days = np.empty(capacity, dtype=np.int64)
+    categories = pd.Index(item_names, dtype=object)
+    limits = np.iinfo(BATCH_QUANTITY_DTYPE)
+    missing_quantities = missing_expiry = 0
+    filled = 0
+
+    for chunk in pd.read_sql_query(STREAM_BATCHES_QUERY, conn, chunksize=int(chunk_rows)):
+        n = len(chunk)
+        if chunk['batch_id'].isnull().any():
+            print("Error: Missing batch_id values in inventory_batches table.")
+            return None
+        quantity = pd.to_numeric(chunk['quantity_on_hand'], errors='coerce')
+        missing_quantities += int(quantity.isnull().sum())
+        quantity = quantity.fillna(0)
+        if n and (quantity.min() < limits.min or quantity.max() > limits.max):
+            print(f"Error: quantity_on_hand values outside the {np.dtype(BATCH_QUANTITY_DTYPE).name} range in inventory_batches table.")
+            return None
+
+        # Names are mapped to codes per chunk; only the chunk ever holds them as strings
+        names = pd.Index(chunk['item_name'], dtype=object)
+        codes = categories.get_indexer(names)
+        unknown = (codes < 0) & names.notna()
+        if unknown.any():
+            categories = categories.append(pd.Index(names[unknown].unique(), dtype=object))
+            codes = categories.get_indexer(names)
+
+        if filled + n > capacity: # Rows were added since the count
+            capacity = max(filled + n, 2 * capacity)
+            batch_ids, item_codes, quantities, expiry_days = (np.resize(column, capacity) for column in
+                                                              (batch_ids, item_codes, quantities, expiry_days))
+        rows = slice(filled, filled + n)
+        batch_ids[rows] = chunk['batch_id'].to_numpy(dtype=np.int64)
+        item_codes[rows] = codes
+        quantities[rows] = quantity.to_numpy().astype(BATCH_QUANTITY_DTYPE)
+        unparsed = chunk['expiry_day'].isnull().to_numpy()
+        missing_expiry += int(unparsed.sum())
+        expiry_days[rows] = np.where(unparsed, np.iinfo(np.int64).min, chunk['expiry_day'].fillna(0).to_numpy().astype(np.int64)) # NaT
+        filled += n
+
+    if missing_quantities:
+        print(f"Warning: {missing_quantities} batches have no quantity_on_hand; set to 0.")
+    if missing_expiry:
+        print("Warning: Some expiry dates could not be parsed and were set to NaT.")
+
+    expiry_seconds = expiry_days[:filled]
+    valid = expiry_seconds != np.iinfo(np.int64).min
+    expiry_seconds[valid] *= 86400 # Day numbers -> seconds, in place
+    return pd.DataFrame({
+        'item_name': pd.Categorical.from_codes(item_codes[:filled], categories=categories),
+        'quantity_on_hand': quantities[:filled],
+        'expiry_date': expiry_seconds.view('datetime64[s]'),
+    }, index=pd.Index(batch_ids[:filled], name='batch_id'), copy=False)
+
+def _db_stamp(db_path: str) -> tuple | None:
+    """
+    Identifies the current contents of the database file for cache invalidation.
+
+    Combines mtime and size of the file (and of its WAL file, which receives
+    writes before they are checkpointed) with CATALOG_SCHEMA_VERSION.
+    Returns None if the file does not exist.
+    """
+    try:
+        db_stat = os.stat(db_path)
+    except OSError:
+        return None
+    try:
+        wal_stat = os.stat(db_path + '-wal')
+        wal = (wal_stat.st_mtime_ns, wal_stat.st_size)
+    except OSError:
+        wal = None
+    return (db_stat.st_mtime_ns, db_stat.st_size, wal, CATALOG_SCHEMA_VERSION)
+
+def load_sim_state(db_name='inventory_poc.db') -> dict | None:
+    """
+    Loads the simulation clock saved with the batches (see save_batch_changes).
+
+    Args:
+        db_name (str): The name of the SQLite database file. Assumed to be
+                       in the same directory as this script.
+
+    Returns:
+        dict | None: 'current_sim_date' (date, or None if the lots were never
+        simulated), 'day_count' and 'revision' (the save counter to pass back
+        to save_batch_changes), or None if the database cannot be read.
+    """
+    db_path = _db_path(db_name)
+    if not os.path.exists(db_path):
+        print(f"Error: Database not found at {db_path}")
+        return None
+
+    try:
+        _ensure_schema_objects(db_path)
+        with get_engine(db_path).connect() as conn:
+            row = conn.execute(SIM_STATE_QUERY).one()
+    except SQLAlchemyError as e:
+        print(f"SQLite error occurred while loading the simulation state: {e}")
+        return None
+    current_sim_date = pd.to_datetime(row.current_sim_date, errors='coerce')
+    return {
+        'current_sim_date': current_sim_date.date() if not pd.isna(current_sim_date) else None,
+        'day_count': int(row.day_count),
+        'revision': int(row.revision),
+    }
+
+@traced('data_loader.load_shared_inventory_data', rows=lambda result, *args, **kwargs: len(result[1]))
+def load_shared_inventory_data(db_name='inventory_poc.db') -> tuple[pd.DataFrame | None, pd.DataFrame | None, dict | None]:
+    """
+    Returns the item catalog, initial batch snapshot and its simulation state, loaded once per process.
+
+    The first call (per database file) runs load_inventory_data and
+    load_sim_state; later calls, from any session or thread, return the same
+    objects until the database file changes (see _db_stamp) or
+    CATALOG_SCHEMA_VERSION is bumped. Failed loads are not cached.
+
+    The simulation state is read before and after the batches. If another
+    session saved in between, the earlier state is returned (and not
+    cached): its revision is already outdated, so the caller's first save
+    reports a conflict instead of overwriting the other session's changes.
+
+    The returned objects are shared: callers must treat them as read-only
+    and copy before modifying.
+
+    Args:
+        db_name (str): The name of the SQLite database file. Assumed to be
+                       in the same directory as this script.
+
+    Returns:
+        The (item_params_df, batches_df) tuple of load_inventory_data plus the
+        sim_state dict of load_sim_state, or (None, None, None) if loading fails.
+    """
+    db_path = _db_path(db_name)
+
+    with _CATALOG_CACHE_LOCK: # One loader at a time; concurrent cold opens wait for the first
+        stamp = _db_stamp(db_path)
+        cached = _CATALOG_CACHE.get(db_path)
+        if cached is not None and stamp is not None and cached[0] == stamp:
+            return cached[1], cached[2], cached[3]
+
+        state_before = load_sim_state(db_name) if stamp is not None else None # The load below seeds a missing file
+        result = load_inventory_data(db_name, chunk_rows=BATCH_LOAD_CHUNK_ROWS)
+        item_params_df, batches_df = result if result is not None else (None, None)
+        sim_state = load_sim_state(db_name) if item_params_df is not None and batches_df is not None else None
+        if sim_state is None:
+            _CATALOG_CACHE.pop(db_path, None)
+            return None, None, None
+        if state_before is not None and state_before['revision'] != sim_state['revision']:
+            print("Warning: The database was saved by another session while loading; its changes will conflict.")
+            _CATALOG_CACHE.pop(db_path, None)
+            return item_params_df, batches_df, state_before
+
+        # Stamp after loading: the load may have seeded the file
+        _CATALOG_CACHE[db_path] = (_db_stamp(db_path), item_params_df, batches_df, sim_state)
+        print(f"Cached inventory catalog for {db_path}")
+        return item_params_df, batches_df, sim_state
+
+def list_site_shards(shard_dir: str) -> dict[str, str]:
+    """Site name -> database path for every <site>.db shard in shard_dir (relative to this script, or absolute), sorted by site."""
+    shard_dir = _db_path(shard_dir)
+    try:
+        file_names = sorted(os.listdir(shard_dir))
+    except OSError as e:
+        print(f"Error listing site shards in {shard_dir}: {e}")
+        return {}
+    return {file_name[:-len(SITE_SHARD_EXTENSION)]: os.path.join(shard_dir, file_name)
+            for file_name in file_names if file_name.endswith(SITE_SHARD_EXTENSION)}
+
+def write_network_manifest(shard_dir: str, sites) -> bool:
+    """Records in shard_dir that the <site>.db shards of `sites` were generated (see remove_site_shards)."""
+    path = os.path.join(_db_path(shard_dir), NETWORK_MANIFEST_FILE)
+    try:
+        with open(path, 'w') as f:
+            json.dump({'shards': [str(site) + SITE_SHARD_EXTENSION for site in sites]}, f)
+        return True
+    except OSError as e:
+        print(f"Error writing network manifest {path}: {e}")
+        return False
+
+def remove_site_shards(shard_dir: str) -> int | None:
+    """
+    Deletes the generated site shards of shard_dir, as listed in its network manifest.
+
+    Only files named in NETWORK_MANIFEST_FILE are deleted (with their
+    WAL/shared-memory files and pooled engines), then the manifest itself.
+    The directory is refused as a whole if it is this script's directory or
+    holds any .db file the manifest does not list: such databases were not
+    generated, and load_network_inventory would load them as sites.
+
+    Args:
+        shard_dir (str): The network directory (relative to this script, or absolute).
+
+    Returns:
+        int | None: The number of shards removed (0 for an empty or missing
+        directory), or None if the directory was refused.
+    """
+    shard_dir = _db_path(shard_dir)
+    if os.path.realpath(shard_dir) == os.path.realpath(_db_path('.')):
+        print(f"Error: Refusing to use the application directory {shard_dir} as a network directory.")
+        return None
+    shards = list_site_shards(shard_dir) if os.path.isdir(shard_dir) else {}
+    manifest_path = os.path.join(shard_dir, NETWORK_MANIFEST_FILE)
+    try:
+        with open(manifest_path) as f:
+            owned = set(json.load(f)['shards'])
+    except FileNotFoundError:
+        owned = set()
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Error reading network manifest {manifest_path}: {e}")
+        return None
+
+    foreign = sorted(os.path.basename(db_path) for db_path in shards.values() if os.path.basename(db_path) not in owned)
+    if foreign:
+        print(f"Error: {shard_dir} holds databases that were not generated as site shards ({', '.join(foreign[:5])}); "
+              "refusing to clear it.")
+        return None
+    for db_path in shards.values():
+        _remove_database(db_path)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    return len(shards)
+
+@traced('data_loader.load_network_inventory', rows=lambda result, *args, **kwargs: len(result[1]))
+def load_network_inventory(shard_dir: str, sites=None,
+                           n_workers: int = NETWORK_LOAD_WORKERS) -> tuple[pd.DataFrame | None, pd.DataFrame | None]:
+    """
+    Loads a multi-site network stored as one database shard per site.
+
+    Each shard has the single-site schema and is read with
+    load_inventory_data (streamed), several shards at a time on a thread
+    pool. Each shard's engine is disposed afterwards, so a network of
+    hundreds of sites does not keep hundreds of page caches open.
+
+    Args:
+        shard_dir (str): Directory of <site>.db shards (see list_site_shards).
+        sites: Sites to load (default: all shards).
+        n_workers (int): Shards read concurrently.
+
+    Returns:
+        tuple[pd.DataFrame | None, pd.DataFrame | None]: A tuple containing:
+            - site_params_df: Item parameters indexed by (site, item_name).
+            - batches_df: All batches with a categorical 'site' column,
+              indexed by (site, batch_id).
+        Returns (None, None) if no shard is found or any shard fails to load.
+    """
+    shards = list_site_shards(shard_dir)
+    if sites is not None:
+        missing = [site for site in sites if site not in shards]
+        if missing:
+            print(f"Error: No shards for sites {missing} in {shard_dir}")
+            return None, None
+        shards = {site: shards[site] for site in sites}
+    if not shards:
+        print(f"Error: No site shards found in {shard_dir}")
+        return None, None
+
+    def load_shard(db_path: str):
+        try:
+            return load_inventory_data(db_path, chunk_rows=BATCH_LOAD_CHUNK_ROWS)
+        finally:
+            dispose_engine(db_path)
+
+    with ThreadPoolExecutor(max_workers=max(int(n_workers), 1)) as pool:
+        results = list(pool.map(load_shard, shards.values()))
+    if any(result is None or result[0] is None or result[1] is None for result in results):
+        print(f"Error: Failed to load one or more site shards from {shard_dir}")
+        return None, None
+
+    site_names = list(shards)
+    site_params_df = pd.concat({site: params_df for site, (params_df, _) in zip(site_names, results)}, names=['site', 'item_name'])
+
+    # One item category set for all shards, so the concatenated column stays categorical
+    shard_batches = [batches_df for _, batches_df in results]
+    item_dtype = pd.CategoricalDtype(pd.Index(np.concatenate([batches_df['item_name'].cat.categories.to_numpy(dtype=object)
+                                                              for batches_df in shard_batches])).unique())
+    batches_df = pd.concat([batches_df.assign(item_name=batches_df['item_name'].astype(item_dtype)) for batches_df in shard_batches])
+    site = pd.Categorical.from_codes(np.repeat(np.arange(len(site_names)), [len(df) for df in shard_batches]), categories=site_names)
+    batches_df.insert(0, 'site', site)
+    batches_df.index = pd.MultiIndex.from_arrays([site, batches_df.index], names=['site', 'batch_id'])
+    print(f"Loaded {len(batches_df)} batches from {len(site_names)} site shards in {shard_dir}")
+    return site_params_df, batches_df
+
+@traced('data_loader.bulk_seed_database', rows=lambda result, items_df, batches_df, *args, **kwargs: len(batches_df))
+def bulk_seed_database(items_df: pd.DataFrame, batches_df: pd.DataFrame, db_name='inventory_poc.db',
+                       seed_file='seed_data.sql') -> bool:
+    """
+    Creates a database with the schema of seed_file, filled with the given items and batches.
+
+    Any existing database file is replaced. The schema script runs first
+    (its sample rows are removed again), then all rows are inserted with
+    executemany inside one transaction, and the batch index is built after
+    the rows are in, which is much faster than maintaining it per insert.
+
+    Args:
+        items_df (pd.DataFrame): One row per item with ITEM_COLUMNS (e.g. from
+                                 synthetic_data.generate_inventory).
+        batches_df (pd.DataFrame): Batches with 'item_name', 'quantity_on_hand'
+                                   and 'expiry_date', indexed by batch_id.
+        db_name (str): The name of the SQLite database file (relative to this script) or an absolute path.
+        seed_file (str): Schema script, in the same directory as this script.
+
+    Returns:
+        bool: True if the database was created, False otherwise.
+    """
+    db_path = _db_path(db_name)
+    seed_file_path = _db_path(seed_file)
+    try:
+        with open(seed_file_path, 'r') as f:
+            sql_script = f.read()
+    except IOError as e:
+        print(f"Error reading seed file {seed_file_path}: {e}")
+        return False
+
+    _remove_database(db_path)
+    conn = None
+    try:
+        print(f"Bulk seeding {len(items_df)} items and {len(batches_df)} batches into {db_path}...")
+        conn = get_engine(db_path).raw_connection()
+        driver = conn.driver_connection
+        driver.executescript(sql_script)
+        driver.execute("PRAGMA synchronous=OFF;") # Bulk load: the file is discarded on failure anyway
+
+        driver.execute("BEGIN;")
+        driver.execute("DELETE FROM inventory_batches;")
+        driver.execute("DELETE FROM inventory_items;")
+        items = items_df.reindex(columns=ITEM_COLUMNS)
+        driver.executemany(str(INSERT_ITEM), items.astype(object).where(items.notna(), None).to_dict('records'))
+
+        # Text columns via their distinct values: a few thousand strings instead of one per row
+        expiry = pd.to_datetime(batches_df['expiry_date'], errors='coerce').to_numpy(dtype='datetime64[D]')
+        expiry_days, expiry_codes = np.unique(expiry, return_inverse=True)
+        expiry_text = np.datetime_as_string(expiry_days).astype(object) # 'YYYY-MM-DD'
+        expiry_text[np.isnat(expiry_days)] = None
+        item_codes, item_names = pd.factorize(batches_df['item_name'])
+        columns = [batches_df.index.to_numpy(dtype=np.int64), np.asarray(item_names, dtype=object)[item_codes],
+                   pd.to_numeric(batches_df['quantity_on_hand']).to_numpy(dtype=np.int64), expiry_text[expiry_codes.ravel()]]
+        for start in range(0, len(batches_df), BULK_INSERT_CHUNK_ROWS):
+            _insert_rows(driver, "inventory_batches (batch_id, item_name, quantity_on_hand, expiry_date)",
+                         [values[start:start + BULK_INSERT_CHUNK_ROWS] for values in columns])
+
+        # Index and views after the rows are in
+        for statement in _schema_object_statements():
+            driver.execute(statement)
+        driver.execute("COMMIT;")
+        driver.execute("PRAGMA synchronous=NORMAL;")
+        driver.execute("PRAGMA analysis_limit=1000;") # Sampled statistics: milliseconds instead of a full scan
+        driver.execute("ANALYZE;") # Planner statistics for the new table sizes
+        _SCHEMA_CHECKED.add(db_path)
+        print("Database bulk seeded successfully.")
+        return True
+    except (SQLAlchemyError, sqlite3.Error, ValueError, TypeError) as e:
+        print(f"SQLite error during bulk seeding: {e}")
+        if conn:
+            conn.close() # Return the connection to the pool before removing the file
+            conn = None
+        _remove_database(db_path)
+        return False
     finally:
         if conn:
             conn.close()
 
+def _insert_rows(driver_connection: sqlite3.Connection, target: str, columns: list[np.ndarray]):
+    """
+    Inserts rows given as equal-length column arrays with multi-row INSERT statements.
+
+    Each statement carries BULK_ROWS_PER_STATEMENT rows, which roughly
+    halves the per-row cost of executemany compared to one row per
+    statement; the remainder goes through a statement of its own size.
+    """
+    n_rows, n_columns = len(columns[0]), len(columns)
+    table = np.empty((n_rows, n_columns), dtype=object)
+    for position, values in enumerate(columns):
+        table[:, position] = values.tolist() # Python ints/strs, which sqlite3 binds directly
+    n_full = n_rows - n_rows % BULK_ROWS_PER_STATEMENT
+    row_sql = "(" + ", ".join(["?"] * n_columns) + ")"
+    for rows, rows_per_statement in ((table[:n_full], BULK_ROWS_PER_STATEMENT), (table[n_full:], n_rows - n_full)):
+        if len(rows):
+            driver_connection.executemany(f"INSERT INTO {target} VALUES " + ", ".join([row_sql] * rows_per_statement),
+                                          rows.reshape(-1, rows_per_statement * n_columns).tolist())
+
+@traced('data_loader.save_item_policies', rows=rows_of_first_arg)
+def save_item_policies(policy_df: pd.DataFrame, db_name='inventory_poc.db') -> bool:
+    """
+    Writes recommended buffer_days / target_days back to the inventory_items table.
+
+    Args:
+        policy_df (pd.DataFrame): Indexed by item_name, with 'buffer_days' and
+                                  'target_days' columns (e.g. from optimize_reorder_policy).
+        db_name (str): The name of the SQLite database file. Assumed to be
+                       in the same directory as this script.
+
+    Returns:
+        bool: True if all rows were written in one transaction, False otherwise.
+    """
+    if policy_df is None or policy_df.empty:
+        print("Warning: No reorder policies to save.")
+        return False
+
+    db_path = _db_path(db_name)
+
+    rows = [
+        {'buffer_days': int(buffer_days), 'target_days': int(target_days), 'item_name': item_name}
+        for item_name, buffer_days, target_days in zip(policy_df.index, policy_df['buffer_days'], policy_df['target_days'])
+    ]
+
+    try:
+        with get_engine(db_path).begin() as conn: # Commits on success, rolls back on error
+            conn.execute(UPDATE_ITEM_POLICY, rows) # A list of parameter dicts runs as executemany
+        print(f"Saved reorder policies for {len(rows)} items to {db_path}")
+        return True
+    except SQLAlchemyError as e:
+        print(f"SQLite error occurred while saving reorder policies: {e}")
+        return False
+
+@traced('data_loader.save_batch_changes', rows=lambda result, updates, new, discarded, *args, **kwargs: len(updates) + len(new) + len(discarded))
+def save_batch_changes(quantity_updates: list[dict], new_batches: list[dict], discarded_ids, min_batch_id: int = 1,
+                       sim_state: dict | None = None, db_name='inventory_poc.db') -> list[int] | None:
+    """
+    Applies a batch of lot changes and the simulation clock to the database in one transaction.
+
+    Each kind of change is sent as a single executemany: deletes first,
+    then quantity updates, then inserts.
+
+    Writes are checked rather than last-writer-wins: the sim_state row is
+    only updated if its revision is still the one the caller loaded, and
+    every delete and update must hit an existing row. Otherwise another
+    session (or tool) changed the database since, and the whole
+    transaction is rolled back.
+
+    Args:
+        quantity_updates (list[dict]): {'batch_id', 'quantity_on_hand'} rows for existing lots.
+        new_batches (list[dict]): {'item_name', 'quantity_on_hand', 'expiry_date'} rows
+                                  for lots not yet in the table ('expiry_date' as 'YYYY-MM-DD' or None).
+        discarded_ids: batch_ids of lots to delete.
+        min_batch_id (int): Lowest id to assign to new lots (e.g. BatchStore.next_batch_id,
+                            so database ids never clash with ids already used in memory).
+        sim_state (dict | None): 'current_sim_date' (date or None), 'day_count' and
+                                 'revision' (as returned by load_sim_state, or
+                                 the previous save). The stored revision is
+                                 incremented, so the caller's next save passes
+                                 revision + 1. If None, the clock is not saved
+                                 or checked.
+        db_name (str): The name of the SQLite database file. Assumed to be
+                       in the same directory as this script.
+
+    Returns:
+        list[int] | None: The batch_ids assigned to new_batches (in order), or
+        None if the transaction failed and was rolled back.
+
+    Raises:
+        WriteConflictError: If the database was changed by another writer (nothing is written).
+    """
+    db_path = _db_path(db_name)
+    deletes = [{'batch_id': int(batch_id)} for batch_id in discarded_ids]
+
+    try:
+        _ensure_schema_objects(db_path)
+        with get_engine(db_path).begin() as conn: # Commits on success, rolls back on error (including a conflict)
+            if sim_state is not None:
+                current_sim_date = sim_state.get('current_sim_date')
+                saved = conn.execute(UPDATE_SIM_STATE, {
+                    'current_sim_date': current_sim_date.isoformat() if current_sim_date is not None else None,
+                    'day_count': int(sim_state.get('day_count', 0)),
+                    'revision': int(sim_state['revision']),
+                })
+                if saved.rowcount != 1:
+                    raise WriteConflictError(f"another session saved after revision {sim_state['revision']}")
+            if deletes and conn.execute(DELETE_BATCH, deletes).rowcount != len(deletes):
+                raise WriteConflictError("some discarded lots were already deleted")
+            if quantity_updates and conn.execute(UPDATE_BATCH_QUANTITY, quantity_updates).rowcount != len(quantity_updates):
+                raise WriteConflictError("some updated lots no longer exist")
+            new_ids = []
+            if new_batches:
+                # Continue the table's rowid sequence (read inside the write transaction)
+                first_id = max(conn.execute(NEXT_BATCH_ID_QUERY).scalar(), int(min_batch_id))
+                new_ids = list(range(first_id, first_id + len(new_batches)))
+                conn.execute(INSERT_BATCH, [dict(row, batch_id=batch_id) for row, batch_id in zip(new_batches, new_ids)])
+        print(f"Saved batch changes to {db_path}: {len(deletes)} deleted, {len(quantity_updates)} updated, {len(new_ids)} inserted")
+        return new_ids
+    except WriteConflictError as e:
+        print(f"Write conflict while saving batch changes to {db_path}: {e}. Nothing was saved.")
+        raise
+    except SQLAlchemyError as e:
+        print(f"SQLite error occurred while saving batch changes: {e}")
+        return None
+
 # Example usage (optional, for testing the function directly)
 if __name__ == '__main__':
     item_params, inventory_batches = load_inventory_data()
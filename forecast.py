@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+from statistics import NormalDist
+
+from perf_trace import traced
+from simulation import _day_number, _usage_bounds
+
+# --- Constants ---
+DEFAULT_ALPHA = 0.2 # Level smoothing: weight of the newest day
+DEFAULT_GAMMA = 0.1 # Weekday seasonal smoothing
+DEFAULT_ERROR_SMOOTHING = 0.1 # Smoothing of the squared one-step forecast error (safety stock)
+DEFAULT_SERVICE_LEVEL = 0.95 # Probability of not running out before the reorder lands
+DAYS_PER_WEEK = 7
+FORECAST_POLICY_COLUMNS = ['forecast_daily_demand', 'forecast_std', 'safety_stock', 'reorder_point', 'reorder_quantity']
+
+def _weekdays(first_day: int, days: int) -> np.ndarray:
+    """Weekday (Monday = 0) of `days` consecutive day numbers; day 0 (1970-01-01) was a Thursday."""
+    return (first_day + np.arange(days, dtype=np.int64) + 3) % DAYS_PER_WEEK
+
+class DemandForecaster:
+    """
+    Per-item exponential smoothing of daily demand, optionally with additive
+    weekday seasonality (Holt-Winters without trend).
+
+    The state is one level per item, a (7 x item) table of weekday offsets
+    and an exponentially weighted mean of the squared one-step forecast
+    error, all held as arrays. Every update handles all items with a few
+    array operations, so the cost of a day is O(items) with no per-item
+    Python objects; only the recursion over days is a loop.
+
+    Fit it on demand (units requested, including any stock could not
+    cover) rather than consumption: consumption stops at zero during a
+    stockout, which would drag the forecast and so the reorder point down.
+
+    Before any demand is recorded, the forecast is the midpoint of each
+    item's usage range and the error variance that of a uniform draw over
+    it, so the forecaster starts from what the simulation assumes.
+    """
+
+    def __init__(self, item_params_df: pd.DataFrame, alpha: float = DEFAULT_ALPHA, gamma: float = DEFAULT_GAMMA,
+                 seasonal: bool = True, error_smoothing: float = DEFAULT_ERROR_SMOOTHING):
+        self.item_names = pd.Index(item_params_df.index, name='item_name')
+        self.alpha = float(alpha)
+        self.gamma = float(gamma) if seasonal else 0.0
+        self.seasonal = bool(seasonal)
+        self.error_smoothing = float(error_smoothing)
+
+        with_bounds = item_params_df.reindex(self.item_names)
+        low, high = _usage_bounds(with_bounds)
+        self._prior_level = (low + high) / 2.0
+        self._prior_var = ((high - low + 1.0) ** 2 - 1.0) / 12.0 # Variance of a discrete uniform draw
+        self.reset()
+
+    def reset(self) -> None:
+        """Returns every item to its prior (no demand observed)."""
+        n_items = len(self.item_names)
+        self.level = self._prior_level.copy()
+        self.weekday_offset = np.zeros((DAYS_PER_WEEK, n_items))
+        self.error_var = self._prior_var.copy()
+        self.n_days = 0
+        self.last_day = None # Day number of the last observed day
+
+    # --- Fitting ---
+    @traced('forecast.update_many', rows=lambda result, forecaster, first_date, demand_matrix: len(demand_matrix))
+    def update_many(self, first_date: date, demand_matrix) -> None:
+        """
+        Feeds consecutive days of observed demand into the model.
+
+        Args:
+            first_date: The calendar date of the first row.
+            demand_matrix: (days, items) demand aligned with item_names, or a
+                           DataFrame whose columns are item names (missing
+                           items count as zero demand).
+        """
+        if isinstance(demand_matrix, pd.DataFrame):
+            demand_matrix = demand_matrix.reindex(columns=self.item_names, fill_value=0).to_numpy()
+        demand_matrix = np.asarray(demand_matrix, dtype=np.float64)
+        days = demand_matrix.shape[0]
+        if days == 0:
+            return
+        first_day = _day_number(first_date)
+
+        level, offset, error_var = self.level, self.weekday_offset, self.error_var
+        for demand, weekday in zip(demand_matrix, _weekdays(first_day, days)):
+            season = offset[weekday] # View: updated in place below
+            error = demand - level - season
+            error_var += self.error_smoothing * (error * error - error_var)
+            level += self.alpha * error
+            if self.seasonal:
+                season += self.gamma * (demand - level - season)
+
+        self.n_days += days
+        self.last_day = first_day + days - 1
+
+    def update(self, sim_date: date, demand) -> None:
+        """Feeds one day of observed demand (aligned with item_names)."""
+        self.update_many(sim_date, np.asarray(demand, dtype=np.float64).reshape(1, -1))
+
+    def fit(self, first_date: date, demand_matrix) -> 'DemandForecaster':
+        """Refits from scratch on a demand history (see update_many) and returns self."""
+        self.reset()
+        self.update_many(first_date, demand_matrix)
+        return self
+
+    # --- Forecasting ---
+    def forecast(self, first_date: date, days: int) -> np.ndarray:
+        """
+        Expected daily demand for `days` days starting at first_date.
+
+        Returns:
+            A (days, items) float array; negative forecasts are clipped to 0.
+        """
+        weekdays = _weekdays(_day_number(first_date), max(int(days), 0))
+        return np.maximum(self.level + self.weekday_offset[weekdays], 0.0)
+
+    @traced('forecast.reorder_policy', rows=lambda result, *args, **kwargs: len(result) if result is not None else None)
+    def reorder_policy(self, item_params_df: pd.DataFrame, first_date: date,
+                       service_level: float = DEFAULT_SERVICE_LEVEL) -> pd.DataFrame | None:
+        """
+        Forecast-driven reorder points and quantities.
+
+        The reorder point covers the forecast demand over each item's
+        'buffer_days' from first_date plus safety stock of
+        z * sigma * sqrt(buffer_days), where sigma is the smoothed one-step
+        forecast error and z the standard normal quantile of service_level.
+        The reorder quantity covers the forecast demand over 'target_days'.
+        Both are rounded up to whole units.
+
+        Args:
+            item_params_df: DataFrame with 'buffer_days' and 'target_days', indexed by item_name.
+            first_date: The first day the policy covers (usually tomorrow).
+            service_level: Target probability of covering demand until the next replenishment.
+
+        Returns:
+            pd.DataFrame: FORECAST_POLICY_COLUMNS indexed like item_params_df
+            (items the forecaster does not know get zeros), or None if
+            input is invalid.
+        """
+        if item_params_df is None or first_date is None or not 0 < service_level < 1:
+            print("Error: Invalid input to reorder_policy.")
+            return None
+        try:
+            buffer_days = pd.to_numeric(item_params_df['buffer_days'], errors='coerce').fillna(0).clip(lower=0).to_numpy().astype(np.int64)
+            target_days = pd.to_numeric(item_params_df['target_days'], errors='coerce').fillna(0).clip(lower=0).to_numpy().astype(np.int64)
+        except KeyError as e:
+            print(f"Error: Missing expected column {e} in item_params_df.")
+            return None
+
+        positions = self.item_names.get_indexer(item_params_df.index)
+        known = positions >= 0
+        if not known.any():
+            return pd.DataFrame(0, index=item_params_df.index, columns=FORECAST_POLICY_COLUMNS)
+        positions = np.where(known, positions, 0)
+
+        # Cumulative forecast demand: row d is the total over the first d days
+        horizon = int(max(buffer_days.max(initial=0), target_days.max(initial=0)))
+        cumulative = np.zeros((horizon + 1, len(self.item_names)))
+        np.cumsum(self.forecast(first_date, horizon), axis=0, out=cumulative[1:])
+        columns = np.arange(len(positions))
+        cumulative = cumulative[:, positions]
+        buffer_demand = cumulative[buffer_days, columns]
+        target_demand = cumulative[target_days, columns]
+
+        sigma = np.sqrt(self.error_var[positions])
+        safety_stock = NormalDist().inv_cdf(service_level) * sigma * np.sqrt(buffer_days)
+        policy_df = pd.DataFrame({
+            'forecast_daily_demand': self.forecast(first_date, 1)[0, positions],
+            'forecast_std': sigma,
+            'safety_stock': safety_stock,
+            'reorder_point': np.ceil(buffer_demand + safety_stock).astype(np.int64),
+            'reorder_quantity': np.ceil(target_demand).astype(np.int64),
+        }, index=item_params_df.index, columns=FORECAST_POLICY_COLUMNS)
+        policy_df.loc[~known, FORECAST_POLICY_COLUMNS] = 0
+        return policy_df
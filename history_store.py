@@ -0,0 +1,234 @@
+import numpy as np
+import pandas as pd
+import os
+import tempfile
+import weakref
+
+from perf_trace import traced, rows_of_result
+
+# --- Constants ---
+INITIAL_DAYS = 256 # Rows allocated up front; capacity doubles when full
+DEFAULT_SPILL_BYTES = 256 * 1024 * 1024 # In-memory size above which a spill_dir store moves to a memory-mapped file
+HISTORY_CHART_POINTS = 400 # Target rows per chart after downsampling
+
+def _remove_file(path: str):
+    """Deletes a spill file, ignoring files that are already gone."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class HistoryStore:
+    """
+    Columnar daily quantity-on-hand history: one int64 row per simulated day,
+    one column per item.
+
+    Rows live in a preallocated (day x item) array that doubles in size when
+    full, so appending a day is amortized O(items) with no per-item objects.
+    With max_days set the array is a fixed-size ring buffer that keeps only
+    the most recent max_days rows.
+
+    If spill_dir is given, the array moves to a memory-mapped file in that
+    directory once it grows past spill_bytes, keeping multi-year histories
+    for many items out of RAM. The file is removed when the store is closed
+    or garbage collected.
+    """
+
+    def __init__(self, item_names, max_days: int | None = None, spill_dir: str | None = None,
+                 spill_bytes: int = DEFAULT_SPILL_BYTES):
+        self.item_names = pd.Index(item_names, name='item_name')
+        self._column_of = pd.Index(self.item_names)
+        self.max_days = int(max_days) if max_days is not None else None
+        self.spill_dir = spill_dir
+        self.spill_bytes = int(spill_bytes)
+
+        capacity = self.max_days if self.max_days is not None else INITIAL_DAYS
+        self._qoh = np.zeros((capacity, len(self.item_names)), dtype=np.int64)
+        self._days = np.zeros(capacity, dtype=np.int64)
+        self._head = 0 # Buffer row of the oldest day
+        self._length = 0 # Days stored
+        self._spill_path = None
+        self._finalizer = None
+
+    @classmethod
+    def from_arrays(cls, item_names, days, qoh_matrix, max_days: int | None = None, spill_dir: str | None = None,
+                    spill_bytes: int = DEFAULT_SPILL_BYTES) -> 'HistoryStore':
+        """
+        Builds a store holding the given days (oldest first), e.g. from a checkpoint.
+
+        Without max_days, qoh_matrix is adopted as the buffer without copying,
+        so a memory-mapped (copy-on-write) matrix stays on disk until the
+        first append grows the buffer. With max_days, the most recent
+        max_days rows are copied into the ring buffer.
+        """
+        store = cls(item_names, max_days, spill_dir, spill_bytes)
+        days = np.asarray(days, dtype=np.int64)
+        if store.max_days is not None:
+            n = min(len(days), store.max_days)
+            store._qoh[:n] = qoh_matrix[len(days) - n:]
+            store._days[:n] = days[len(days) - n:]
+            store._length = n
+        else:
+            store._qoh = qoh_matrix
+            store._days = days.copy()
+            store._length = len(days)
+        return store
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def days(self) -> np.ndarray:
+        """Day numbers of the stored rows, oldest first."""
+        return self._days[self._rows()]
+
+    # --- Appending ---
+    def append(self, day: int, item_qoh) -> None:
+        """Appends one day's quantity on hand (aligned with item_names)."""
+        self.append_many(day, np.asarray(item_qoh, dtype=np.int64).reshape(1, -1))
+
+    @traced('history_store.append_many', rows=lambda result, store, first_day, qoh_matrix: len(qoh_matrix))
+    def append_many(self, first_day: int, qoh_matrix) -> None:
+        """
+        Appends consecutive days starting at first_day.
+
+        Args:
+            first_day: The day number of the first row.
+            qoh_matrix: (days, items) quantities, or a DataFrame whose columns
+                        are item names (e.g. the qoh history of simulate_horizon).
+        """
+        if isinstance(qoh_matrix, pd.DataFrame):
+            qoh_matrix = qoh_matrix.reindex(columns=self.item_names, fill_value=0).to_numpy()
+        qoh_matrix = np.asarray(qoh_matrix, dtype=np.int64)
+        n = qoh_matrix.shape[0]
+        if n == 0:
+            return
+        days = first_day + np.arange(n, dtype=np.int64)
+
+        if self.max_days is not None:
+            # Ring buffer: only the last max_days rows can survive
+            if n > self.max_days:
+                qoh_matrix, days = qoh_matrix[-self.max_days:], days[-self.max_days:]
+                n = self.max_days
+            rows = (self._head + self._length + np.arange(n)) % self.max_days
+            overflow = max(0, self._length + n - self.max_days)
+            self._head = (self._head + overflow) % self.max_days
+            self._length = min(self._length + n, self.max_days)
+        else:
+            self._reserve(self._length + n)
+            rows = np.arange(self._length, self._length + n)
+            self._length += n
+
+        self._qoh[rows] = qoh_matrix
+        self._days[rows] = days
+
+    def clear(self) -> None:
+        """Drops all stored days (capacity and any spill file are kept)."""
+        self._head = 0
+        self._length = 0
+
+    def close(self) -> None:
+        """Releases the spill file, if any; the store is empty afterwards."""
+        self._qoh = np.zeros((0, len(self.item_names)), dtype=np.int64)
+        self._days = np.zeros(0, dtype=np.int64)
+        self.clear()
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+            self._spill_path = None
+
+    # --- Reading ---
+    @traced('history_store.frame', rows=rows_of_result)
+    def frame(self, item_names=None, max_points: int | None = None) -> pd.DataFrame:
+        """
+        Returns the history as a (day x item) DataFrame for charting.
+
+        Args:
+            item_names: The items to include (default: all).
+            max_points: If given and there are more days than this, the rows
+                        are downsampled to about max_points while keeping
+                        each bucket's minimum and maximum for every item
+                        (see _downsample_min_max).
+        """
+        columns = np.arange(len(self.item_names)) if item_names is None else self._column_of.get_indexer(pd.Index(item_names))
+        columns = columns[columns >= 0]
+        rows = self._rows()
+        qoh, days = self._qoh[rows][:, columns], self._days[rows]
+        if max_points is not None and len(days) > max_points:
+            days, qoh = _downsample_min_max(days, qoh, max_points)
+        return pd.DataFrame(qoh, index=pd.Index(days, name='day'), columns=self.item_names[columns])
+
+    # --- Internals ---
+    def _rows(self) -> np.ndarray:
+        """Buffer rows of the stored days, oldest first."""
+        if self.max_days is None:
+            return np.arange(self._length)
+        return (self._head + np.arange(self._length)) % self.max_days
+
+    def _reserve(self, needed: int):
+        """Grows the buffer (doubling) to at least `needed` rows, spilling to disk past spill_bytes."""
+        capacity = self._qoh.shape[0]
+        if needed <= capacity:
+            return
+        capacity = max(capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+
+        n_items = len(self.item_names)
+        if self.spill_dir is not None and capacity * n_items * 8 > self.spill_bytes:
+            handle, path = tempfile.mkstemp(prefix='history_', suffix='.qoh', dir=self.spill_dir)
+            os.close(handle)
+            grown = np.memmap(path, dtype=np.int64, mode='w+', shape=(capacity, n_items))
+            grown[:self._length] = self._qoh[:self._length]
+            # Replace (and delete) any previous spill file
+            if self._finalizer is not None:
+                self._finalizer.detach()
+            old_path = self._spill_path
+            self._spill_path = path
+            self._finalizer = weakref.finalize(self, _remove_file, path)
+            self._qoh = grown
+            if old_path is not None:
+                _remove_file(old_path)
+        else:
+            grown = np.zeros((capacity, n_items), dtype=np.int64)
+            grown[:self._length] = self._qoh[:self._length]
+            self._qoh = grown
+
+        days = np.zeros(capacity, dtype=np.int64)
+        days[:self._length] = self._days[:self._length]
+        self._days = days
+
+def _downsample_min_max(days: np.ndarray, qoh: np.ndarray, max_points: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reduces (days, items) to about max_points rows, keeping peaks and troughs.
+
+    The days are split into max_points // 2 equal buckets. Each bucket becomes
+    two rows, at its first and last day. For every item, those rows hold the
+    bucket's minimum and maximum, in the order they occurred, so the line
+    still reaches every extreme.
+    """
+    n_days = len(days)
+    n_buckets = max(1, max_points // 2)
+    bucket_size = -(-n_days // n_buckets) # Ceiling division
+    n_buckets = -(-n_days // bucket_size)
+
+    # Pad the last bucket by repeating its final row so buckets reshape evenly
+    padded = np.concatenate([qoh, np.repeat(qoh[-1:], n_buckets * bucket_size - n_days, axis=0)])
+    buckets = padded.reshape(n_buckets, bucket_size, qoh.shape[1])
+    argmin, argmax = buckets.argmin(axis=1), buckets.argmax(axis=1)
+    low = np.take_along_axis(buckets, argmin[:, None, :], axis=1)[:, 0, :]
+    high = np.take_along_axis(buckets, argmax[:, None, :], axis=1)[:, 0, :]
+    min_first = argmin <= argmax
+
+    out = np.empty((n_buckets, 2, qoh.shape[1]), dtype=qoh.dtype)
+    out[:, 0, :] = np.where(min_first, low, high)
+    out[:, 1, :] = np.where(min_first, high, low)
+
+    starts = np.arange(n_buckets) * bucket_size
+    ends = np.minimum(starts + bucket_size, n_days) - 1
+    out_days = np.stack([days[starts], days[ends]], axis=1).reshape(-1)
+    out = out.reshape(-1, qoh.shape[1])
+
+    # Single-day buckets would duplicate their row
+    keep = np.r_[True, out_days[1:] != out_days[:-1]]
+    return out_days[keep], out[keep]
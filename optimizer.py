@@ -0,0 +1,293 @@
+import numpy as np
+import pandas as pd
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from perf_trace import traced, rows_of_first_arg
+from simulation import _fefo_consume_sorted, _prepare_lot_arrays, _usage_bounds, _NAT_DAY, DEFAULT_LEAD_TIME_DAYS
+
+# --- Constants ---
+DEFAULT_BUFFER_DAYS_OPTIONS = range(1, 15)
+DEFAULT_TARGET_DAYS_OPTIONS = range(2, 61, 2)
+SCREENING_HORIZON_DAYS = 120 # Horizon used to screen out dominated candidates before the full run
+FINALISTS_PER_ITEM = 8 # Non-dominated candidates carried into the full evaluation
+
+# --- Policy Evaluation ---
+def _evaluate_item_candidates(lot_expiry_days: np.ndarray, lot_qoh: np.ndarray, order_expiry_days: np.ndarray,
+                              rops: np.ndarray, roqs: np.ndarray, demand: np.ndarray, first_day: int,
+                              lead_time: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Replays one item's (reorder point, reorder quantity) candidates against the same demand.
+
+    Every lot the item could ever hold is laid out once, sorted by expiry: the
+    initial lots plus one slot per horizon day for an order arriving that day
+    (its expiry follows from the shelf life). Orders only fill their slot, so
+    FEFO consumption never needs a re-sort. Only the window of slots that can
+    still hold stock is touched each day.
+
+    Args:
+        lot_expiry_days: (n_lots,) last usable day of each initial lot (no NaT).
+        lot_qoh: (n_lots,) quantity of each initial lot.
+        order_expiry_days: (days,) last usable day of a lot arriving at the end of each day.
+        rops, roqs: (n_candidates,) reorder point and reorder quantity per candidate.
+        demand: (n_replicates, days) daily demand, shared by all candidates.
+        first_day: Day number of the first simulated day.
+        lead_time: Days between placing an order and its arrival.
+
+    Returns:
+        (stockout_days, units_expired), each shaped (n_candidates, n_replicates).
+    """
+    n_candidates = rops.size
+    n_replicates, days = demand.shape
+    n_init = lot_expiry_days.size
+
+    # Static slot layout: initial lots, then one slot per arrival day, sorted by expiry
+    expiry = np.r_[lot_expiry_days, order_expiry_days]
+    arrival = np.r_[np.full(n_init, first_day - 1), first_day + np.arange(days)] # Usable from the next day
+    layout = np.lexsort((arrival, expiry))
+    expiry, arrival = expiry[layout], arrival[layout]
+    slot_of = np.empty(layout.size, dtype=np.int64)
+    slot_of[layout] = np.arange(layout.size)
+    initial_slots = np.sort(slot_of[:n_init])
+    order_slots = slot_of[n_init:]
+
+    qty = np.zeros((n_candidates, n_replicates, layout.size), dtype=np.int64)
+    qty[..., slot_of[:n_init]] = lot_qoh
+    qty[..., expiry < first_day] = 0 # Already expired before the horizon; not counted as waste
+
+    stockout_days = np.zeros((n_candidates, n_replicates), dtype=np.int32)
+    units_expired = np.zeros((n_candidates, n_replicates), dtype=np.int64)
+    late_pipeline = np.zeros((n_candidates, n_replicates), dtype=np.int64) # Orders arriving after the horizon
+    rops = rops.reshape(-1, 1)
+    roqs = roqs.reshape(-1, 1)
+    single_item = np.zeros(1, dtype=np.int64)
+
+    # A slot that has arrived and is empty in every candidate/replicate can never be
+    # refilled, so it drops out of the window for good
+    live = np.ones(layout.size, dtype=bool)
+    hi = -1
+    for t in range(days):
+        day = first_day + t
+
+        # Window: live slots up to the last order slot, plus initial lots beyond it
+        window = np.r_[np.flatnonzero(live[:hi + 1]), initial_slots[(initial_slots > hi) & live[initial_slots]]]
+        window_qty = qty[..., window]
+
+        # Lots past their last usable day are wasted
+        expired = expiry[window] < day
+        if expired.any():
+            units_expired += window_qty[..., expired].sum(axis=-1)
+            window_qty[..., expired] = 0
+
+        available = np.where(arrival[window] < day, window_qty, 0)
+        consumed = _fefo_consume_sorted(single_item.repeat(window.size), available, demand[:, t, np.newaxis])
+        window_qty -= consumed
+        stockout_days += demand[:, t] > consumed.sum(axis=-1)
+
+        # Inventory position: stock usable tomorrow plus everything in transit
+        position = window_qty[..., expiry[window] > day].sum(axis=-1) + late_pipeline
+        order_qty = np.where(position <= rops, roqs, 0)
+
+        qty[..., window] = window_qty
+        live[window[(arrival[window] <= day) & ~window_qty.any(axis=(0, 1))]] = False
+
+        # Order slots are increasing in arrival day, so a new order always lands past the window
+        if t + lead_time < days:
+            hi = order_slots[t + lead_time]
+            qty[..., hi] += order_qty
+        else:
+            late_pipeline += order_qty
+
+    return stockout_days, units_expired
+
+def _pareto_front(stockout_days: np.ndarray, units_expired: np.ndarray) -> np.ndarray:
+    """Boolean mask of candidates that no other candidate beats on both stockouts and waste."""
+    no_worse = (stockout_days[np.newaxis, :] <= stockout_days[:, np.newaxis]) & (units_expired[np.newaxis, :] <= units_expired[:, np.newaxis])
+    better = (stockout_days[np.newaxis, :] < stockout_days[:, np.newaxis]) | (units_expired[np.newaxis, :] < units_expired[:, np.newaxis])
+    return ~(no_worse & better).any(axis=1)
+
+def _optimize_item(task: dict) -> dict:
+    """
+    Searches one item's (buffer_days, target_days) grid.
+
+    Candidates whose order quantity cannot be used within the shelf life are
+    pruned up front; the rest are screened on a short horizon with a few
+    replicates, dominated candidates are dropped, and only the best
+    non-dominated finalists (plus the current setting) get the full run.
+    """
+    max_usage = task['max_usage']
+    expected_usage = task['expected_usage']
+    buffers, targets = np.meshgrid(task['buffer_days_options'], task['target_days_options'], indexing='ij')
+    buffers, targets = buffers.ravel(), targets.ravel()
+
+    # Shelf-life pruning: an order larger than what can be used before it expires
+    # always wastes stock; keep the smallest target per buffer so none is emptied
+    wasteful = max_usage * targets > expected_usage * task['shelf_life_days']
+    smallest_target = targets == targets.min()
+    feasible = ~wasteful | smallest_target
+    buffers, targets = buffers[feasible], targets[feasible]
+
+    def evaluate(candidate_buffers, candidate_targets, demand):
+        stockout_days, units_expired = _evaluate_item_candidates(
+            task['lot_expiry_days'], task['lot_qoh'], task['order_expiry_days'][:demand.shape[1]],
+            max_usage * candidate_buffers, max_usage * candidate_targets, demand, task['first_day'], task['lead_time']
+        )
+        stockout_days = stockout_days.mean(axis=1)
+        units_expired = units_expired.mean(axis=1)
+        score = task['stockout_weight'] * stockout_days + task['waste_weight'] * units_expired / max(expected_usage, 1.0)
+        return stockout_days, units_expired, score
+
+    demand = np.random.default_rng(task['seed']).integers(task['low'], task['high'] + 1, size=(task['replicates'], task['days']))
+    screening = demand[:task['screening_replicates'], :min(SCREENING_HORIZON_DAYS, demand.shape[1])]
+    stockout_days, units_expired, score = evaluate(buffers, targets, screening)
+    front = np.flatnonzero(_pareto_front(stockout_days, units_expired))
+    finalists = front[np.argsort(score[front], kind='stable')[:task['finalists']]]
+
+    # Full evaluation of the finalists and the current setting (always last)
+    final_buffers = np.r_[buffers[finalists], task['current_buffer_days']]
+    final_targets = np.r_[targets[finalists], task['current_target_days']]
+    stockout_days, units_expired, score = evaluate(final_buffers, final_targets, demand)
+    best = int(np.argmin(score[:-1]))
+    if score[-1] <= score[best]:
+        best = final_buffers.size - 1 # Only recommend a change that improves on the current setting
+
+    return {
+        'buffer_days': int(final_buffers[best]),
+        'target_days': int(final_targets[best]),
+        'reorder_point': int(max_usage * final_buffers[best]),
+        'reorder_quantity': int(max_usage * final_targets[best]),
+        'expected_stockout_days': float(stockout_days[best]),
+        'expected_units_expired': float(units_expired[best]),
+        'score': float(score[best]),
+        'current_stockout_days': float(stockout_days[-1]),
+        'current_units_expired': float(units_expired[-1]),
+        'current_score': float(score[-1]),
+        'candidates_screened': int(buffers.size),
+    }
+
+@traced('optimizer.optimize_reorder_policy', rows=rows_of_first_arg)
+def optimize_reorder_policy(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, start_date: date,
+                            days: int = 365, replicates: int = 16,
+                            buffer_days_options=DEFAULT_BUFFER_DAYS_OPTIONS,
+                            target_days_options=DEFAULT_TARGET_DAYS_OPTIONS,
+                            stockout_weight: float = 5.0, waste_weight: float = 1.0,
+                            lead_time: int | None = None, seed: int | None = 0,
+                            n_workers: int | None = None) -> pd.DataFrame | None:
+    """
+    Recommends per-item buffer_days / target_days by simulating candidate reorder policies.
+
+    Each candidate sets reorder_point = max_daily_usage * buffer_days and
+    reorder_quantity = max_daily_usage * target_days (as in the loader). A
+    candidate is replayed over `days` with an order placed whenever usable
+    stock plus stock in transit is at or below the reorder point; new lots
+    expire after 'standard_shelf_life_months'. Candidates are scored as
+
+        stockout_weight * stockout days + waste_weight * expired units / expected daily usage
+
+    so both terms are in days. All candidates of an item see the same demand
+    draws. Items are optimized in parallel across a process pool.
+
+    Args:
+        batches_df: DataFrame containing current inventory batches.
+        item_params_df: DataFrame containing item parameters, indexed by item_name.
+                        Must include 'min_daily_usage', 'max_daily_usage',
+                        'standard_shelf_life_months', 'buffer_days' and 'target_days'.
+        start_date: The simulation date of the first simulated day.
+        days: Evaluation horizon in days.
+        replicates: Demand replicates per item.
+        buffer_days_options, target_days_options: The candidate grid.
+        stockout_weight, waste_weight: Relative cost of a stockout day and of a day's worth of expired stock.
+        lead_time: Days between placing an order and its arrival. None uses each
+                   item's 'lead_time_days' (DEFAULT_LEAD_TIME_DAYS if absent).
+        seed: Seed for the demand draws. None draws fresh entropy.
+        n_workers: Number of worker processes. None uses all CPUs; 1 runs inline.
+
+    Returns:
+        pd.DataFrame | None: Recommended parameters and their expected stockout
+        days / expired units next to those of the current setting, indexed by
+        item_name. Returns None if input is invalid.
+    """
+    required = ['max_daily_usage', 'standard_shelf_life_months', 'buffer_days', 'target_days']
+    if batches_df is None or item_params_df is None or start_date is None or not days:
+        print("Error: Invalid input to optimize_reorder_policy.")
+        return None
+    missing = [col for col in required if col not in item_params_df.columns]
+    if missing:
+        print(f"Error: Missing columns {missing} in item_params_df. Cannot optimize reorder policy.")
+        return None
+
+    days = int(days)
+    start_ts = pd.to_datetime(start_date)
+    first_day = int(np.datetime64(start_ts, 'D').astype(np.int64))
+    arrival_dates = pd.date_range(start_ts, periods=days, freq='D')
+
+    lots = _prepare_lot_arrays(batches_df, item_params_df)
+    low, high = _usage_bounds(item_params_df)
+    group_of = dict(zip(lots['group_codes'], zip(lots['group_starts'], np.r_[lots['group_starts'][1:], lots['item_codes'].size])))
+    item_seeds = np.random.SeedSequence(seed).spawn(len(item_params_df))
+    buffer_days_options = np.asarray(list(buffer_days_options), dtype=np.int64)
+    target_days_options = np.asarray(list(target_days_options), dtype=np.int64)
+
+    if lead_time is not None:
+        lead_times = pd.Series(lead_time, index=item_params_df.index)
+    elif 'lead_time_days' in item_params_df.columns:
+        lead_times = pd.to_numeric(item_params_df['lead_time_days'], errors='coerce').fillna(DEFAULT_LEAD_TIME_DAYS)
+    else:
+        lead_times = pd.Series(DEFAULT_LEAD_TIME_DAYS, index=item_params_df.index)
+    lead_times = lead_times.clip(lower=0).to_numpy().astype(np.int64)
+
+    tasks = []
+    order_expiry_cache = {} # Shelf life (months) -> expiry day of a lot arriving each day
+    for code, item_name in enumerate(item_params_df.index):
+        try:
+            shelf_life_months = int(item_params_df['standard_shelf_life_months'].iloc[code])
+            current_buffer_days = int(item_params_df['buffer_days'].iloc[code])
+            current_target_days = int(item_params_df['target_days'].iloc[code])
+        except (ValueError, TypeError) as e:
+            print(f"Warning: Skipping policy optimization for {item_name}: invalid parameters ({e}).")
+            continue
+
+        if shelf_life_months not in order_expiry_cache:
+            order_expiry_cache[shelf_life_months] = (arrival_dates + pd.DateOffset(months=shelf_life_months)).to_numpy(dtype='datetime64[D]').astype(np.int64)
+        order_expiry_days = order_expiry_cache[shelf_life_months]
+
+        start, end = group_of.get(code, (0, 0))
+        usable = lots['expiry_days'][start:end] != _NAT_DAY
+        tasks.append({
+            'item_name': item_name,
+            'lot_expiry_days': lots['expiry_days'][start:end][usable],
+            'lot_qoh': lots['qoh'][start:end][usable],
+            'order_expiry_days': order_expiry_days,
+            'shelf_life_days': float(order_expiry_days[0] - first_day),
+            'max_usage': int(high[code]),
+            'expected_usage': (low[code] + high[code]) / 2.0,
+            'low': int(low[code]),
+            'high': int(high[code]),
+            'seed': item_seeds[code],
+            'replicates': int(replicates),
+            'days': days,
+            'current_buffer_days': current_buffer_days,
+            'current_target_days': current_target_days,
+            'buffer_days_options': buffer_days_options,
+            'target_days_options': target_days_options,
+            'screening_replicates': max(2, replicates // 4),
+            'finalists': FINALISTS_PER_ITEM,
+            'stockout_weight': stockout_weight,
+            'waste_weight': waste_weight,
+            'first_day': first_day,
+            'lead_time': int(lead_times[code]),
+        })
+
+    n_workers = min(n_workers or os.cpu_count() or 1, max(len(tasks), 1))
+    if n_workers <= 1:
+        results = [_optimize_item(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(_optimize_item, tasks, chunksize=max(1, len(tasks) // (n_workers * 4))))
+
+    policy_df = pd.DataFrame(results, index=pd.Index([task['item_name'] for task in tasks], name='item_name'))
+    if not policy_df.empty:
+        policy_df.insert(0, 'current_buffer_days', [task['current_buffer_days'] for task in tasks])
+        policy_df.insert(1, 'current_target_days', [task['current_target_days'] for task in tasks])
+    return policy_df
@@ -0,0 +1,197 @@
+import pandas as pd
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# --- Constants ---
+MAX_TRACE_EVENTS = 20_000 # Individual spans kept for the Chrome trace; older ones are dropped (aggregates keep counting)
+STATS_COLUMNS = ['calls', 'total_ms', 'mean_ms', 'max_ms', 'rows']
+
+_active_tracer = ContextVar('active_tracer', default=None)
+
+class Tracer:
+    """
+    Collects timing spans for one session.
+
+    Every span updates a per-name aggregate (calls, total and maximum time,
+    rows touched) and is appended to a bounded event buffer for the Chrome
+    trace export. Span times are inclusive: a callback's span contains the
+    spans of the functions it calls.
+
+    Spans are only recorded while a tracer is active in the current context
+    (see use_tracer); otherwise span() and @traced cost one context
+    variable lookup.
+    """
+
+    def __init__(self, max_events: int = MAX_TRACE_EVENTS):
+        self._stats = {} # name -> [calls, total_ns, max_ns, rows]
+        self._events = deque(maxlen=max_events) # (name, start_ns, duration_ns, rows, thread_id)
+        self._lock = threading.Lock() # Callbacks and fragment reruns may record from different threads
+        self._origin_ns = time.perf_counter_ns() # Chrome trace timestamps are relative to this
+
+    def __len__(self) -> int:
+        """Number of spans in the event buffer."""
+        return len(self._events)
+
+    def record(self, name: str, start_ns: int, duration_ns: int, rows: int | None = None) -> None:
+        """Adds one finished span (times from time.perf_counter_ns)."""
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = [0, 0, 0, 0]
+            stats[0] += 1
+            stats[1] += duration_ns
+            stats[2] = max(stats[2], duration_ns)
+            if rows is not None:
+                rows = int(rows) # NumPy integers are not JSON serializable
+                stats[3] += rows
+            self._events.append((name, start_ns, duration_ns, rows, threading.get_ident()))
+
+    def reset(self) -> None:
+        """Drops all aggregates and events."""
+        with self._lock:
+            self._stats.clear()
+            self._events.clear()
+            self._origin_ns = time.perf_counter_ns()
+
+    # --- Export ---
+    def stats(self) -> pd.DataFrame:
+        """Aggregates per span name (STATS_COLUMNS), slowest total first."""
+        with self._lock:
+            items = [(name, list(values)) for name, values in self._stats.items()]
+        df = pd.DataFrame([[calls, total_ns / 1e6, total_ns / 1e6 / calls, max_ns / 1e6, rows]
+                           for _, (calls, total_ns, max_ns, rows) in items],
+                          index=pd.Index([name for name, _ in items], name='span'), columns=STATS_COLUMNS)
+        return df.sort_values('total_ms', ascending=False)
+
+    def to_json(self) -> str:
+        """The aggregates and the buffered spans as a JSON document."""
+        with self._lock:
+            events = list(self._events)
+            origin_ns = self._origin_ns
+        stats = self.stats()
+        return json.dumps({
+            'spans': [{'name': name, **{column: float(value) if column.endswith('_ms') else int(value)
+                                        for column, value in row.items()}} for name, row in stats.iterrows()],
+            'events': [{'name': name, 'start_ms': (start_ns - origin_ns) / 1e6, 'duration_ms': duration_ns / 1e6,
+                        'rows': rows, 'thread': thread_id} for name, start_ns, duration_ns, rows, thread_id in events],
+        }, indent=2)
+
+    def to_chrome_trace(self) -> str:
+        """The buffered spans in Chrome trace event format (load in chrome://tracing or Perfetto)."""
+        with self._lock:
+            events = list(self._events)
+            origin_ns = self._origin_ns
+        pid = os.getpid()
+        return json.dumps({
+            'traceEvents': [{'name': name, 'cat': name.split('.', 1)[0], 'ph': 'X', 'pid': pid, 'tid': thread_id,
+                             'ts': (start_ns - origin_ns) / 1e3, 'dur': duration_ns / 1e3, # Microseconds
+                             'args': {} if rows is None else {'rows': rows}}
+                            for name, start_ns, duration_ns, rows, thread_id in events],
+            'displayTimeUnit': 'ms',
+        })
+
+# --- Recording ---
+@contextmanager
+def use_tracer(tracer: Tracer | None):
+    """Makes `tracer` the active tracer of the current context for the duration of the block."""
+    token = _active_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _active_tracer.reset(token)
+
+def activate(tracer: Tracer | None) -> None:
+    """Makes `tracer` the active tracer for the rest of the current context (e.g. one Streamlit script run)."""
+    _active_tracer.set(tracer)
+
+def active_tracer() -> Tracer | None:
+    """The tracer spans are currently recorded to, if any."""
+    return _active_tracer.get()
+
+class _Span:
+    """A running span; set .rows inside the block to record rows touched."""
+    __slots__ = ('tracer', 'name', 'rows', '_start_ns')
+
+    def __init__(self, tracer: Tracer, name: str, rows: int | None):
+        self.tracer, self.name, self.rows = tracer, name, rows
+
+    def __enter__(self):
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end_ns = time.perf_counter_ns()
+        self.tracer.record(self.name, self._start_ns, end_ns - self._start_ns, self.rows)
+        return False
+
+class _NullSpan:
+    """Stand-in when no tracer is active; accepts .rows and records nothing."""
+    __slots__ = ('rows',)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name: str, rows: int | None = None):
+    """
+    Times a block as a span named `name` in the active tracer.
+
+        with span('app.render') as s:
+            ...
+            s.rows = len(df)
+    """
+    tracer = _active_tracer.get()
+    if tracer is None:
+        return _NULL_SPAN
+    return _Span(tracer, name, rows)
+
+def traced(name: str | None = None, rows=None):
+    """
+    Decorator recording each call as a span in the active tracer.
+
+    Args:
+        name: Span name (default: '<module>.<qualified function name>').
+        rows: Optional callable(result, *args, **kwargs) -> int giving the
+              rows the call touched; errors in it are ignored.
+    """
+    def decorate(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _active_tracer.get()
+            if tracer is None:
+                return func(*args, **kwargs)
+            start_ns = time.perf_counter_ns()
+            result = func(*args, **kwargs)
+            duration_ns = time.perf_counter_ns() - start_ns
+            touched = None
+            if rows is not None:
+                try:
+                    touched = rows(result, *args, **kwargs)
+                except (TypeError, ValueError, AttributeError, IndexError, KeyError):
+                    touched = None
+            tracer.record(span_name, start_ns, duration_ns, touched)
+            return result
+        return wrapper
+    return decorate
+
+def rows_of_result(result, *args, **kwargs) -> int | None:
+    """rows= helper: the length of the return value (the first element if it is a tuple)."""
+    if isinstance(result, tuple):
+        result = result[0]
+    return len(result) if result is not None else None
+
+def rows_of_first_arg(result, *args, **kwargs) -> int | None:
+    """rows= helper: the length of the first argument (e.g. the batches DataFrame); not for methods, where it is self."""
+    return len(args[0]) if args and args[0] is not None else None
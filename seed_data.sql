@@ -1,4 +1,6 @@
--- Drop the table if it exists (optional, useful for ensuring a clean seed)
+-- Drop the views and table if they exist (optional, useful for ensuring a clean seed)
+DROP VIEW IF EXISTS item_inventory_summary;
+DROP VIEW IF EXISTS item_stock_levels;
 DROP TABLE IF EXISTS inventory_items;
 
 -- Create the table schema
@@ -10,7 +12,8 @@ CREATE TABLE inventory_items (
     target_days INTEGER NOT NULL,
     initial_quantity_on_hand INTEGER NOT NULL,
     standard_shelf_life_months INTEGER NOT NULL DEFAULT 12, -- Added shelf life column with a default
-    category TEXT -- Added category column
+    category TEXT, -- Added category column
+    lead_time_days INTEGER NOT NULL DEFAULT 0 -- Days between placing an order and its arrival
 );
 
 -- Create the inventory_batches table schema
@@ -23,18 +26,20 @@ CREATE TABLE inventory_batches (
     FOREIGN KEY (item_name) REFERENCES inventory_items(item_name)
 );
 
+-- The batch index, the summary views and the sim_state table are created by data_loader (SCHEMA_OBJECTS_SQL)
+
 -- Insert the seeding data for inventory_items including standard_shelf_life_months
 -- Using example shelf life values (in months)
-INSERT INTO inventory_items (item_name, min_daily_usage, max_daily_usage, buffer_days, target_days, initial_quantity_on_hand, standard_shelf_life_months, category) VALUES
-('Parvo tests', 0, 5, 3, 7, 12, 12, 'Test Kit'),
-('Blood cartridges', 8, 30, 3, 10, 105, 6, 'Consumable'),
-('Antigen tests', 10, 25, 3, 10, 70, 12, 'Test Kit'),
-('Slide type 1', 5, 20, 5, 14, 200, 36, 'Consumable'),
-('Slide type 2', 5, 20, 5, 14, 250, 36, 'Consumable'),
-('Cover glass', 10, 45, 5, 14, 450, 60, 'Consumable'),
-('Applicator type 1', 10, 30, 4, 10, 140, 24, 'Consumable'),
-('Applicator type 2', 5, 20, 4, 14, 220, 24, 'Consumable'),
-('Applicator type 3', 5, 20, 4, 14, 240, 24, 'Consumable');
+INSERT INTO inventory_items (item_name, min_daily_usage, max_daily_usage, buffer_days, target_days, initial_quantity_on_hand, standard_shelf_life_months, category, lead_time_days) VALUES
+('Parvo tests', 0, 5, 3, 7, 12, 12, 'Test Kit', 2),
+('Blood cartridges', 8, 30, 3, 10, 105, 6, 'Consumable', 3),
+('Antigen tests', 10, 25, 3, 10, 70, 12, 'Test Kit', 2),
+('Slide type 1', 5, 20, 5, 14, 200, 36, 'Consumable', 5),
+('Slide type 2', 5, 20, 5, 14, 250, 36, 'Consumable', 5),
+('Cover glass', 10, 45, 5, 14, 450, 60, 'Consumable', 5),
+('Applicator type 1', 10, 30, 4, 10, 140, 24, 'Consumable', 3),
+('Applicator type 2', 5, 20, 4, 14, 220, 24, 'Consumable', 3),
+('Applicator type 3', 5, 20, 4, 14, 240, 24, 'Consumable', 3);
 
 -- Insert initial batch data based on initial_quantity_on_hand from inventory_items
 -- Using varied expiry dates relative to the current date (approx 2025-04-11) for testing alerts
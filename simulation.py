@@ -1,15 +1,125 @@
+import numpy as np
 import pandas as pd
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta, datetime # Ensure date, timedelta, datetime are imported
 
+from perf_trace import traced, rows_of_first_arg, rows_of_result
+
 # --- Constants ---
 ALERT_DAYS_BEFORE_EXPIRY = 30
 
 # --- Simulation Functions ---
+def _usage_bounds(item_params_df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Validates per-item daily usage bounds, in item_params_df index order.
+
+    Returns:
+        (low, high) int64 arrays. Items with min > max use min for both bounds;
+        items with missing or invalid usage parameters get (0, 0).
+    """
+    n_items = len(item_params_df)
+    try:
+        min_usage = pd.to_numeric(item_params_df['min_daily_usage'], errors='coerce')
+        max_usage = pd.to_numeric(item_params_df['max_daily_usage'], errors='coerce')
+    except KeyError as e:
+        print(f"Error: Missing expected column {e} in item_params_df. Skipping consumption.")
+        return np.zeros(n_items, dtype=np.int64), np.zeros(n_items, dtype=np.int64)
+
+    invalid = (min_usage.isna() | max_usage.isna()).to_numpy()
+    for item_name in item_params_df.index[invalid]:
+        print(f"Error processing item {item_name}: Invalid data type for usage calculation. Skipping consumption.")
+
+    low = min_usage.fillna(0).to_numpy().astype(np.int64)
+    high = max_usage.fillna(0).to_numpy().astype(np.int64)
+    low[invalid] = 0
+    high[invalid] = 0
+
+    for pos in np.flatnonzero(low > high):
+        print(f"Warning: Min usage ({low[pos]}) > Max usage ({high[pos]}) for item {item_params_df.index[pos]}. Using min_usage.")
+    high = np.maximum(low, high)
+
+    return low, high
+
+def _item_codes(item_index: pd.Index, item_names) -> np.ndarray:
+    """
+    Maps item names to their positions in item_index (-1 if unknown).
+
+    A Categorical column (as produced by the loader and BatchStore) is
+    mapped through its categories, so only the distinct names are looked
+    up and the lots themselves are never compared as strings.
+    """
+    item_index = pd.Index(item_index)
+    dtype = getattr(item_names, 'dtype', None)
+    if isinstance(dtype, pd.CategoricalDtype):
+        category_codes = np.append(item_index.get_indexer(dtype.categories), -1) # Code -1 (missing) -> -1
+        return category_codes[pd.Series(item_names, copy=False).cat.codes.to_numpy()]
+    return item_index.get_indexer(item_names)
+
+def _draw_daily_demand(item_params_df: pd.DataFrame) -> np.ndarray:
+    """
+    Draws one day of demand for every item, in item_params_df index order.
+
+    Uses the global `random` module with one `random.randint` call per item
+    that has a usage range (in index order), so a seeded run produces the
+    same draws as before.
+
+    Returns:
+        An int64 array aligned with item_params_df.index.
+    """
+    low, high = _usage_bounds(item_params_df)
+    demand = low.copy()
+    for pos in np.flatnonzero(low < high):
+        demand[pos] = random.randint(int(low[pos]), int(high[pos]))
+    return demand
+
+def _fefo_consume_sorted(item_codes: np.ndarray, available: np.ndarray, demand: np.ndarray) -> np.ndarray:
+    """
+    FEFO consumption kernel over lots pre-sorted by (item code, expiry).
+
+    Each lot takes whatever is left of its item's demand after all earlier
+    lots of the same item, capped at its own available quantity:
+    consumed = clip(demand - qty_in_earlier_lots, 0, available).
+
+    Args:
+        item_codes: (n_lots,) non-negative item code per lot, grouped by code
+                    and ordered by expiry within each group.
+        available: (..., n_lots) quantity that can be consumed from each lot.
+                   Set to 0 for lots that are expired or otherwise unusable.
+        demand: (..., n_items) demand per item code. Leading axes (e.g. a
+                replicate axis) must broadcast against `available`.
+
+    Returns:
+        An array shaped like `available` with the quantity taken from each lot.
+    """
+    if item_codes.size == 0:
+        return np.zeros_like(available)
+
+    before = np.cumsum(available, axis=-1)
+    before -= available # Quantity in all earlier lots (across items)
+
+    # Subtract the running total at the start of each item group so 'before'
+    # only counts earlier lots of the same item
+    group_starts = np.flatnonzero(np.r_[True, item_codes[1:] != item_codes[:-1]])
+    group_lengths = np.diff(np.r_[group_starts, item_codes.size])
+    before -= np.repeat(np.take(before, group_starts, axis=-1), group_lengths, axis=-1)
+
+    # In-place clip; np.clip with array bounds is several times slower
+    consumed = np.take(demand, item_codes, axis=-1) - before
+    np.maximum(consumed, 0, out=consumed)
+    np.minimum(consumed, available, out=consumed)
+    return consumed
+
+@traced('simulation.advance_day', rows=rows_of_first_arg)
 def advance_day(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, current_sim_date: date) -> pd.DataFrame:
     """
     Simulates one day of inventory consumption using FEFO (First-Expired, First-Out).
 
+    Demand is drawn once per item, then applied to all batches in a single
+    vectorized pass: active batches are sorted by (item, expiry) and each
+    batch's consumption is computed from per-item cumulative quantities.
+
     Args:
         batches_df: DataFrame containing current inventory batches.
                     Must include 'item_name', 'quantity_on_hand', 'expiry_date'.
@@ -39,68 +149,952 @@ def advance_day(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, current_
     # Convert current_sim_date to datetime64[ns] to match pandas datetime objects for comparison
     current_sim_date_dt = pd.to_datetime(current_sim_date)
 
-    for item_name in item_params_df.index:
-        try:
-            min_usage = int(item_params_df.loc[item_name, 'min_daily_usage'])
-            max_usage = int(item_params_df.loc[item_name, 'max_daily_usage'])
-
-            # Calculate daily consumption
-            if min_usage > max_usage:
-                print(f"Warning: Min usage ({min_usage}) > Max usage ({max_usage}) for item {item_name}. Using min_usage.")
-                daily_consumption = min_usage
-            elif min_usage == max_usage:
-                daily_consumption = min_usage
-            else:
-                daily_consumption = random.randint(min_usage, max_usage)
-
-            if daily_consumption == 0:
-                continue # No consumption for this item today
-
-            # Filter for active, non-expired batches of the current item
-            # Compare expiry_date (datetime) with current_sim_date_dt (datetime)
-            item_batches_idx = df_copy[
-                (df_copy['item_name'] == item_name) &
-                (df_copy['quantity_on_hand'] > 0) &
-                (df_copy['expiry_date'].notna()) & # Ensure expiry date is not NaT
-                (df_copy['expiry_date'] >= current_sim_date_dt) # Compare datetime objects
-            ].index
-
-            if item_batches_idx.empty:
-                # print(f"No active, non-expired batches found for {item_name} on {current_sim_date}")
-                continue # No batches to consume from
-
-            # Sort these active batches by expiry date (FEFO)
-            sorted_batches = df_copy.loc[item_batches_idx].sort_values(by='expiry_date')
-
-            # Consume from sorted batches
-            for batch_index, batch_data in sorted_batches.iterrows():
-                batch_qoh = batch_data['quantity_on_hand']
-                consume_amount = min(daily_consumption, batch_qoh)
-
-                # Update quantity in the main DataFrame copy
-                df_copy.loc[batch_index, 'quantity_on_hand'] -= consume_amount
-                daily_consumption -= consume_amount
-
-                # print(f"  Consumed {consume_amount} from batch {batch_index} (Item: {item_name}). Remaining consumption: {daily_consumption}") # Debug print
-
-                if daily_consumption <= 0:
-                    break # Finished consuming for this item
-
-        except KeyError as e:
-            print(f"Error processing item {item_name}: Missing expected column {e} in item_params_df. Skipping consumption.")
-            continue
-        except ValueError as e:
-            print(f"Error processing item {item_name}: Invalid data type for usage calculation ({e}). Skipping consumption.")
-            continue
-        except Exception as e:
-            print(f"An unexpected error occurred processing item {item_name}: {e}")
-            continue
+    demand = _draw_daily_demand(item_params_df)
+
+    # Map each batch to its item's position in item_params_df (-1 if unknown)
+    item_codes = _item_codes(item_params_df.index, df_copy['item_name'])
+
+    # Active, non-expired batches of known items are the only ones consumed from
+    active = (
+        (item_codes >= 0) &
+        (df_copy['quantity_on_hand'] > 0).to_numpy() &
+        df_copy['expiry_date'].notna().to_numpy() & # Ensure expiry date is not NaT
+        (df_copy['expiry_date'] >= current_sim_date_dt).to_numpy() # Compare datetime objects
+    )
+    active_pos = np.flatnonzero(active)
+
+    if active_pos.size > 0 and demand.any():
+        qoh = df_copy['quantity_on_hand'].to_numpy()
+        active_codes = item_codes[active_pos]
+        active_expiry = df_copy['expiry_date'].to_numpy(dtype='datetime64[ns]')[active_pos]
+
+        # Sort once by (item, expiry); lexsort is stable so ties keep table order
+        order = np.lexsort((active_expiry, active_codes))
+        sorted_pos = active_pos[order]
+
+        consumed = _fefo_consume_sorted(active_codes[order], qoh[sorted_pos], demand)
+
+        new_qoh = qoh.copy()
+        new_qoh[sorted_pos] -= consumed
+        df_copy['quantity_on_hand'] = new_qoh
 
     # Remove batches that have been fully consumed
     df_copy = df_copy[df_copy['quantity_on_hand'] > 0]
 
     return df_copy
 
+def _prepare_lot_arrays(batches_df: pd.DataFrame, item_params_df: pd.DataFrame) -> dict:
+    """
+    Extracts the simulation state of batches_df into compact arrays.
+
+    Lots of items known to item_params_df are sorted once by (item, expiry)
+    so the FEFO kernel can run on them without re-sorting. Expiry dates are
+    stored as integer day numbers (days since 1970-01-01); a missing expiry
+    date becomes the smallest int64 so the lot is never consumable.
+
+    Negative quantities are clamped to 0.
+
+    Returns:
+        A dict with 'positions' (row positions in batches_df), 'item_codes',
+        'expiry_days' and 'qoh' for the sorted lots, plus 'group_starts' and
+        'group_codes' describing the per-item runs.
+    """
+    item_codes = _item_codes(item_params_df.index, batches_df['item_name'])
+    expiry = batches_df['expiry_date']
+    if not pd.api.types.is_datetime64_any_dtype(expiry):
+        expiry = pd.to_datetime(expiry, errors='coerce')
+
+    expiry_days = expiry.to_numpy(dtype='datetime64[D]').astype(np.int64) # NaT -> int64 min
+    qoh = pd.to_numeric(batches_df['quantity_on_hand'], errors='coerce').fillna(0).clip(lower=0).to_numpy().astype(np.int64)
+    return _sort_lots(item_codes, expiry_days, qoh)
+
+def _sort_lots(item_codes: np.ndarray, expiry_days: np.ndarray, qoh: np.ndarray) -> dict:
+    """Sorts lots with a known item code (>= 0) by (item, expiry) into the arrays of _prepare_lot_arrays."""
+    known = np.flatnonzero(item_codes >= 0)
+    order = known[np.lexsort((expiry_days[known], item_codes[known]))]
+    sorted_codes = item_codes[order]
+    group_starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if order.size else np.array([], dtype=np.int64)
+
+    return {
+        'positions': order,
+        'item_codes': sorted_codes,
+        'expiry_days': expiry_days[order],
+        'qoh': qoh[order],
+        'group_starts': group_starts,
+        'group_codes': sorted_codes[group_starts],
+    }
+
+def _item_totals(lots: dict, qoh: np.ndarray, n_items: int) -> np.ndarray:
+    """Sums lot quantities (last axis) per item code, returning (..., n_items)."""
+    totals = np.zeros(qoh.shape[:-1] + (n_items,), dtype=np.int64)
+    if lots['group_starts'].size:
+        totals[..., lots['group_codes']] = np.add.reduceat(qoh, lots['group_starts'], axis=-1)
+    return totals
+
+# --- Automatic Reordering ---
+DEFAULT_LEAD_TIME_DAYS = 0 # Used when item_params_df has no 'lead_time_days' (orders arrive the same day)
+IN_TRANSIT_COLUMNS = ['item_name', 'quantity', 'order_date', 'arrival_date']
+
+def _day_number(value) -> int:
+    """Converts a date-like value to an integer day number (days since 1970-01-01)."""
+    return int(np.datetime64(pd.to_datetime(value), 'D').astype(np.int64))
+
+def _lot_keys(item_codes: np.ndarray, expiry_days: np.ndarray) -> np.ndarray:
+    """Single int64 sort key equivalent to ordering lots by (item code, expiry day)."""
+    return (item_codes.astype(np.int64) << 32) + (np.clip(expiry_days, -2**31, 2**31 - 1) + 2**31)
+
+def _reorder_policy(item_params_df: pd.DataFrame, first_day: int, days: int) -> dict | None:
+    """
+    Extracts the per-item reorder policy used by the simulation kernel.
+
+    Returns:
+        A dict with 'reorder_point', 'reorder_quantity' and 'lead_time' arrays
+        (item_params_df index order) and the last usable day of a lot received
+        on each day from first_day - 1 to the end of the horizon
+        ('receipt_expiry', shaped (n_shelf_lives, days + 1), row per item in
+        'receipt_expiry_row'). Returns None if required columns are missing.
+    """
+    missing = [col for col in ['reorder_point', 'reorder_quantity', 'standard_shelf_life_months'] if col not in item_params_df.columns]
+    if missing:
+        print(f"Error: Missing columns {missing} in item_params_df. Cannot apply reorder policy.")
+        return None
+
+    # Items with an invalid ROP never reorder; an invalid ROQ orders nothing
+    reorder_point = pd.to_numeric(item_params_df['reorder_point'], errors='coerce').fillna(-1).to_numpy().astype(np.int64)
+    reorder_quantity = pd.to_numeric(item_params_df['reorder_quantity'], errors='coerce').fillna(0).clip(lower=0).to_numpy().astype(np.int64)
+    if 'lead_time_days' in item_params_df.columns:
+        lead_time = pd.to_numeric(item_params_df['lead_time_days'], errors='coerce').fillna(DEFAULT_LEAD_TIME_DAYS)
+    else:
+        lead_time = pd.Series(DEFAULT_LEAD_TIME_DAYS, index=item_params_df.index)
+    lead_time = lead_time.clip(lower=0).to_numpy().astype(np.int64)
+
+    shelf_life_months = pd.to_numeric(item_params_df['standard_shelf_life_months'], errors='coerce').fillna(12).to_numpy().astype(np.int64)
+    shelf_lives, receipt_expiry_row = np.unique(shelf_life_months, return_inverse=True)
+    receipt_dates = pd.date_range(pd.to_datetime(first_day - 1, unit='D'), periods=days + 1, freq='D')
+    receipt_expiry = np.array(
+        [(receipt_dates + pd.DateOffset(months=int(months))).to_numpy(dtype='datetime64[D]').astype(np.int64) for months in shelf_lives]
+    ).reshape(len(shelf_lives), days + 1)
+
+    return {
+        'reorder_point': reorder_point,
+        'reorder_quantity': reorder_quantity,
+        'lead_time': lead_time,
+        'receipt_expiry': receipt_expiry,
+        'receipt_expiry_row': receipt_expiry_row,
+    }
+
+def _pending_orders(in_transit_df: pd.DataFrame | None, item_params_df: pd.DataFrame) -> dict:
+    """Converts an in-transit orders DataFrame into the kernel's pending-order arrays."""
+    empty = np.array([], dtype=np.int64)
+    if in_transit_df is None or in_transit_df.empty:
+        return {'item_codes': empty, 'quantity': empty, 'order_day': empty, 'arrival_day': empty}
+
+    item_codes = _item_codes(item_params_df.index, in_transit_df['item_name'])
+    if (item_codes < 0).any():
+        print(f"Warning: Dropping {(item_codes < 0).sum()} in-transit orders for unknown items.")
+    known = item_codes >= 0
+    return {
+        'item_codes': item_codes[known].astype(np.int64),
+        'quantity': in_transit_df['quantity'].to_numpy()[known].astype(np.int64),
+        'order_day': pd.to_datetime(in_transit_df['order_date']).to_numpy(dtype='datetime64[D]').astype(np.int64)[known],
+        'arrival_day': pd.to_datetime(in_transit_df['arrival_date']).to_numpy(dtype='datetime64[D]').astype(np.int64)[known],
+    }
+
+def _run_lot_horizon(lots: dict, demand: np.ndarray, first_day: int, policy: dict | None = None,
+                     pending: dict | None = None) -> dict:
+    """
+    Steps the lot arrays through a horizon of daily demand, optionally reordering.
+
+    Each day: consume FEFO from lots that are not past their expiry; then, if
+    a policy is given, order reorder_quantity for every item whose usable
+    stock (still good tomorrow) plus stock in transit is at or below its
+    reorder point; then land all orders due that day as new lots. New lots
+    are inserted at their (item, expiry) position, so the arrays stay sorted
+    without a full re-sort. An order placed with a lead time of 0 lands the
+    same day and is usable from the next day, like a "Simulate Order" click.
+
+    Args:
+        lots: Lot arrays from _prepare_lot_arrays (not modified).
+        demand: (days, n_items) daily demand.
+        first_day: Day number of the first simulated day.
+        policy: Reorder policy from _reorder_policy, or None for no reordering.
+        pending: Orders already in transit, from _pending_orders.
+
+    Returns:
+        A dict with the final lot arrays ('item_codes', 'expiry_days', 'qoh',
+        'origin' = original row position, or -(k + 1) for the k-th received
+        lot), 'received' lots, 'orders' placed, remaining 'pending' orders,
+        the (days, n_items) 'qoh_matrix' and per-item 'days_out_of_stock',
+        'unmet_units' and 'units_expired'.
+    """
+    days, n_items = demand.shape
+    state = {
+        'item_codes': lots['item_codes'].copy(),
+        'expiry_days': lots['expiry_days'].copy(),
+        'qoh': lots['qoh'].copy(),
+        'origin': lots['positions'].copy(),
+        'group_starts': lots['group_starts'],
+        'group_codes': lots['group_codes'],
+    }
+    keys = _lot_keys(state['item_codes'], state['expiry_days'])
+
+    pending = {name: values.copy() for name, values in (pending or _pending_orders(None, None)).items()}
+    in_transit = np.zeros(n_items, dtype=np.int64)
+    np.add.at(in_transit, pending['item_codes'], pending['quantity'])
+    received = {'item_codes': [], 'quantity': [], 'arrival_day': [], 'expiry_days': []}
+    orders = {'item_codes': [], 'quantity': [], 'order_day': [], 'arrival_day': []}
+    n_received = 0
+
+    def land(arrival_day: int, due: np.ndarray):
+        """Inserts the due pending orders as new lots at their sorted positions."""
+        nonlocal keys, n_received
+        codes = pending['item_codes'][due]
+        quantity = pending['quantity'][due]
+        receipt_offset = max(arrival_day - (first_day - 1), 0) # Overdue orders are received now
+        expiry = policy['receipt_expiry'][policy['receipt_expiry_row'][codes], receipt_offset]
+        np.subtract.at(in_transit, codes, quantity)
+
+        new_keys = _lot_keys(codes, expiry)
+        order = np.argsort(new_keys, kind='stable')
+        insert_at = np.searchsorted(keys, new_keys[order], side='right')
+        keys = np.insert(keys, insert_at, new_keys[order])
+        state['item_codes'] = np.insert(state['item_codes'], insert_at, codes[order])
+        state['expiry_days'] = np.insert(state['expiry_days'], insert_at, expiry[order])
+        state['qoh'] = np.insert(state['qoh'], insert_at, quantity[order])
+        state['origin'] = np.insert(state['origin'], insert_at, -(n_received + 1 + np.arange(codes.size)))
+        n_received += codes.size
+
+        group_starts = np.flatnonzero(np.r_[True, state['item_codes'][1:] != state['item_codes'][:-1]])
+        state['group_starts'], state['group_codes'] = group_starts, state['item_codes'][group_starts]
+        for name, values in (('item_codes', codes[order]), ('quantity', quantity[order]), ('expiry_days', expiry[order])):
+            received[name].append(values)
+        received['arrival_day'].append(np.full(codes.size, arrival_day, dtype=np.int64))
+        for name in pending:
+            pending[name] = pending[name][~due]
+
+    if policy is not None:
+        overdue = pending['arrival_day'] < first_day
+        if overdue.any():
+            land(first_day - 1, overdue)
+
+    qoh_matrix = np.zeros((days, n_items), dtype=np.int64)
+    days_out_of_stock = np.zeros(n_items, dtype=np.int64)
+    unmet_units = np.zeros(n_items, dtype=np.int64)
+
+    for t in range(days):
+        day = first_day + t
+
+        # Lots are consumable while on hand and not past their expiry date
+        available = np.where(state['expiry_days'] >= day, state['qoh'], 0)
+        consumed = _fefo_consume_sorted(state['item_codes'], available, demand[t])
+        state['qoh'] -= consumed
+        shortfall = demand[t] - _item_totals(state, consumed, n_items)
+        days_out_of_stock += shortfall > 0
+        unmet_units += shortfall
+
+        if policy is not None:
+            position = _item_totals(state, np.where(state['expiry_days'] > day, state['qoh'], 0), n_items) + in_transit
+            to_order = np.flatnonzero((position <= policy['reorder_point']) & (policy['reorder_quantity'] > 0))
+            if to_order.size:
+                quantity = policy['reorder_quantity'][to_order]
+                arrival_day = day + policy['lead_time'][to_order]
+                in_transit[to_order] += quantity
+                for name, values in (('item_codes', to_order), ('quantity', quantity), ('order_day', np.full(to_order.size, day)), ('arrival_day', arrival_day)):
+                    pending[name] = np.r_[pending[name], values]
+                    orders[name].append(values)
+
+            due = pending['arrival_day'] == day
+            if due.any():
+                land(day, due)
+
+        qoh_matrix[t] = _item_totals(state, state['qoh'], n_items)
+
+    # Lots whose last usable day falls in [day before horizon, second-to-last day]
+    # expire during the horizon; whatever is left in them is wasted
+    last_day = first_day + days - 1
+    expires_in_horizon = (state['expiry_days'] >= first_day - 1) & (state['expiry_days'] <= last_day - 1)
+    units_expired = _item_totals(state, np.where(expires_in_horizon, state['qoh'], 0), n_items)
+
+    def as_arrays(log: dict) -> dict:
+        return {name: np.concatenate(values) if values else np.array([], dtype=np.int64) for name, values in log.items()}
+
+    return {
+        **state,
+        'received': as_arrays(received),
+        'orders': as_arrays(orders),
+        'pending': pending,
+        'qoh_matrix': qoh_matrix,
+        'days_out_of_stock': days_out_of_stock,
+        'unmet_units': unmet_units,
+        'units_expired': units_expired,
+    }
+
+def _materialize_batches(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, result: dict) -> pd.DataFrame:
+    """
+    Builds the batches DataFrame for the final kernel state.
+
+    Original rows get their new quantities; received lots are appended with
+    batch ids continuing after the largest existing integer id. Fully
+    consumed batches are removed.
+    """
+    df_copy = batches_df.copy()
+    origin = result['origin']
+    from_table = origin >= 0
+    if from_table.any():
+        new_qoh = df_copy['quantity_on_hand'].to_numpy().copy()
+        new_qoh[origin[from_table]] = result['qoh'][from_table]
+        df_copy['quantity_on_hand'] = new_qoh
+
+    received = ~from_table
+    if received.any():
+        item_names = item_params_df.index[result['item_codes'][received]]
+        if isinstance(df_copy['item_name'].dtype, pd.CategoricalDtype):
+            # Keep the batches' shared item categories so the concatenated column stays categorical
+            missing = pd.Index(item_names.unique()).difference(df_copy['item_name'].cat.categories)
+            if len(missing):
+                df_copy['item_name'] = df_copy['item_name'].cat.add_categories(missing)
+            item_names = pd.Categorical(item_names, dtype=df_copy['item_name'].dtype)
+        new_batches_df = pd.DataFrame({
+            'item_name': item_names,
+            'quantity_on_hand': result['qoh'][received],
+            'expiry_date': pd.to_datetime(result['expiry_days'][received], unit='D'),
+        })
+        if pd.api.types.is_integer_dtype(df_copy.index):
+            first_id = int(df_copy.index.max()) + 1 if len(df_copy.index) else 1
+            # Received lot k gets id first_id + k, in order of receipt
+            new_batches_df.index = pd.Index(first_id - origin[received] - 1, name=df_copy.index.name)
+            new_batches_df = new_batches_df.sort_index()
+            df_copy = pd.concat([df_copy, new_batches_df])
+        else:
+            df_copy = pd.concat([df_copy, new_batches_df], ignore_index=True)
+
+    # Remove batches that have been fully consumed
+    return df_copy[df_copy['quantity_on_hand'] > 0]
+
+def _horizon_demand(item_params_df: pd.DataFrame, days: int, rng: np.random.Generator | None) -> np.ndarray:
+    """Draws a (days, n_items) demand matrix; the default generator is seeded from `random`."""
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+    low, high = _usage_bounds(item_params_df)
+    return rng.integers(low, high + 1, size=(days, len(item_params_df)))
+
+@traced('simulation.simulate_horizon', rows=rows_of_first_arg)
+def simulate_horizon(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, start_date: date, days: int,
+                     rng: np.random.Generator | None = None, return_demand: bool = False) -> tuple:
+    """
+    Simulates several consecutive days of FEFO consumption in one pass.
+
+    Equivalent to calling advance_day once per day, but the batch state is
+    extracted into arrays once, sorted once by (item, expiry), stepped day
+    by day with the vectorized FEFO kernel, and turned back into a
+    DataFrame only at the end.
+
+    Args:
+        batches_df: DataFrame containing current inventory batches
+                    ('item_name', 'quantity_on_hand', 'expiry_date').
+        item_params_df: DataFrame containing item parameters
+                        ('min_daily_usage', 'max_daily_usage'), indexed by item_name.
+        start_date: The simulation date of the first simulated day.
+        days: Number of days to simulate.
+        rng: Optional NumPy generator for the demand draws. Defaults to a
+             generator seeded from the global `random` module, so
+             `random.seed` still makes runs reproducible.
+        return_demand: Also return the demand drawn per item and day
+                       (units requested, whether or not stock covered them).
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: A tuple containing:
+            - The batches DataFrame after the last simulated day, with
+              fully consumed batches removed.
+            - The end-of-day quantity on hand per item, indexed by
+              simulation date ('sim_date') with one column per item.
+            - With return_demand, a third element: the daily demand per
+              item, shaped like the quantity on hand.
+        Returns (batches_df, None) (or (batches_df, None, None)) if input is invalid.
+    """
+    if batches_df is None or item_params_df is None or start_date is None or days is None:
+        print("Error: Invalid input to simulate_horizon.")
+        return (batches_df, None, None) if return_demand else (batches_df, None)
+
+    days = max(int(days), 0)
+    sim_dates = pd.date_range(pd.to_datetime(start_date), periods=days, freq='D', name='sim_date')
+
+    lots = _prepare_lot_arrays(batches_df, item_params_df)
+    demand = _horizon_demand(item_params_df, days, rng)
+    result = _run_lot_horizon(lots, demand, _day_number(start_date))
+
+    qoh_history_df = pd.DataFrame(result['qoh_matrix'], index=sim_dates, columns=item_params_df.index)
+    if return_demand:
+        demand_df = pd.DataFrame(demand, index=sim_dates, columns=item_params_df.index)
+        return _materialize_batches(batches_df, item_params_df, result), qoh_history_df, demand_df
+    return _materialize_batches(batches_df, item_params_df, result), qoh_history_df
+
+@traced('simulation.simulate_with_reordering', rows=rows_of_first_arg)
+def simulate_with_reordering(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, start_date: date, days: int,
+                             in_transit_df: pd.DataFrame | None = None, rng: np.random.Generator | None = None,
+                             return_demand: bool = False) -> tuple:
+    """
+    Simulates several days of FEFO consumption with automatic ROP/ROQ reordering.
+
+    Like simulate_horizon, but at the end of every simulated day each item
+    whose usable stock plus stock in transit is at or below its
+    'reorder_point' orders its 'reorder_quantity'. Orders arrive after the
+    item's 'lead_time_days' (DEFAULT_LEAD_TIME_DAYS if the column is absent)
+    and land as new batches expiring 'standard_shelf_life_months' after
+    arrival. Orders still in transit at the end are returned so the next
+    call can pick them up.
+
+    Args:
+        batches_df: DataFrame containing current inventory batches.
+        item_params_df: DataFrame containing item parameters, indexed by item_name.
+                        Must include 'min_daily_usage', 'max_daily_usage',
+                        'reorder_point', 'reorder_quantity' and 'standard_shelf_life_months'.
+        start_date: The simulation date of the first simulated day.
+        days: Number of days to simulate.
+        in_transit_df: Orders already in transit (IN_TRANSIT_COLUMNS), or None.
+        rng: Optional NumPy generator for the demand draws (see simulate_horizon).
+        return_demand: Also return the daily demand per item (see simulate_horizon).
+
+    Returns:
+        tuple: A tuple containing:
+            - The batches DataFrame after the last simulated day, including
+              received batches.
+            - in_transit_df: Orders still in transit (IN_TRANSIT_COLUMNS).
+            - The end-of-day quantity on hand per item, indexed by 'sim_date'.
+            - orders_df: Every order placed during the horizon (IN_TRANSIT_COLUMNS).
+            - With return_demand, a fifth element: the daily demand per item.
+        Returns (batches_df, in_transit_df, None, None[, None]) if input is invalid.
+    """
+    failed = (batches_df, in_transit_df, None, None, None) if return_demand else (batches_df, in_transit_df, None, None)
+    if batches_df is None or item_params_df is None or start_date is None or days is None:
+        print("Error: Invalid input to simulate_with_reordering.")
+        return failed
+
+    days = max(int(days), 0)
+    first_day = _day_number(start_date)
+    policy = _reorder_policy(item_params_df, first_day, days)
+    if policy is None:
+        return failed
+    sim_dates = pd.date_range(pd.to_datetime(start_date), periods=days, freq='D', name='sim_date')
+
+    lots = _prepare_lot_arrays(batches_df, item_params_df)
+    demand = _horizon_demand(item_params_df, days, rng)
+    result = _run_lot_horizon(
+        lots, demand, first_day,
+        policy=policy, pending=_pending_orders(in_transit_df, item_params_df)
+    )
+
+    def orders_frame(log: dict) -> pd.DataFrame:
+        return pd.DataFrame({
+            'item_name': item_params_df.index[log['item_codes']],
+            'quantity': log['quantity'],
+            'order_date': pd.to_datetime(log['order_day'], unit='D'),
+            'arrival_date': pd.to_datetime(log['arrival_day'], unit='D'),
+        }, columns=IN_TRANSIT_COLUMNS)
+
+    qoh_history_df = pd.DataFrame(result['qoh_matrix'], index=sim_dates, columns=item_params_df.index)
+    outputs = (
+        _materialize_batches(batches_df, item_params_df, result),
+        orders_frame(result['pending']),
+        qoh_history_df,
+        orders_frame(result['orders']),
+    )
+    if return_demand:
+        return outputs + (pd.DataFrame(demand, index=sim_dates, columns=item_params_df.index),)
+    return outputs
+
+# --- Monte Carlo Risk Simulation ---
+MONTE_CARLO_DEMAND_BLOCK_DAYS = 16 # Days of demand drawn per generator call (fixed for reproducibility)
+
+_MONTE_CARLO_WORKER_STATE = {} # Lot arrays shared with pool workers via the initializer
+
+def _init_monte_carlo_worker(lots: dict, low: np.ndarray, high: np.ndarray, first_day: int, days: int,
+                             policy: dict | None, pending: dict | None):
+    """Process pool initializer: stores the shared horizon inputs once per worker."""
+    _MONTE_CARLO_WORKER_STATE.update(lots=lots, low=low, high=high, first_day=first_day, days=days, policy=policy, pending=pending)
+
+def _run_monte_carlo_chunk(seed_seqs: list) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Process pool task: simulates one chunk of replicates from the worker state."""
+    state = _MONTE_CARLO_WORKER_STATE
+    return _simulate_replicates(state['lots'], state['low'], state['high'], state['first_day'], state['days'], seed_seqs,
+                                state['policy'], state['pending'])
+
+def _simulate_replicates(lots: dict, low: np.ndarray, high: np.ndarray, first_day: int, days: int,
+                         seed_seqs: list, policy: dict | None = None,
+                         pending: dict | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Simulates a chunk of independent replicates with a replicate axis on every array.
+
+    Each replicate draws its demand from its own generator (one per SeedSequence),
+    in fixed blocks of days, so results do not depend on how replicates are
+    chunked or distributed across processes.
+
+    With a reorder policy, replicates receive different lots and can no longer
+    share one array layout, so each replicate runs through _run_lot_horizon
+    on its own (with the same demand draws it would get on the batched path).
+
+    Returns:
+        (days_out_of_stock, units_expired, unmet_units), each shaped
+        (n_replicates, n_items).
+    """
+    n_replicates = len(seed_seqs)
+    n_items = low.size
+    generators = [np.random.default_rng(seed_seq) for seed_seq in seed_seqs]
+
+    if policy is not None:
+        results = []
+        for generator in generators:
+            demand = np.concatenate([
+                generator.integers(low, high + 1, size=(min(MONTE_CARLO_DEMAND_BLOCK_DAYS, days - block_start), n_items))
+                for block_start in range(0, days, MONTE_CARLO_DEMAND_BLOCK_DAYS)
+            ])
+            results.append(_run_lot_horizon(lots, demand, first_day, policy=policy, pending=pending))
+        return tuple(
+            np.stack([result[name] for result in results]).astype(dtype)
+            for name, dtype in (('days_out_of_stock', np.int32), ('units_expired', np.int64), ('unmet_units', np.int64))
+        )
+
+    qoh = np.repeat(lots['qoh'][np.newaxis, :], n_replicates, axis=0)
+    days_out_of_stock = np.zeros((n_replicates, n_items), dtype=np.int32)
+    unmet_units = np.zeros((n_replicates, n_items), dtype=np.int64)
+
+    for block_start in range(0, days, MONTE_CARLO_DEMAND_BLOCK_DAYS):
+        block_days = min(MONTE_CARLO_DEMAND_BLOCK_DAYS, days - block_start)
+        # (block_days, n_replicates, n_items)
+        demand_block = np.stack(
+            [generator.integers(low, high + 1, size=(block_days, n_items)) for generator in generators],
+            axis=1
+        )
+        for offset in range(block_days):
+            demand = demand_block[offset]
+            available = np.where(lots['expiry_days'] >= first_day + block_start + offset, qoh, 0)
+            consumed = _fefo_consume_sorted(lots['item_codes'], available, demand)
+            qoh -= consumed
+
+            shortfall = demand - _item_totals(lots, consumed, n_items)
+            days_out_of_stock += shortfall > 0
+            unmet_units += shortfall
+
+    # Lots whose last usable day falls in [day before horizon, second-to-last day]
+    # expire during the horizon; whatever is left in them is wasted
+    expires_in_horizon = (lots['expiry_days'] >= first_day - 1) & (lots['expiry_days'] <= first_day + days - 2)
+    units_expired = _item_totals(lots, np.where(expires_in_horizon, qoh, 0), n_items)
+
+    return days_out_of_stock, units_expired, unmet_units
+
+@traced('simulation.run_monte_carlo', rows=rows_of_first_arg)
+def run_monte_carlo(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, start_date: date, days: int,
+                    replicates: int = 1000, seed: int | None = None, n_workers: int | None = None,
+                    chunk_size: int = 64, auto_reorder: bool = False,
+                    in_transit_df: pd.DataFrame | None = None) -> tuple[pd.DataFrame | None, dict | None]:
+    """
+    Runs independent replicates of a FEFO horizon to estimate stockout and waste risk.
+
+    Replicates are simulated in chunks with a replicate axis on the batch
+    arrays; chunks are spread across a process pool. Every replicate has its
+    own NumPy generator spawned from `seed`, so results are reproducible
+    regardless of `n_workers` and `chunk_size`.
+
+    Args:
+        batches_df: DataFrame containing current inventory batches.
+        item_params_df: DataFrame containing item parameters, indexed by item_name.
+        start_date: The simulation date of the first simulated day.
+        days: Number of days per replicate.
+        replicates: Number of independent replicates.
+        seed: Seed for the replicate generators. None draws fresh entropy.
+        n_workers: Number of worker processes. None uses all CPUs; 1 runs inline.
+        chunk_size: Replicates simulated together per task.
+        auto_reorder: Apply the ROP/ROQ policy with lead times inside every
+                      replicate (see simulate_with_reordering).
+        in_transit_df: Orders already in transit when auto_reorder is on.
+
+    Returns:
+        tuple[pd.DataFrame | None, dict | None]: A tuple containing:
+            - risk_summary_df: Per-item stockout probability, mean/p95 days out
+              of stock, mean/p95 units expired and mean unmet units, indexed by item_name.
+            - distributions: Dict of (replicates, n_items) arrays keyed by
+              'days_out_of_stock', 'units_expired' and 'unmet_units'.
+            Returns (None, None) if input is invalid.
+    """
+    if batches_df is None or item_params_df is None or start_date is None or not days or not replicates:
+        print("Error: Invalid input to run_monte_carlo.")
+        return None, None
+
+    days = int(days)
+    replicates = int(replicates)
+    chunk_size = max(int(chunk_size), 1)
+
+    lots = _prepare_lot_arrays(batches_df, item_params_df)
+    low, high = _usage_bounds(item_params_df)
+    first_day = _day_number(start_date)
+    policy, pending = None, None
+    if auto_reorder:
+        policy = _reorder_policy(item_params_df, first_day, days)
+        if policy is None:
+            return None, None
+        pending = _pending_orders(in_transit_df, item_params_df)
+
+    seed_seqs = np.random.SeedSequence(seed).spawn(replicates)
+    chunks = [seed_seqs[i:i + chunk_size] for i in range(0, replicates, chunk_size)]
+
+    n_workers = min(n_workers or os.cpu_count() or 1, len(chunks))
+    if n_workers <= 1:
+        results = [_simulate_replicates(lots, low, high, first_day, days, chunk, policy, pending) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_monte_carlo_worker,
+                                 initargs=(lots, low, high, first_day, days, policy, pending)) as pool:
+            results = list(pool.map(_run_monte_carlo_chunk, chunks))
+
+    distributions = {
+        'days_out_of_stock': np.concatenate([r[0] for r in results]),
+        'units_expired': np.concatenate([r[1] for r in results]),
+        'unmet_units': np.concatenate([r[2] for r in results]),
+    }
+
+    risk_summary_df = pd.DataFrame({
+        'stockout_probability': (distributions['days_out_of_stock'] > 0).mean(axis=0),
+        'mean_days_out_of_stock': distributions['days_out_of_stock'].mean(axis=0),
+        'p95_days_out_of_stock': np.percentile(distributions['days_out_of_stock'], 95, axis=0),
+        'mean_units_expired': distributions['units_expired'].mean(axis=0),
+        'p95_units_expired': np.percentile(distributions['units_expired'], 95, axis=0),
+        'mean_unmet_units': distributions['unmet_units'].mean(axis=0),
+    }, index=item_params_df.index)
+
+    return risk_summary_df, distributions
+
+# --- Multi-Site Network ---
+NETWORK_SITES_PER_TASK = 4 # Sites simulated together in one kernel run (bounds the (days x site items) demand matrix)
+
+def _simulate_site_group(task: dict) -> dict:
+    """
+    Process pool task: runs one group of sites through the horizon kernel.
+
+    The group's (site, item) pairs are its item codes. Each site draws its
+    (days x items) demand from its own generator, and the end-of-day
+    quantities are summed into network-wide item columns before returning,
+    so only (days x network items) travels back to the parent.
+    """
+    days, first_day = task['days'], task['first_day']
+    site_starts = task['site_starts'] # Code range of site k: [site_starts[k], site_starts[k + 1])
+    low, high = task['low'], task['high']
+    demand = np.zeros((days, low.size), dtype=np.int64)
+    for k, seed_seq in enumerate(task['seed_seqs']):
+        start, end = site_starts[k], site_starts[k + 1]
+        demand[:, start:end] = np.random.default_rng(seed_seq).integers(low[start:end], high[start:end] + 1, size=(days, end - start))
+
+    result = _run_lot_horizon(task['lots'], demand, first_day)
+    network_qoh = np.zeros((days, task['n_network_items']), dtype=np.int64)
+    for k in range(len(task['seed_seqs'])):
+        start, end = site_starts[k], site_starts[k + 1]
+        network_qoh[:, task['network_codes'][start:end]] += result['qoh_matrix'][:, start:end] # Unique items within a site
+    return {
+        'qoh': result['qoh'],
+        'origin': result['origin'],
+        'network_qoh': network_qoh,
+        'final_qoh': _item_totals(result, result['qoh'], low.size),
+        'days_out_of_stock': result['days_out_of_stock'],
+        'unmet_units': result['unmet_units'],
+        'units_expired': result['units_expired'],
+    }
+
+@traced('simulation.simulate_network', rows=rows_of_first_arg)
+def simulate_network(batches_df: pd.DataFrame, site_params_df: pd.DataFrame, start_date: date, days: int,
+                     seed: int | None = None, n_workers: int | None = None,
+                     sites_per_task: int = NETWORK_SITES_PER_TASK) -> tuple[pd.DataFrame, pd.DataFrame | None, pd.DataFrame | None]:
+    """
+    Simulates FEFO consumption at many sites over a horizon and merges the results.
+
+    Every (site, item) pair is treated as an item of its own, so a group of
+    sites steps through the same vectorized kernel as simulate_horizon in
+    one pass, with site as one more axis of the item codes. Groups of
+    sites_per_task sites are spread across a process pool. Each site draws
+    its demand from its own generator spawned from `seed`, so results do not
+    depend on n_workers or sites_per_task. Sites do not order (no reorder
+    policy).
+
+    Args:
+        batches_df: Batches of all sites ('site', 'item_name', 'quantity_on_hand',
+                    'expiry_date'), e.g. from data_loader.load_network_inventory.
+        site_params_df: Item parameters ('min_daily_usage', 'max_daily_usage'),
+                        indexed by (site, item_name).
+        start_date: The simulation date of the first simulated day.
+        days: Number of days to simulate.
+        seed: Seed for the per-site generators. None draws fresh entropy.
+        n_workers: Number of worker processes. None uses all CPUs; 1 runs inline.
+        sites_per_task: Sites simulated together per task.
+
+    Returns:
+        tuple: A tuple containing:
+            - The batches DataFrame after the last simulated day, with fully
+              consumed batches removed (lots of unknown (site, item) pairs are
+              left unchanged).
+            - network_qoh_df: End-of-day quantity on hand summed over all
+              sites, indexed by 'sim_date' with one column per item.
+            - site_summary_df: Per (site, item_name) 'quantity_on_hand' at the
+              end, 'days_out_of_stock', 'unmet_units' and 'units_expired'.
+        Returns (batches_df, None, None) if input is invalid.
+    """
+    if batches_df is None or site_params_df is None or start_date is None or days is None \
+       or 'site' not in batches_df.columns or site_params_df.index.nlevels != 2:
+        print("Error: Invalid input to simulate_network. Expected a 'site' column and (site, item_name) parameters.")
+        return batches_df, None, None
+
+    days = max(int(days), 0)
+    sites_per_task = max(int(sites_per_task), 1)
+    first_day = _day_number(start_date)
+
+    # Parameters grouped by site (first-appearance order), so each site is one contiguous code range
+    param_sites = site_params_df.index.get_level_values(0)
+    sites = pd.Index(param_sites.unique())
+    site_of_row = sites.get_indexer(param_sites)
+    row_order = np.argsort(site_of_row, kind='stable')
+    params_df = site_params_df.iloc[row_order]
+    site_of_row = site_of_row[row_order]
+    site_starts = np.searchsorted(site_of_row, np.arange(len(sites) + 1))
+    low, high = _usage_bounds(params_df)
+    network_items = pd.Index(params_df.index.get_level_values(1).unique(), name='item_name')
+    network_codes = network_items.get_indexer(params_df.index.get_level_values(1))
+
+    # Composite (site, item) code of every lot; -1 for pairs without parameters
+    lot_codes = params_df.index.get_indexer(pd.MultiIndex.from_arrays([batches_df['site'], batches_df['item_name']]))
+    expiry = batches_df['expiry_date']
+    if not pd.api.types.is_datetime64_any_dtype(expiry):
+        expiry = pd.to_datetime(expiry, errors='coerce')
+    expiry_days = expiry.to_numpy(dtype='datetime64[D]').astype(np.int64) # NaT -> int64 min
+    qoh = pd.to_numeric(batches_df['quantity_on_hand'], errors='coerce').fillna(0).clip(lower=0).to_numpy().astype(np.int64)
+
+    seed_seqs = np.random.SeedSequence(seed).spawn(len(sites))
+    known = lot_codes >= 0
+    lot_task = np.where(known, site_of_row[np.maximum(lot_codes, 0)] // sites_per_task, -1)
+    tasks, task_positions = [], []
+    for first_site in range(0, len(sites), sites_per_task):
+        last_site = min(first_site + sites_per_task, len(sites))
+        code_start, code_end = site_starts[first_site], site_starts[last_site]
+        positions = np.flatnonzero(lot_task == first_site // sites_per_task)
+        task_positions.append(positions)
+        tasks.append({
+            'lots': _sort_lots(lot_codes[positions] - code_start, expiry_days[positions], qoh[positions]),
+            'low': low[code_start:code_end],
+            'high': high[code_start:code_end],
+            'site_starts': site_starts[first_site:last_site + 1] - code_start,
+            'seed_seqs': seed_seqs[first_site:last_site],
+            'network_codes': network_codes[code_start:code_end],
+            'n_network_items': len(network_items),
+            'first_day': first_day,
+            'days': days,
+        })
+
+    n_workers = min(n_workers or os.cpu_count() or 1, len(tasks))
+    if n_workers <= 1:
+        results = [_simulate_site_group(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(_simulate_site_group, tasks))
+
+    # Merge: new quantities back into the original rows, network totals summed over site groups
+    df_copy = batches_df.copy()
+    new_qoh = df_copy['quantity_on_hand'].to_numpy().copy()
+    for positions, result in zip(task_positions, results):
+        new_qoh[positions[result['origin']]] = result['qoh']
+    df_copy['quantity_on_hand'] = new_qoh
+
+    sim_dates = pd.date_range(pd.to_datetime(start_date), periods=days, freq='D', name='sim_date')
+    network_qoh = sum((result['network_qoh'] for result in results), np.zeros((days, len(network_items)), dtype=np.int64))
+    network_qoh_df = pd.DataFrame(network_qoh, index=sim_dates, columns=network_items)
+    site_summary_df = pd.DataFrame({
+        name: np.concatenate([result[key] for result in results]) if results else np.array([], dtype=np.int64)
+        for name, key in (('quantity_on_hand', 'final_qoh'), ('days_out_of_stock', 'days_out_of_stock'),
+                          ('unmet_units', 'unmet_units'), ('units_expired', 'units_expired'))
+    }, index=params_df.index)
+
+    return df_copy[df_copy['quantity_on_hand'] > 0], network_qoh_df, site_summary_df
+
+# --- Event-Driven Simulation ---
+_NAT_DAY = np.iinfo(np.int64).min # Day number used for lots without an expiry date
+
+def _item_events(expiry_days: np.ndarray, qoh: np.ndarray, rate: float, rop: float | None,
+                 first_day: int, last_day: int, alert_days: int) -> tuple[list, np.ndarray]:
+    """
+    Computes the events of one item over [first_day, last_day] for a constant daily usage.
+
+    Lots are consumed in FEFO order at `rate` units per day. Demand is tracked
+    as a cumulative total, so the day a lot runs out, expires, or pushes the
+    item below its reorder point is computed directly instead of stepping
+    through every day in between.
+
+    Args:
+        expiry_days: The item's lots' last usable day numbers, sorted ascending.
+                     Lots without an expiry date use _NAT_DAY and are never consumed.
+        qoh: Quantity on hand per lot.
+        rate: Units consumed per day.
+        rop: Reorder point, or None to skip reorder point events.
+
+    Returns:
+        (events, remaining): A list of (day, event_type, lot_position, quantity)
+        tuples (lot_position is -1 for item-level events) and the remaining
+        quantity per lot at the end of the horizon.
+    """
+    def days_until(cumulative_demand: float) -> int:
+        """Number of days until the item's cumulative demand reaches a given total."""
+        return int(np.ceil(cumulative_demand / rate - 1e-9))
+
+    def item_qoh_on(day: int, lot: int, lot_consumed: float) -> float:
+        """Item total at the end of `day`, while lot `lot` is the one being consumed."""
+        in_lot = min(max(rate * (day - first_day + 1) - front_from[lot], 0.0), lot_consumed)
+        return total - consumed_total - in_lot
+
+    events = []
+    remaining = qoh.astype(float)
+    total = remaining.sum()
+    front_from = np.full(remaining.size, np.inf) # Cumulative demand at which each lot started being consumed
+    consumed = np.zeros(remaining.size)
+    exhausted_day = np.full(remaining.size, np.iinfo(np.int64).max, dtype=np.int64)
+
+    rop_gap = None # Consumption needed before the item is at or below its reorder point
+    if rop is not None:
+        rop_gap = total - rop
+        if rop_gap <= 0:
+            events.append((first_day, 'Reorder Point Reached', -1, total))
+            rop_gap = None
+
+    taken = 0.0 # Cumulative demand already allocated to earlier lots
+    consumed_total = 0.0
+    for j in range(remaining.size):
+        expiry = expiry_days[j]
+        if expiry == _NAT_DAY:
+            continue # Never consumed, never expires
+
+        current_day = first_day + int(np.floor(taken / rate + 1e-9)) if rate > 0 else last_day + 1
+        if expiry < current_day or current_day > last_day:
+            # Expires (or the horizon ends) before this lot reaches the front
+            if first_day <= expiry + 1 <= last_day:
+                events.append((expiry + 1, 'Batch Expired', j, remaining[j]))
+            continue
+
+        front_from[j] = taken
+        exhaustion_day = first_day + days_until(taken + remaining[j]) - 1
+        if exhaustion_day <= min(expiry, last_day):
+            consumed[j] = remaining[j]
+            exhausted_day[j] = exhaustion_day
+            events.append((exhaustion_day, 'Batch Exhausted', j, 0.0))
+            next_taken = taken + remaining[j]
+        else:
+            # Partially consumed until it expires or the horizon ends
+            next_taken = rate * (min(expiry, last_day) - first_day + 1)
+            consumed[j] = next_taken - taken
+            if expiry < last_day:
+                events.append((expiry + 1, 'Batch Expired', j, remaining[j] - consumed[j]))
+
+        if rop_gap is not None and consumed_total + consumed[j] >= rop_gap:
+            crossing_day = first_day + days_until(taken + rop_gap - consumed_total) - 1
+            events.append((crossing_day, 'Reorder Point Reached', -1, item_qoh_on(crossing_day, j, consumed[j])))
+            rop_gap = None
+
+        consumed_total += consumed[j]
+        taken = next_taken
+
+    # Out of usable stock with demand still left in the horizon
+    if rate > 0 and taken < rate * (last_day - first_day + 1):
+        stockout_day = first_day + int(np.floor(taken / rate + 1e-9))
+        events.append((stockout_day, 'Stockout', -1, total - consumed_total))
+
+    # Lots that are still on hand when they enter the expiry alert window
+    alert_day = expiry_days - alert_days + 1
+    alerted = (expiry_days != _NAT_DAY) & (alert_day >= first_day) & (alert_day <= last_day) & (exhausted_day > alert_day)
+    for j in np.flatnonzero(alerted):
+        in_lot = min(max(rate * (alert_day[j] - first_day + 1) - front_from[j], 0.0), consumed[j])
+        events.append((int(alert_day[j]), 'Nearing Expiry', int(j), remaining[j] - in_lot))
+
+    return events, remaining - consumed
+
+@traced('simulation.simulate_events', rows=rows_of_first_arg)
+def simulate_events(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, start_date: date, days: int,
+                    usage: str = 'expected', alert_days: int = ALERT_DAYS_BEFORE_EXPIRY) -> tuple[pd.DataFrame, pd.DataFrame | None]:
+    """
+    Discrete-event FEFO simulation that jumps from event to event instead of stepping days.
+
+    Each item is consumed at a constant daily rate, so the next event can be
+    computed directly: a batch is exhausted, a batch expires, a batch enters
+    the ALERT_DAYS_BEFORE_EXPIRY window, the item reaches its reorder point,
+    or the item runs out of usable stock. Work is proportional to the number
+    of lots, not the number of days, which suits multi-year horizons.
+
+    Args:
+        batches_df: DataFrame containing current inventory batches.
+        item_params_df: DataFrame containing item parameters, indexed by item_name.
+                        'reorder_point' is used for reorder events when present.
+        start_date: The simulation date of the first simulated day.
+        days: Number of days to simulate.
+        usage: Daily usage per item: 'expected' ((min + max) / 2), 'min' or 'max'.
+               With min == max this reproduces advance_day exactly.
+        alert_days: The number of days before expiry that a batch is "Nearing Expiry".
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame | None]: A tuple containing:
+            - The batches DataFrame at the end of the horizon, with fully
+              consumed batches removed. Non-integer usage rates are rounded.
+            - events_df: One row per event ('event_date', 'item_name',
+              'batch_id', 'event_type', 'quantity_on_hand'), sorted by date.
+              'quantity_on_hand' is the batch quantity for batch events and the
+              item total for item events.
+        Returns (batches_df, None) if input is invalid.
+    """
+    if batches_df is None or item_params_df is None or start_date is None or days is None:
+        print("Error: Invalid input to simulate_events.")
+        return batches_df, None
+    if usage not in ('expected', 'min', 'max'):
+        print(f"Error: Unknown usage mode '{usage}' for simulate_events.")
+        return batches_df, None
+
+    days = max(int(days), 0)
+    first_day = int(np.datetime64(pd.to_datetime(start_date), 'D').astype(np.int64))
+    last_day = first_day + days - 1
+
+    low, high = _usage_bounds(item_params_df)
+    rates = {'expected': (low + high) / 2.0, 'min': low.astype(float), 'max': high.astype(float)}[usage]
+    rops = pd.to_numeric(item_params_df['reorder_point'], errors='coerce').to_numpy() if 'reorder_point' in item_params_df.columns else None
+
+    lots = _prepare_lot_arrays(batches_df, item_params_df)
+    remaining = lots['qoh'].astype(float)
+
+    # Lot range [start, end) of every item code; items without lots get an empty range
+    group_starts = np.zeros(len(item_params_df), dtype=np.int64)
+    group_ends = np.zeros(len(item_params_df), dtype=np.int64)
+    group_starts[lots['group_codes']] = lots['group_starts']
+    group_ends[lots['group_codes']] = np.r_[lots['group_starts'][1:], lots['item_codes'].size]
+
+    event_rows = []
+    if days > 0:
+        for code, (start, end) in enumerate(zip(group_starts, group_ends)):
+            rop = rops[code] if rops is not None and not np.isnan(rops[code]) else None
+            item_events, remaining[start:end] = _item_events(
+                lots['expiry_days'][start:end], lots['qoh'][start:end], rates[code], rop,
+                first_day, last_day, alert_days
+            )
+            for day, event_type, lot, quantity in item_events:
+                position = lots['positions'][start + lot] if lot >= 0 else -1
+                event_rows.append((day, code, position, event_type, quantity))
+
+    df_copy = batches_df.copy()
+    if lots['positions'].size and days:
+        new_qoh = df_copy['quantity_on_hand'].to_numpy().copy()
+        new_qoh[lots['positions']] = np.rint(remaining).astype(np.int64)
+        df_copy['quantity_on_hand'] = new_qoh
+    df_copy = df_copy[df_copy['quantity_on_hand'] > 0]
+
+    events_df = pd.DataFrame(event_rows, columns=['day', 'code', 'position', 'event_type', 'quantity_on_hand'])
+    events_df['event_date'] = pd.to_datetime(events_df['day'].astype('int64'), unit='D')
+    events_df['item_name'] = item_params_df.index[events_df['code'].astype('int64')]
+    positions = events_df['position'].to_numpy(dtype=np.int64)
+    batch_ids = np.full(positions.size, None, dtype=object)
+    batch_ids[positions >= 0] = batches_df.index.to_numpy()[positions[positions >= 0]]
+    events_df['batch_id'] = batch_ids
+    events_df = events_df.sort_values(['day', 'code'], kind='stable')[
+        ['event_date', 'item_name', 'batch_id', 'event_type', 'quantity_on_hand']
+    ].reset_index(drop=True)
+
+    return df_copy, events_df
+
 def calculate_status(qoh: int, rop: int) -> str:
     """
     Calculates the inventory status based on quantity on hand and reorder point.
@@ -172,6 +1166,147 @@ def calculate_expiry_status(expiry_date, current_date, alert_days=ALERT_DAYS_BEF
         return "OK"
 
 
+def calculate_status_series(qoh, rop) -> pd.Series:
+    """
+    Vectorized calculate_status: classifies whole columns at once.
+
+    Args:
+        qoh: Quantities on hand (Series or array).
+        rop: Reorder points, aligned with qoh (Series, array or a scalar).
+
+    Returns:
+        A Series of "Reorder Needed", "Low Stock", "OK" (or "Error" where an
+        input is not numeric), indexed like qoh if it is a Series.
+    """
+    index = qoh.index if isinstance(qoh, pd.Series) else None
+    # Truncate like int() in the scalar version; invalid values become NaN
+    qoh = np.trunc(np.asarray(pd.to_numeric(qoh, errors='coerce'), dtype=float))
+    rop = np.trunc(np.broadcast_to(np.asarray(pd.to_numeric(rop, errors='coerce'), dtype=float), qoh.shape))
+
+    status = np.select(
+        [np.isnan(qoh) | np.isnan(rop), qoh <= rop, qoh <= rop * 1.25],
+        ["Error", "Reorder Needed", "Low Stock"],
+        default="OK"
+    )
+    return pd.Series(status, index=index, dtype=object)
+
+@traced('simulation.calculate_expiry_status_series', rows=rows_of_first_arg)
+def calculate_expiry_status_series(expiry_dates, current_date, alert_days=ALERT_DAYS_BEFORE_EXPIRY) -> pd.Series:
+    """
+    Vectorized calculate_expiry_status: classifies a whole column of expiry dates.
+
+    Dates are compared at day resolution with datetime64 arithmetic, giving
+    the same labels as the scalar version.
+
+    Args:
+        expiry_dates: Expiry dates (Series or array; NaT/None/unparseable -> "Unknown").
+        current_date: The current simulation date.
+        alert_days: The number of days before expiry to trigger the "Nearing Expiry" status.
+
+    Returns:
+        A Series of "Expired", "Nearing Expiry", "OK" or "Unknown", indexed
+        like expiry_dates if it is a Series.
+    """
+    index = expiry_dates.index if isinstance(expiry_dates, pd.Series) else None
+    expiry = pd.Series(expiry_dates)
+    if not pd.api.types.is_datetime64_any_dtype(expiry):
+        expiry = pd.to_datetime(expiry, errors='coerce')
+    expiry_day = expiry.to_numpy(dtype='datetime64[D]')
+
+    current_day = np.datetime64(pd.to_datetime(current_date).date(), 'D')
+    alert_day = current_day + np.timedelta64(int(alert_days), 'D')
+
+    status = np.select(
+        [np.isnat(expiry_day), expiry_day < current_day, expiry_day < alert_day],
+        ["Unknown", "Expired", "Nearing Expiry"],
+        default="OK"
+    )
+    return pd.Series(status, index=index, dtype=object)
+
+
+@traced('simulation.summarize_inventory', rows=rows_of_first_arg)
+def summarize_inventory(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, current_sim_date: date | None = None) -> pd.DataFrame | None:
+    """
+    Summarizes the inventory per item in a single pass over the batches, keyed on item codes.
+
+    Args:
+        batches_df: DataFrame of inventory batches ('item_name', 'quantity_on_hand',
+                    'expiry_date', and optionally 'expiry_status').
+        item_params_df: DataFrame containing item parameters (incl. 'reorder_point',
+                        'reorder_quantity'), indexed by 'item_name'.
+        current_sim_date: Used to classify expiry status if batches_df has no
+                          'expiry_status' column.
+
+    Returns:
+        A DataFrame indexed like item_params_df with 'total_qoh',
+        'reorder_point', 'status' (see calculate_status_series),
+        'earliest_expiry', 'nearing_count', 'expired_count', 'reorder_quantity'
+        and 'batch_count' (plus 'category' if item_params_df has one). Items without batches have a total of 0 and no
+        earliest expiry; invalid ROP/ROQ values are NaN. Returns None if
+        input is invalid.
+    """
+    if batches_df is None or item_params_df is None:
+        print("Error: Invalid input to summarize_inventory.")
+        return None
+
+    expiry = batches_df['expiry_date']
+    if not pd.api.types.is_datetime64_any_dtype(expiry):
+        expiry = pd.to_datetime(expiry, errors='coerce')
+    if 'expiry_status' in batches_df.columns:
+        expiry_status = batches_df['expiry_status']
+    elif current_sim_date is not None:
+        expiry_status = calculate_expiry_status_series(expiry, current_sim_date)
+    else:
+        expiry_status = pd.Series("Unknown", index=batches_df.index)
+
+    # Aggregate per item code with bincount; batches of unknown items are left out
+    item_codes = _item_codes(item_params_df.index, batches_df['item_name'])
+    known = item_codes >= 0
+    return _summarize_lots(
+        item_params_df,
+        item_codes[known],
+        pd.to_numeric(batches_df['quantity_on_hand'], errors='coerce').fillna(0).to_numpy()[known],
+        expiry.to_numpy()[known],
+        (expiry_status == "Nearing Expiry").to_numpy()[known],
+        (expiry_status == "Expired").to_numpy()[known],
+    )
+
+def _summarize_lots(item_params_df: pd.DataFrame, codes: np.ndarray, qoh: np.ndarray, expiry_values: np.ndarray,
+                    nearing: np.ndarray, expired: np.ndarray) -> pd.DataFrame:
+    """
+    The per-item summary of summarize_inventory from plain lot arrays.
+
+    Args:
+        item_params_df: Item parameters, indexed by item_name.
+        codes: Position of each lot's item in item_params_df.index (known items only).
+        qoh: Quantity on hand per lot.
+        expiry_values: datetime64 expiry per lot (NaT if unknown).
+        nearing, expired: Whether each lot is "Nearing Expiry" / "Expired".
+    """
+    n_items = len(item_params_df.index)
+
+    # Earliest expiry per item, ignoring missing dates (NaT is the smallest int64)
+    expiry_ints = expiry_values.view(np.int64)
+    dated = expiry_ints != np.iinfo(np.int64).min
+    earliest = np.full(n_items, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(earliest, codes[dated], expiry_ints[dated])
+    earliest[earliest == np.iinfo(np.int64).max] = np.iinfo(np.int64).min # No dated batches -> NaT
+
+    summary = pd.DataFrame(index=item_params_df.index)
+    summary['total_qoh'] = np.bincount(codes, weights=qoh, minlength=n_items).astype(np.int64)
+    summary['reorder_point'] = pd.to_numeric(item_params_df['reorder_point'], errors='coerce')
+    summary['status'] = calculate_status_series(summary['total_qoh'], summary['reorder_point'])
+    summary['earliest_expiry'] = earliest.view(expiry_values.dtype)
+    summary['nearing_count'] = np.bincount(codes, weights=nearing, minlength=n_items).astype(np.int64)
+    summary['expired_count'] = np.bincount(codes, weights=expired, minlength=n_items).astype(np.int64)
+    summary['reorder_quantity'] = pd.to_numeric(item_params_df['reorder_quantity'], errors='coerce')
+    summary['batch_count'] = np.bincount(codes, minlength=n_items).astype(np.int64)
+    if 'category' in item_params_df.columns:
+        summary['category'] = item_params_df['category']
+    return summary
+
+
+@traced('simulation.add_new_batch', rows=rows_of_first_arg)
 def add_new_batch(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, item_name: str, current_sim_date: date) -> pd.DataFrame:
     """
     Simulates receiving a new batch for a specific item.
@@ -214,34 +1349,21 @@ def add_new_batch(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, item_n
         expiry_date = expiry_date_ts # pd.to_datetime handles this well
 
         # Create new batch data
-        # Note: We are not assigning a batch_id here. It's assumed the DB would handle this
-        # upon actual persistence. For runtime, concat with ignore_index handles it.
         new_batch_data = {
             'item_name': item_name,
             'quantity_on_hand': reorder_quantity,
             'expiry_date': expiry_date
-            # 'batch_id': None # Explicitly not setting it here
         }
         print(f"Adding new batch for {item_name}: Qty={reorder_quantity}, Expires={expiry_date.strftime('%Y-%m-%d')}")
 
-        # Convert dictionary to a DataFrame
-        new_batch_df = pd.DataFrame([new_batch_data])
-
-        # Append the new batch DataFrame
-        # Reset index of the original df_copy IF it has a meaningful index (like batch_id)
-        # that would conflict. If it's just a default range index, it might not be necessary.
-        # Using ignore_index=True is the safest approach for runtime concatenation
-        # when the new row doesn't have a pre-assigned index matching the existing scheme.
-        # If df_copy still has 'batch_id' as index from loading, we need to reset it first.
-        if df_copy.index.name == 'batch_id':
-             df_updated = pd.concat([df_copy.reset_index(), new_batch_df], ignore_index=True)
-             # Decide if we need to set an index back. For now, let's leave it as a default RangeIndex.
-             # If we need batch_id later, we might need to adjust.
-             # df_updated = df_updated.set_index('batch_id') # Optional: reinstate index if needed
+        # Keep the batch_id index: the new batch gets the next free id, so
+        # later lookups (e.g. discard_batch) keep working after an order.
+        if pd.api.types.is_integer_dtype(df_copy.index):
+            new_batch_id = int(df_copy.index.max()) + 1 if len(df_copy.index) else 1
+            new_batch_df = pd.DataFrame([new_batch_data], index=pd.Index([new_batch_id], name=df_copy.index.name))
+            df_updated = pd.concat([df_copy, new_batch_df])
         else:
-             # If index is not 'batch_id' (e.g., default RangeIndex), just concat
-             df_updated = pd.concat([df_copy, new_batch_df], ignore_index=True)
-
+            df_updated = pd.concat([df_copy, pd.DataFrame([new_batch_data])], ignore_index=True)
 
         return df_updated
 
@@ -255,8 +1377,96 @@ def add_new_batch(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, item_n
         print(f"An unexpected error occurred adding batch for {item_name}: {e}")
         return df_copy
 
+@traced('simulation.build_new_batches', rows=rows_of_result)
+def build_new_batches(item_params_df: pd.DataFrame, item_names, current_sim_date: date) -> pd.DataFrame | None:
+    """
+    Builds the batches received when ordering several items on one day.
+
+    Each item gets one batch of its reorder quantity, expiring its standard
+    shelf life after current_sim_date. The month offsets are computed once
+    per distinct shelf life rather than once per batch.
+
+    Args:
+        item_params_df: DataFrame containing item parameters (incl. 'standard_shelf_life_months', 'reorder_quantity').
+        item_names: The items to order (unknown items are skipped with a warning).
+        current_sim_date: The current simulation date, used as the receiving date.
+
+    Returns:
+        A DataFrame with 'item_name', 'quantity_on_hand' and 'expiry_date'
+        (one row per known item, in the given order), or None if input is invalid.
+    """
+    if item_params_df is None or item_names is None or current_sim_date is None:
+        print("Error: Invalid input to build_new_batches.")
+        return None
+
+    missing = [col for col in ['standard_shelf_life_months', 'reorder_quantity'] if col not in item_params_df.columns]
+    if missing:
+        print(f"Error: Missing columns {missing} in item_params_df. Cannot add batches.")
+        return None
+
+    item_names = pd.Index(item_names, dtype=object)
+    item_codes = pd.Index(item_params_df.index).get_indexer(item_names)
+    if (item_codes < 0).any():
+        print(f"Warning: Items {list(item_names[item_codes < 0])} not found in item parameters. Skipping them.")
+    item_codes = item_codes[item_codes >= 0]
+
+    shelf_life_months = pd.to_numeric(item_params_df['standard_shelf_life_months'], errors='coerce').to_numpy()[item_codes]
+    reorder_quantity = pd.to_numeric(item_params_df['reorder_quantity'], errors='coerce').to_numpy()[item_codes]
+    valid = ~(np.isnan(shelf_life_months) | np.isnan(reorder_quantity))
+    if not valid.all():
+        print(f"Warning: Invalid shelf life or reorder quantity for {list(item_params_df.index[item_codes[~valid]])}. Skipping them.")
+    item_codes, shelf_life_months, reorder_quantity = item_codes[valid], shelf_life_months[valid].astype(np.int64), reorder_quantity[valid].astype(np.int64)
+
+    # One DateOffset per distinct shelf life
+    received = pd.to_datetime(current_sim_date)
+    shelf_lives, shelf_life_row = np.unique(shelf_life_months, return_inverse=True)
+    expiry_by_shelf_life = np.array([received + pd.DateOffset(months=int(months)) for months in shelf_lives], dtype='datetime64[ns]')
+
+    return pd.DataFrame({
+        'item_name': item_params_df.index.to_numpy()[item_codes],
+        'quantity_on_hand': reorder_quantity,
+        'expiry_date': expiry_by_shelf_life[shelf_life_row] if item_codes.size else np.array([], dtype='datetime64[ns]'),
+    })
+
+@traced('simulation.add_new_batches', rows=rows_of_first_arg)
+def add_new_batches(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, item_names, current_sim_date: date) -> pd.DataFrame:
+    """
+    Simulates receiving one new batch for each of several items in a single pass.
+
+    Equivalent to calling add_new_batch once per item, but the expiry dates
+    are computed in bulk and the table is concatenated once.
+
+    Args:
+        batches_df: The current DataFrame of inventory batches.
+        item_params_df: DataFrame containing item parameters (incl. 'standard_shelf_life_months', 'reorder_quantity').
+        item_names: The items for which to add a batch.
+        current_sim_date: The current simulation date, used as the receiving date.
+
+    Returns:
+        A new DataFrame with the added batches (consecutive new batch ids
+        if batches_df has an integer index). Returns the original DataFrame
+        if input is invalid.
+    """
+    if batches_df is None:
+        print("Error: Invalid input to add_new_batches.")
+        return batches_df
+
+    new_batches_df = build_new_batches(item_params_df, item_names, current_sim_date)
+    if new_batches_df is None:
+        return batches_df
+    if new_batches_df.empty:
+        return batches_df.copy()
+    print(f"Adding {len(new_batches_df)} new batches.")
+
+    if pd.api.types.is_integer_dtype(batches_df.index):
+        first_batch_id = int(batches_df.index.max()) + 1 if len(batches_df.index) else 1
+        new_batches_df.index = pd.RangeIndex(first_batch_id, first_batch_id + len(new_batches_df), name=batches_df.index.name)
+        return pd.concat([batches_df, new_batches_df])
+    return pd.concat([batches_df, new_batches_df], ignore_index=True)
+
 # --- Placeholder for future simulation functions ---
 
+@traced('simulation.discard_batch', rows=rows_of_first_arg)
 def discard_batch(batches_df: pd.DataFrame, batch_id_to_discard) -> pd.DataFrame:
     """
     Removes a specific batch from the inventory batches DataFrame.
@@ -283,3 +1493,30 @@ def discard_batch(batches_df: pd.DataFrame, batch_id_to_discard) -> pd.DataFrame
         print(f"Warning: Batch ID {batch_id_to_discard} not found in DataFrame index. No batch discarded.")
 
     return df_copy
+
+@traced('simulation.discard_batches', rows=rows_of_first_arg)
+def discard_batches(batches_df: pd.DataFrame, batch_ids_to_discard) -> pd.DataFrame:
+    """
+    Removes several batches from the inventory batches DataFrame in one pass.
+
+    Args:
+        batches_df: The current DataFrame of inventory batches.
+                    Expected to have 'batch_id' as its index.
+        batch_ids_to_discard: The indices (batch_ids) of the batches to remove.
+
+    Returns:
+        A new DataFrame with the specified batches removed. Unknown ids are
+        reported and ignored. Returns the original DataFrame if inputs are invalid.
+    """
+    if batches_df is None or batch_ids_to_discard is None:
+        print("Error: Invalid input to discard_batches (DataFrame or batch_ids is None).")
+        return batches_df
+
+    batch_ids_to_discard = pd.Index(batch_ids_to_discard)
+    found = batch_ids_to_discard.isin(batches_df.index)
+    if not found.all():
+        print(f"Warning: Batch IDs {list(batch_ids_to_discard[~found])} not found in DataFrame index. Not discarded.")
+
+    df_copy = batches_df[~batches_df.index.isin(batch_ids_to_discard)]
+    print(f"Discarded {len(batches_df) - len(df_copy)} batches.")
+    return df_copy
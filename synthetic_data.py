@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import argparse
+import os
+import time
+from datetime import date
+
+from data_loader import ITEM_COLUMNS, SITE_SHARD_EXTENSION, bulk_seed_database, remove_site_shards, write_network_manifest
+
+# --- Constants ---
+CATEGORIES = ['Test Kit', 'Consumable', 'Reagent', 'Medication', 'Equipment']
+SHELF_LIFE_MONTHS = [3, 6, 12, 18, 24, 36] # Standard shelf lives drawn per item
+DAYS_PER_MONTH = 30
+EXPIRED_SHARE = 0.2 # Receipts reach back this much past one shelf life, so roughly this share of lots is expired
+
+def generate_inventory(n_items: int, lots_per_item: int, seed: int | np.random.SeedSequence = 0,
+                       as_of: date | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Generates a synthetic item catalogue and its lots.
+
+    The output depends only on the arguments, so the same seed always yields
+    the same dataset (for scale tests and benchmarks). Usage bounds, buffer
+    and target days, shelf lives and lead times are drawn per item in ranges
+    like seed_data.sql. Each lot was received on a random day within about
+    1.2 shelf lives before as_of and expires one shelf life after receipt,
+    so most lots are spread over the coming shelf life and some are already
+    expired or nearing expiry. Batch ids follow receipt order within an item.
+
+    Args:
+        n_items (int): Number of items ('Item 000000', 'Item 000001', ...).
+        lots_per_item (int): Lots generated for every item.
+        seed (int | np.random.SeedSequence): Random seed.
+        as_of (date | None): The date the expiries are relative to (default: today).
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: (items_df with ITEM_COLUMNS,
+        batches_df with 'item_name', 'quantity_on_hand' and 'expiry_date'
+        indexed by batch_id 1..n).
+    """
+    rng = np.random.default_rng(seed)
+    as_of = np.datetime64(as_of if as_of is not None else date.today(), 'D')
+
+    item_names = np.array([f"Item {i:06d}" for i in range(n_items)], dtype=object)
+    min_usage = rng.integers(0, 21, n_items)
+    max_usage = min_usage + rng.integers(1, 31, n_items)
+    buffer_days = rng.integers(3, 16, n_items)
+    shelf_life_months = rng.choice(SHELF_LIFE_MONTHS, n_items)
+
+    # Lots: item-major, so each item's lots are contiguous
+    n_lots = n_items * lots_per_item
+    item_of_lot = np.repeat(np.arange(n_items), lots_per_item)
+    shelf_days = shelf_life_months[item_of_lot] * DAYS_PER_MONTH
+    received_days_ago = (rng.random(n_lots) * shelf_days * (1 + EXPIRED_SHARE)).astype(np.int64)
+    expiry = as_of - received_days_ago + shelf_days
+    # Earlier receipts get lower batch ids; this also presorts the rows for the (item_name, expiry_date) index
+    expiry = np.sort(expiry.reshape(n_items, lots_per_item), axis=1).ravel()
+    # A lot covers a few days to a few weeks of mean usage
+    mean_usage = (min_usage + max_usage)[item_of_lot] / 2
+    quantities = np.maximum(1, (mean_usage * rng.integers(3, 30, n_lots)).astype(np.int64))
+
+    items_df = pd.DataFrame({
+        'item_name': item_names,
+        'min_daily_usage': min_usage,
+        'max_daily_usage': max_usage,
+        'buffer_days': buffer_days,
+        'target_days': buffer_days + rng.integers(5, 31, n_items),
+        'initial_quantity_on_hand': np.bincount(item_of_lot, weights=quantities, minlength=n_items).astype(np.int64),
+        'standard_shelf_life_months': shelf_life_months,
+        'category': np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), n_items)],
+        'lead_time_days': rng.integers(0, 16, n_items),
+    }, columns=ITEM_COLUMNS)
+    batches_df = pd.DataFrame({
+        'item_name': pd.Categorical.from_codes(item_of_lot, categories=item_names),
+        'quantity_on_hand': quantities,
+        'expiry_date': expiry.astype('datetime64[s]'),
+    }, index=pd.RangeIndex(1, n_lots + 1, name='batch_id'))
+    return items_df, batches_df
+
+def seed_synthetic_database(db_name: str, n_items: int, lots_per_item: int, seed: int = 0,
+                            as_of: date | None = None) -> bool:
+    """
+    Generates a dataset with generate_inventory and bulk-loads it into db_name (replacing it).
+
+    Returns:
+        bool: True if the database was created, False otherwise.
+    """
+    items_df, batches_df = generate_inventory(n_items, lots_per_item, seed, as_of)
+    return bulk_seed_database(items_df, batches_df, db_name)
+
+def site_names(n_sites: int) -> list[str]:
+    """Names of a synthetic network: a central lab followed by clinics ('central_lab', 'clinic_001', ...)."""
+    return ['central_lab'] + [f"clinic_{i:03d}" for i in range(1, n_sites)]
+
+def seed_synthetic_network(shard_dir: str, n_sites: int, n_items: int, lots_per_item: int, seed: int = 0,
+                           as_of: date | None = None) -> bool:
+    """
+    Creates a synthetic multi-site network as one database shard per site (see data_loader.load_network_inventory).
+
+    All sites stock the same items. Each site's usage parameters and lots
+    are drawn from its own generator spawned from `seed`, so a site's data
+    does not depend on how many sites are generated after it.
+
+    Shards of an earlier generated network in shard_dir are removed first,
+    so the directory holds exactly the new network (load_network_inventory
+    loads every shard in it). The shards are listed in a network manifest;
+    a directory with other databases (or the application directory) is
+    refused rather than cleared (see data_loader.remove_site_shards).
+
+    Returns:
+        bool: True if every shard was created, False otherwise.
+    """
+    shard_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), shard_dir)
+    removed = remove_site_shards(shard_dir)
+    if removed is None:
+        return False
+    if removed:
+        print(f"Removed {removed} existing site shards from {shard_dir}")
+    os.makedirs(shard_dir, exist_ok=True)
+    sites = site_names(n_sites)
+    if not write_network_manifest(shard_dir, sites): # Before seeding, so an interrupted run can be cleared too
+        return False
+    for site, site_seed in zip(sites, np.random.SeedSequence(seed).spawn(n_sites)):
+        items_df, batches_df = generate_inventory(n_items, lots_per_item, site_seed, as_of)
+        if not bulk_seed_database(items_df, batches_df, os.path.join(shard_dir, site + SITE_SHARD_EXTENSION)):
+            return False
+    return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create a synthetic inventory database for scale tests.")
+    parser.add_argument('db_name', help="Database file (relative to this script, or an absolute path); replaced if it exists. "
+                                        "With --sites, the directory for the site shards")
+    parser.add_argument('--items', type=int, default=10_000, help="Number of items")
+    parser.add_argument('--lots-per-item', type=int, default=50, help="Lots per item")
+    parser.add_argument('--sites', type=int, default=None, help="Create a multi-site network of this many site shards")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--as-of', type=date.fromisoformat, default=None, help="Reference date YYYY-MM-DD (default: today)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.sites is not None:
+        ok = seed_synthetic_network(args.db_name, args.sites, args.items, args.lots_per_item, args.seed, args.as_of)
+    else:
+        ok = seed_synthetic_database(args.db_name, args.items, args.lots_per_item, args.seed, args.as_of)
+    print(f"{'Done' if ok else 'Failed'} in {time.perf_counter() - start:.1f}s")
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from datetime import date, timedelta
+
+import data_loader
+from batch_journal import BatchJournal
+from batch_store import BatchStore
+from synthetic_data import generate_inventory
+
+AS_OF = date(2026, 1, 1)
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A small bulk-seeded database; its engine is disposed afterwards."""
+    path = str(tmp_path / 'inventory.db')
+    items_df, batches_df = generate_inventory(5, 4, seed=1, as_of=AS_OF)
+    assert data_loader.bulk_seed_database(items_df, batches_df, path)
+    yield path
+    data_loader.dispose_engine(path)
+
+def open_session(db_path):
+    """Loads the database like a new app session: (store, journal, sim_state)."""
+    item_params_df, batches_df = data_loader.load_inventory_data(db_path)
+    sim_state = data_loader.load_sim_state(db_path)
+    store = BatchStore.from_dataframe(batches_df, item_params_df.index, sim_state['current_sim_date'] or AS_OF)
+    store.journal = BatchJournal(db_path, sim_state=sim_state)
+    return store, store.journal, sim_state
+
+def test_clock_is_saved_with_the_lots(db_path):
+    store, journal, sim_state = open_session(db_path)
+    assert sim_state == {'current_sim_date': None, 'day_count': 0, 'revision': 0}
+
+    consumed = store.consume(np.full(len(store.item_names), 3), AS_OF + timedelta(days=7))
+    assert consumed.sum() > 0
+    journal.record_clock(AS_OF + timedelta(days=7), 7)
+    assert journal.flush(store) > 0
+
+    restored, _, sim_state = open_session(db_path)
+    assert sim_state == {'current_sim_date': AS_OF + timedelta(days=7), 'day_count': 7, 'revision': 1}
+    assert restored.to_dataframe()['quantity_on_hand'].to_dict() == store.to_dataframe()['quantity_on_hand'].to_dict()
+
+def test_second_writer_is_refused(db_path):
+    first, first_journal, _ = open_session(db_path)
+    second, second_journal, _ = open_session(db_path)
+
+    first.discard(int(first.to_dataframe().index[0]))
+    assert first_journal.flush(first) == 1
+
+    # The second session loaded revision 0; its write must not overwrite the first session's
+    second.receive(second.item_names[0], 10, AS_OF + timedelta(days=30))
+    second_journal.record_clock(AS_OF + timedelta(days=1), 1)
+    assert second_journal.flush(second) is None
+    assert second_journal.conflict
+    assert len(second_journal) == 2 # Nothing was written or dropped
+    assert second_journal.maybe_flush(second) == 0
+    assert data_loader.load_sim_state(db_path)['revision'] == 1
+
+def test_update_of_a_deleted_lot_is_a_conflict(db_path):
+    batch_id = int(data_loader.load_inventory_data(db_path)[1].index[0])
+    assert data_loader.save_batch_changes([], [], [batch_id], db_name=db_path) == []
+    with pytest.raises(data_loader.WriteConflictError):
+        data_loader.save_batch_changes([{'batch_id': batch_id, 'quantity_on_hand': 1}], [], [], db_name=db_path)
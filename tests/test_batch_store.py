@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import date, timedelta
+
+import batch_store
+from batch_store import BatchStore
+from simulation import _day_number, _lot_keys, summarize_inventory
+
+ITEMS = ['A', 'B', 'C', 'D']
+TODAY = date(2026, 1, 1)
+
+@pytest.fixture(autouse=True)
+def small_runs(monkeypatch):
+    """Tiny runs and compaction threshold, so splits and compaction happen in small tests."""
+    monkeypatch.setattr(batch_store, 'RUN_LENGTH', 4)
+    monkeypatch.setattr(batch_store, 'COMPACT_MIN_DEAD', 8)
+
+def assert_invariants(store: BatchStore, expected: dict):
+    """
+    Checks the store's indexes against its slots and a reference model.
+
+    expected: batch_id -> (item_name, quantity, expiry day, arrival sequence).
+    """
+    size = store._size
+    keys, order = store._fefo.arrays()
+    # The FEFO index holds every slot once, sorted by (item, expiry), ties in slot (arrival) order
+    assert np.array_equal(np.sort(order), np.arange(size))
+    assert np.array_equal(keys, _lot_keys(store._code[order], store._expiry[order]))
+    assert np.all(np.diff(keys) >= 0)
+    ties = np.diff(keys) == 0
+    assert np.all(np.diff(order)[ties] > 0)
+    # The expiry index likewise
+    expiry_days, expiry_slots = store._by_expiry.arrays()
+    assert np.array_equal(np.sort(expiry_slots), np.arange(size))
+    assert np.array_equal(expiry_days, store._expiry[expiry_slots])
+    assert np.all(np.diff(expiry_days) >= 0)
+    # Every live id maps to its own slot
+    assert len(store) == len(expected) == len(store._slot_of)
+    for batch_id, slot in store._slot_of.items():
+        assert store._alive[slot] and store._batch_id[slot] == batch_id
+    # Each item's lots come out in FEFO order (expiry, then arrival)
+    for item_name in ITEMS:
+        reference = sorted((lot for lot in expected.items() if lot[1][0] == item_name), key=lambda lot: (lot[1][2], lot[1][3]))
+        lots = store.item_lots(item_name)
+        assert lots.index.tolist() == [batch_id for batch_id, _ in reference]
+        assert lots['quantity_on_hand'].tolist() == [quantity for _, (_, quantity, _, _) in reference]
+
+def test_fefo_order_after_mixed_receive_discard_compact():
+    rng = np.random.default_rng(0)
+    store = BatchStore(ITEMS)
+    expected = {}
+    arrival = 0
+    compactions = 0
+    for step in range(300):
+        action = rng.random()
+        if action < 0.45 or not expected:
+            item_name = ITEMS[rng.integers(len(ITEMS))]
+            quantity = int(rng.integers(1, 50))
+            expiry = TODAY + timedelta(days=int(rng.integers(0, 10))) # Few distinct days: many ties
+            batch_id = store.receive(item_name, quantity, expiry)
+            expected[batch_id] = (item_name, quantity, _day_number(expiry), arrival)
+            arrival += 1
+        elif action < 0.6:
+            n = int(rng.integers(1, 12))
+            new_batches_df = pd.DataFrame({
+                'item_name': [ITEMS[i] for i in rng.integers(len(ITEMS), size=n)],
+                'quantity_on_hand': rng.integers(1, 50, size=n),
+                'expiry_date': pd.to_datetime(TODAY) + pd.to_timedelta(rng.integers(0, 10, size=n), unit='D'),
+            })
+            batch_ids = store.receive_many(new_batches_df)
+            for batch_id, row in zip(batch_ids.tolist(), new_batches_df.itertuples()):
+                expected[batch_id] = (row.item_name, int(row.quantity_on_hand), _day_number(row.expiry_date), arrival)
+                arrival += 1
+        elif action < 0.9:
+            batch_id = list(expected)[rng.integers(len(expected))]
+            dead_before = store._dead
+            assert store.discard(batch_id)
+            del expected[batch_id]
+            compactions += store._dead < dead_before
+        else:
+            batch_ids = [list(expected)[i] for i in rng.integers(len(expected), size=3)] + [10**9] # Plus an unknown id
+            assert store.discard_many(batch_ids) == len(set(batch_ids) - {10**9})
+            for batch_id in set(batch_ids) - {10**9}:
+                del expected[batch_id]
+        if step % 10 == 0:
+            assert_invariants(store, expected)
+    assert_invariants(store, expected)
+    assert compactions > 0
+    assert len(store._fefo._keys) > 1 # The index was split into several runs
+
+def test_consume_follows_fefo_and_skips_expired():
+    store = BatchStore(['A'])
+    late = store.receive('A', 5, TODAY + timedelta(days=20))
+    expired = store.receive('A', 5, TODAY - timedelta(days=1))
+    early = store.receive('A', 3, TODAY + timedelta(days=2))
+    consumed = store.consume(np.array([4]), TODAY)
+    assert consumed.tolist() == [4]
+    assert early not in store # Emptied first, then removed
+    assert store.item_lots('A')['quantity_on_hand'].to_dict() == {expired: 5, late: 4}
+
+def test_id_lookup_after_rename():
+    store = BatchStore(ITEMS)
+    first = store.receive('A', 10, TODAY + timedelta(days=5))
+    second = store.receive('A', 20, TODAY + timedelta(days=1))
+    other = store.receive('B', 30, TODAY + timedelta(days=3))
+
+    store.reassign_batch_ids([first, second], [100, 101])
+    assert first not in store and second not in store
+    assert 100 in store and 101 in store and other in store
+    assert store.item_lots('A').index.tolist() == [101, 100] # FEFO order is unchanged
+    assert store.next_batch_id == 102
+
+    # Swapping ids within the renamed set is allowed
+    store.reassign_batch_ids([100, 101], [101, 100])
+    assert store.item_lots('A')['quantity_on_hand'].to_dict() == {100: 20, 101: 10}
+
+    # Renaming onto an id used by another lot is refused
+    with pytest.raises(ValueError):
+        store.reassign_batch_ids([100], [other])
+
+    assert store.discard(101)
+    assert not store.discard(first)
+    assert store.item_lots('A').index.tolist() == [100]
+    assert store.to_dataframe().loc[100, 'quantity_on_hand'] == 20
+
+def test_array_round_trip_keeps_order_and_status():
+    store = BatchStore(ITEMS)
+    for offset in [9, 3, 3, 40, -2, 7]:
+        store.receive(ITEMS[offset % 2], 10 + offset, TODAY + timedelta(days=offset))
+    store.discard(2)
+    store.update_status(TODAY)
+    restored = BatchStore.from_arrays(store.to_arrays(), store.item_names, store.alert_days,
+                                      store.status_day, store.next_batch_id)
+    pd.testing.assert_frame_equal(restored.to_dataframe(), store.to_dataframe())
+    for item_name in ITEMS:
+        pd.testing.assert_frame_equal(restored.item_lots(item_name), store.item_lots(item_name))
+
+def test_status_transitions_and_expiring_within():
+    store = BatchStore(['A'], alert_days=5)
+    soon = store.receive('A', 1, TODAY + timedelta(days=3))
+    later = store.receive('A', 1, TODAY + timedelta(days=30))
+    store.update_status(TODAY)
+    assert store.lots_with_status(['Nearing Expiry']).index.tolist() == [soon]
+    assert store.expiring_within(10).index.tolist() == [soon]
+    assert store.update_status(TODAY + timedelta(days=4)) == 1 # Only `soon` has a transition
+    assert store.lots_with_status(['Expired']).index.tolist() == [soon]
+    assert store.update_status(TODAY + timedelta(days=26)) == 1
+    assert store.lots_with_status(['Nearing Expiry']).index.tolist() == [later]
+
+def test_summarize_matches_exported_summary():
+    store = BatchStore(ITEMS)
+    for offset in range(40):
+        store.receive(ITEMS[offset % 3], offset + 1, TODAY + timedelta(days=offset - 10)) # 'D' has no lots
+    store.receive('E', 5, TODAY) # Not in the parameters below
+    store.discard_many([3, 4, 5])
+    store.update_status(TODAY)
+    item_params_df = pd.DataFrame({'reorder_point': [50, 100, 10, 0], 'reorder_quantity': [10, 20, 30, 40]},
+                                  index=pd.Index(ITEMS, name='item_name'))
+    pd.testing.assert_frame_equal(store.summarize(item_params_df), summarize_inventory(store.to_dataframe(), item_params_df))
@@ -0,0 +1,80 @@
+import json
+import numpy as np
+import os
+import pandas as pd
+import pytest
+from datetime import date, timedelta
+
+from batch_store import BatchStore
+from checkpoint import META_FILE, load_checkpoint, resolve_checkpoint_path, save_checkpoint
+from history_store import HistoryStore
+from simulation import IN_TRANSIT_COLUMNS
+
+ITEMS = ['A', 'B', 'C']
+TODAY = date(2026, 1, 1)
+
+@pytest.fixture
+def state():
+    """A small store and item parameters to checkpoint."""
+    store = BatchStore(ITEMS)
+    for offset in range(12):
+        store.receive(ITEMS[offset % 3], 10 + offset, TODAY + timedelta(days=offset * 5 - 20))
+    store.discard(3)
+    store.update_status(TODAY)
+    item_params_df = pd.DataFrame({'min_daily_usage': [1, 2, 3], 'max_daily_usage': [4, 5, 6],
+                                   'buffer_days': [7, 7, 7], 'target_days': [30, 30, 30]},
+                                  index=pd.Index(ITEMS, name='item_name'))
+    return store, item_params_df
+
+def test_round_trip_restores_the_simulation_state(tmp_path, state):
+    store, item_params_df = state
+    history = HistoryStore(ITEMS)
+    history.append_many(1, np.arange(30).reshape(10, 3))
+    in_transit_df = pd.DataFrame({'item_name': ['B'], 'quantity': [40], 'order_date': [pd.Timestamp(TODAY)],
+                                  'arrival_date': [pd.Timestamp(TODAY + timedelta(days=3))]}, columns=IN_TRANSIT_COLUMNS)
+    path = str(tmp_path / 'latest')
+    assert save_checkpoint(path, store, item_params_df, TODAY, 10, history, in_transit_df)
+
+    restored = load_checkpoint(path)
+    assert restored['current_sim_date'] == TODAY
+    assert restored['day_count'] == 10
+    for name, values in store.to_arrays().items():
+        assert np.array_equal(restored['batch_store'].to_arrays()[name], values), name
+    assert restored['batch_store'].next_batch_id == store.next_batch_id
+    pd.testing.assert_frame_equal(restored['batch_store'].to_dataframe(), store.to_dataframe())
+    pd.testing.assert_frame_equal(restored['item_params_df'], item_params_df)
+    pd.testing.assert_frame_equal(restored['history'].frame(), history.frame())
+    pd.testing.assert_frame_equal(restored['in_transit_df'], in_transit_df, check_dtype=False)
+
+    # The restored store keeps working: FEFO consumption and new lots
+    restored['batch_store'].consume(np.array([5, 0, 0]), TODAY)
+    assert restored['batch_store'].receive('A', 1, TODAY) == store.next_batch_id
+
+def test_save_refuses_to_replace_a_non_checkpoint_directory(tmp_path, state):
+    store, item_params_df = state
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'data.txt').write_text('keep me')
+
+    assert not save_checkpoint(str(data_dir), store, item_params_df, TODAY, 0)
+    assert sorted(os.listdir(data_dir)) == ['data.txt']
+    assert not (tmp_path / 'data.partial').exists()
+
+    # A checkpoint of an unsupported format is not replaced either
+    (data_dir / META_FILE).write_text(json.dumps({'format_version': -1}))
+    assert not save_checkpoint(str(data_dir), store, item_params_df, TODAY, 0)
+    assert (data_dir / 'data.txt').exists()
+
+def test_save_replaces_an_existing_checkpoint(tmp_path, state):
+    store, item_params_df = state
+    path = str(tmp_path / 'latest')
+    assert save_checkpoint(path, store, item_params_df, TODAY, 1)
+    assert save_checkpoint(path, store, item_params_df, TODAY + timedelta(days=1), 2)
+    assert load_checkpoint(path)['day_count'] == 2
+
+def test_checkpoint_names_stay_inside_the_root(tmp_path):
+    root = str(tmp_path / 'checkpoints')
+    assert resolve_checkpoint_path(root, 'latest') == os.path.join(os.path.realpath(root), 'latest')
+    assert resolve_checkpoint_path(root, 'runs/a') == os.path.join(os.path.realpath(root), 'runs', 'a')
+    for name in ['', '.', '..', '../data', 'runs/../..', str(tmp_path), '/']:
+        assert resolve_checkpoint_path(root, name) is None
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import pytest
+import random
+from datetime import date, timedelta
+
+import simulation
+from simulation import advance_day, simulate_horizon, simulate_with_reordering
+
+START = date(2026, 1, 1)
+
+def make_inventory(seed: int, n_items: int = 6, n_lots: int = 60) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Random item parameters and batches covering the kernel's edge cases.
+
+    Expiry dates fall on a few distinct days (many ties), some lots are
+    already expired, have no expiry date, are empty or belong to an item
+    missing from the parameters. One item has min == max usage, one zero usage.
+    """
+    rng = np.random.default_rng(seed)
+    items = [f"item_{i}" for i in range(n_items)]
+    low = rng.integers(0, 8, size=n_items)
+    high = low + rng.integers(0, 12, size=n_items)
+    high[1] = low[1] # Fixed usage: no random draw
+    low[2] = high[2] = 0 # No usage
+    item_params_df = pd.DataFrame({
+        'min_daily_usage': low,
+        'max_daily_usage': high,
+        'buffer_days': 5,
+        'target_days': 20,
+        'standard_shelf_life_months': 6,
+    }, index=pd.Index(items, name='item_name'))
+    item_params_df['reorder_point'] = item_params_df['max_daily_usage'] * item_params_df['buffer_days']
+    item_params_df['reorder_quantity'] = item_params_df['max_daily_usage'] * item_params_df['target_days']
+
+    expiry = pd.to_datetime(START) + pd.to_timedelta(rng.integers(-5, 25, size=n_lots), unit='D')
+    expiry = expiry.where(rng.random(n_lots) > 0.05) # Some missing expiry dates
+    batches_df = pd.DataFrame({
+        'item_name': np.array(items + ['unknown_item'])[rng.integers(0, n_items + 1, size=n_lots)],
+        'quantity_on_hand': rng.integers(0, 30, size=n_lots),
+        'expiry_date': expiry,
+    }, index=pd.Index(np.arange(1, n_lots + 1), name='batch_id'))
+    return item_params_df, batches_df
+
+def reference_advance_day(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, current_sim_date: date) -> pd.DataFrame:
+    """
+    The original per-item, per-lot FEFO loop that advance_day replaced.
+
+    Lots with the same expiry date are consumed in table order (stable
+    sort), the documented tie rule of the vectorized kernel.
+    """
+    df = batches_df.copy()
+    current = pd.to_datetime(current_sim_date)
+    for item_name in item_params_df.index:
+        min_usage = int(item_params_df.loc[item_name, 'min_daily_usage'])
+        max_usage = int(item_params_df.loc[item_name, 'max_daily_usage'])
+        daily_consumption = min_usage if min_usage >= max_usage else random.randint(min_usage, max_usage)
+        if daily_consumption == 0:
+            continue
+        active = df[(df['item_name'] == item_name) & (df['quantity_on_hand'] > 0) &
+                    df['expiry_date'].notna() & (df['expiry_date'] >= current)]
+        for batch_id, batch in active.sort_values(by='expiry_date', kind='stable').iterrows():
+            consume_amount = min(daily_consumption, batch['quantity_on_hand'])
+            df.loc[batch_id, 'quantity_on_hand'] -= consume_amount
+            daily_consumption -= consume_amount
+            if daily_consumption <= 0:
+                break
+    return df[df['quantity_on_hand'] > 0]
+
+@pytest.mark.parametrize('seed', range(5))
+def test_advance_day_matches_per_lot_loop(seed):
+    item_params_df, batches_df = make_inventory(seed)
+    expected_df = actual_df = batches_df
+    for day in range(15):
+        sim_date = START + timedelta(days=day)
+        random.seed(seed * 100 + day)
+        expected_df = reference_advance_day(expected_df, item_params_df, sim_date)
+        random.seed(seed * 100 + day) # Same draws: one randint per item with a usage range, in index order
+        actual_df = advance_day(actual_df, item_params_df, sim_date)
+        pd.testing.assert_frame_equal(actual_df, expected_df, check_dtype=False)
+    assert len(actual_df) < len(batches_df) # Lots were used up along the way
+
+def iterate_advance_day(batches_df: pd.DataFrame, item_params_df: pd.DataFrame, demand_df: pd.DataFrame,
+                        monkeypatch) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Runs advance_day once per row of demand_df (used as that day's draw); returns the final batches and daily QoH."""
+    rows = iter(demand_df.to_numpy())
+    monkeypatch.setattr(simulation, '_draw_daily_demand', lambda params: next(rows).copy())
+    totals = []
+    for sim_date in demand_df.index:
+        batches_df = advance_day(batches_df, item_params_df, sim_date.date())
+        totals.append(batches_df.groupby('item_name')['quantity_on_hand'].sum().reindex(item_params_df.index, fill_value=0))
+    return batches_df, pd.DataFrame(totals, index=demand_df.index)
+
+@pytest.mark.parametrize('seed', range(3))
+def test_simulate_horizon_matches_iterated_advance_day(seed, monkeypatch):
+    item_params_df, batches_df = make_inventory(seed)
+    days = 30
+    final_df, qoh_history_df, demand_df = simulate_horizon(batches_df, item_params_df, START, days,
+                                                           rng=np.random.default_rng(seed), return_demand=True)
+    assert demand_df.shape == (days, len(item_params_df))
+
+    expected_df, expected_history_df = iterate_advance_day(batches_df, item_params_df, demand_df, monkeypatch)
+    pd.testing.assert_frame_equal(final_df, expected_df, check_dtype=False)
+    pd.testing.assert_frame_equal(qoh_history_df, expected_history_df, check_dtype=False, check_names=False)
+
+    # Without reorders (reorder_quantity 0) the reordering kernel is the same horizon
+    no_reorder_df = item_params_df.assign(reorder_quantity=0)
+    reorder_df, in_transit_df, reorder_history_df, orders_df, reorder_demand_df = simulate_with_reordering(
+        batches_df, no_reorder_df, START, days, rng=np.random.default_rng(seed), return_demand=True)
+    assert orders_df.empty and in_transit_df.empty
+    pd.testing.assert_frame_equal(reorder_demand_df, demand_df)
+    pd.testing.assert_frame_equal(reorder_df, final_df)
+    pd.testing.assert_frame_equal(reorder_history_df, qoh_history_df)
+
+@pytest.mark.parametrize('auto_reorder', [False, True])
+def test_monte_carlo_is_reproducible_across_workers_and_chunks(auto_reorder):
+    item_params_df, batches_df = make_inventory(7)
+    reference_df, reference = simulation.run_monte_carlo(batches_df, item_params_df, START, 40, replicates=25, seed=42,
+                                                         n_workers=1, chunk_size=64, auto_reorder=auto_reorder)
+    assert reference['days_out_of_stock'].shape == (25, len(item_params_df))
+    for n_workers, chunk_size in [(1, 1), (1, 7), (2, 4), (3, 10)]:
+        risk_summary_df, distributions = simulation.run_monte_carlo(batches_df, item_params_df, START, 40, replicates=25, seed=42,
+                                                                    n_workers=n_workers, chunk_size=chunk_size,
+                                                                    auto_reorder=auto_reorder)
+        pd.testing.assert_frame_equal(risk_summary_df, reference_df)
+        for name, values in reference.items():
+            assert np.array_equal(distributions[name], values), (name, n_workers, chunk_size)
+
+    # Another seed gives different replicates
+    _, other = simulation.run_monte_carlo(batches_df, item_params_df, START, 40, replicates=25, seed=43, n_workers=1)
+    assert not np.array_equal(other['unmet_units'], reference['unmet_units'])
@@ -0,0 +1,20 @@
+from datetime import date
+
+import data_loader
+from synthetic_data import seed_synthetic_network
+
+AS_OF = date(2026, 1, 1)
+
+def test_reseeding_a_network_replaces_only_its_own_shards(tmp_path):
+    shard_dir = str(tmp_path / 'network')
+    assert seed_synthetic_network(shard_dir, 4, 3, 2, as_of=AS_OF)
+    assert seed_synthetic_network(shard_dir, 2, 3, 2, as_of=AS_OF)
+    assert list(data_loader.list_site_shards(shard_dir)) == ['central_lab', 'clinic_001']
+
+def test_directory_with_other_databases_is_refused(tmp_path):
+    other_db = tmp_path / 'inventory.db'
+    other_db.write_bytes(b'not a shard')
+    assert data_loader.remove_site_shards(str(tmp_path)) is None
+    assert not seed_synthetic_network(str(tmp_path), 2, 3, 2, as_of=AS_OF)
+    assert other_db.read_bytes() == b'not a shard'
+    assert data_loader.remove_site_shards('.') is None # The application directory